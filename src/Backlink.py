@@ -1,12 +1,40 @@
 #!/usr/bin/env python3
 import argparse
 import csv
-import logging  
+import heapq
+import logging
+import os
 import re
-from collections import defaultdict
+import sys
+import tempfile
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import nullcontext
+from dataclasses import replace
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 from typing import Any
 
+from backlinks.io.columnar import COLUMNAR_DIR, csv_to_columnar
+from backlinks.io.locking import LOCK_TIMEOUT, VaultLock, atomic_write
+from backlinks.markdown.markdown import (
+    HEADING_LEVEL_REGEX,
+    has_anchor,
+    heading_slugs,
+)
+from backlinks.markdown.scanner import scan_links
+from backlinks.markdown.snippets import SnippetBuffer, snippet_text
+from backlinks.markdown.templates import (
+    BacklinksTemplate,
+    backlink_entry,
+    heading_level,
+    heading_regex,
+    load_template,
+)
+from backlinks.memory import MemoryTracker
+from backlinks.progress import PROGRESS_MODES, QUIET, ProgressReporter
+
 # Hard-coded scan path - modify this as needed
 SCAN_PATH = (
     None  # Set to your desired scan path, e.g., "/path/to/scan" or "C:\\MyDocs"
@@ -21,11 +49,38 @@ YAML_FIELDS = [
     "EDITOR",
     "DATECREATED",
 ]
-MARKDOWN_LINK_FINDER = r"\[([^\]]*)\]\(([^)]*\.md)\)"
-LINK_FINDER = r"\[([^\]]+)\]\(([^)]+)\)"
-MARKDOWN_HEADER_FINDERR = r"title:.*"
-BACKLINKS_SELECTOR = r"# Backlinks\n(.*?)(?=\n# |\Z)"
+MARKDOWN_HEADER_FINDERR = r"^title:(.*)$"
+FRONT_MATTER_FINDER = r"\A---\n(.*?)\n---"
+HEADING_FINDER = r"^#{1,6}[ \t]+(.+?)[ \t#]*$"
+# a backlinks section ends at the next heading of its level or higher
+BACKLINKS_END = r"\n#[ \t]"
+BACKLINKS_SELECTOR = r"# Backlinks\n(.*?)(?=" + BACKLINKS_END + r"|\Z)"
 BACKLINKS_FINDER = r"# Backlinks\n"
+CSV_FIELDS = [
+    "source_file",
+    "source_title",
+    "target_file",
+    "target_title",
+    "link_text",
+    "status",
+    "hierarchy_level",
+    "link_type",
+    "snippet",
+]
+# link record formats, "columnar" also converts backlinks.csv to binary columns
+LINKS_FORMATS = ["csv", "columnar"]
+# backlinks (and titles) held in memory by --streaming before spilling to disk
+MEMORY_BUDGET = 100_000
+# times a file written by someone else mid-update is re-read and retried
+RETRIES = 3
+# the package's template and the patterns finding its section, see
+# vault_template
+DEFAULT_TEMPLATE = {
+    "COMPILED": BacklinksTemplate(),
+    "FINDER": BACKLINKS_FINDER,
+    "SELECTOR": BACKLINKS_SELECTOR,
+    "END": BACKLINKS_END,
+}
 
 # Testing purposes only
 SYS_PATH = Path("/home/asmodi/Code/git/markdown_linker/test/markdown/SlipBox")
@@ -84,19 +139,6 @@ def quote_it(Input_String: str) -> str:
 
     return Input_String
 
-# TO DELETE
-def add_headers_dict(Headers_Dict, file_path, title):
-    if Headers_Dict.get(file_path) is not None:
-        return Headers_Dict
-    elif Headers_Dict.get(file_path) is None:
-        Headers_Dict[file_path] = title
-    else:
-        logging.debug(f"No header found in {file_path.name}")
-        Headers_Dict[file_path] = (
-            file_path.stem
-        )  # Fallback to filename without extension
-    return Headers_Dict
-
 
 # ###
 # CSV functions
@@ -121,17 +163,7 @@ def save_csv_data(csv_path, links_data):
     """Save links data to CSV"""
     logging.info(f"Saving {len(links_data)} link records to {csv_path}")
     with open(csv_path, "w", encoding="utf-8", newline="") as f:
-        fieldnames = [
-            "source_file",
-            "source_title",
-            "target_file",
-            "target_title",
-            "link_text",
-            "status",
-            "hierarchy_level",
-            "link_type",
-        ]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
         writer.writeheader()
 
         # Sort by hierarchy level then by file path
@@ -281,9 +313,9 @@ def write_markdown_doc(markdon_doc_filepath: str, content: str):
     logging.debug(f"Wrote updated content to {markdon_doc_filepath}")
 
 
-def find_backlinks_section(content):
+def find_backlinks_section(content, backlinks_selector=BACKLINKS_SELECTOR):
     """Extract backlinks section from content"""
-    backlinks_match = re.search(BACKLINKS_SELECTOR, content, re.DOTALL)
+    backlinks_match = re.search(backlinks_selector, content, re.DOTALL)
     if backlinks_match:
         logging.debug("Found backlinks section")
         return backlinks_match.group(1)
@@ -291,27 +323,38 @@ def find_backlinks_section(content):
     return ""
 
 
-def split_on_backlinks_section(content):
-    """Extract backlinks section from content"""
-    splitter = re.split(BACKLINKS_FINDER, content)
-    if len(splitter) == 1:
+def split_on_backlinks_section(
+    content, backlinks_finder=BACKLINKS_FINDER, backlinks_end=BACKLINKS_END
+):
+    """Split content into its main body and its last backlinks section
+
+    The section ends at backlinks_end, the next heading of its level or
+    higher. What follows it stays part of the main body.
+    """
+    heading = None
+    for heading in re.finditer(backlinks_finder, content):
+        pass
+    if heading is None:
         logging.debug("Didn't find backlinks section")
         return [content, ""]
 
-    main_body = "".join(splitter[0:-1])
-    backlinks = splitter[-1]
+    end = re.compile(backlinks_end).search(content, heading.end())
+    end = len(content) if end is None else end.start()
     logging.debug("Found backlinks section")
-    return [main_body, backlinks]
+    return [
+        content[: heading.start()] + content[end:],
+        content[heading.end() : end],
+    ]
 
 
 def find_markdown_links(content):
-    """Find all markdown links in content"""
-    return re.findall(MARKDOWN_LINK_FINDER, content)
+    """Find all links to markdown files in content, in linear time"""
+    return scan_links(content, markdown_only=True)
 
 
 def find_links(content):
-    """Find all markdown links in content"""
-    return re.findall(LINK_FINDER, content)
+    """Find all markdown links in content, in linear time"""
+    return scan_links(content)
 
 
 def get_links(content: str, markdown_only: bool = True) -> tuple[Any, Any]:
@@ -345,6 +388,7 @@ def get_links(content: str, markdown_only: bool = True) -> tuple[Any, Any]:
             )
         return find_links(split_md[0]), find_links(split_md[1])
 
+
 # TO DELETE
 def get_existing_backlinks(backlink_section):
     """Extract existing backlinks from backlink section"""
@@ -525,15 +569,15 @@ def markdown_link_crosswalker(markdowns_dict):
 
     # Now, we've gone through all the markdown docs, and there are records that don't tie to anything
     # either due to files don't exists, or are formatted wrong, or otherwise
-    for md_file, md_link_list in link_list:
+    for md_file, md_link_list in link_list.items():
         md_dict = markdowns_dict[md_file]
         for links in md_link_list:
-            if links.lower().starts_with("http"):
+            if links.lower().startswith("http"):
                 tar = {"REL_PATH": links, "TITLE": links}
                 Crosslinks_list.append(
                     post_linkage(md_dict, tar, "http", "Valid")
                 )
-            elif links.lower().ends_with(".md"):
+            elif links.lower().endswith(".md"):
                 tar = {"REL_PATH": links, "TITLE": links}
                 Crosslinks_list.append(
                     post_linkage(md_dict, tar, "To Markdown", "Broken")
@@ -578,210 +622,657 @@ def markdown_crossrefrence(system_dict):
 
 
 def find_markdown_title(content):
-    """Find all markdown links in content"""
-    ret_str = re.findall(MARKDOWN_HEADER_FINDERR, content)[0]
-    ret_str = ret_str.replace("title:", "").strip()
-    # ret_str = quote_it(ret_str)
-    return ret_str
+    """Title of a markdown document, None when it has none
 
+    The front matter title wins, the first heading of the body is the fallback.
+    """
+    body = content
+    front_matter = re.match(FRONT_MATTER_FINDER, content, re.DOTALL)
+    if front_matter:
+        body = content[front_matter.end() :]
+        title_match = re.search(
+            MARKDOWN_HEADER_FINDERR,
+            front_matter.group(1),
+            re.MULTILINE | re.IGNORECASE,
+        )
+        if title_match and title_match.group(1).strip():
+            return title_match.group(1).strip()
 
-def scan_documents(scan_path):
-    """Scan all markdown files and build comprehensive link data"""
-    scan_path = Path(scan_path).resolve()
-    logging.info(f"Scanning documents in {scan_path}")
-    csv_path = scan_path / "backlinks.csv"
-    # existing_data = load_csv_data(csv_path)
+    heading_match = re.search(HEADING_FINDER, body, re.MULTILINE)
+    if heading_match and heading_match.group(1) != "Backlinks":
+        return heading_match.group(1)
+    return None
 
-    markdown_header = {}  # Map of file path to its header/title
-    links_data = []
-    backlinks_map = defaultdict(set)
-    md_files = list(scan_path.rglob("*.md"))
 
-    logging.info(f"Found {len(md_files)} markdown files")
+def resolve_link_target(target_file, md_file, scan_path):
+    """Absolute path a link of md_file points to, and the status of the link
+
+    A #fragment is dropped, see has_anchor for checking it.
+    """
+    target_file = target_file.split("#", 1)[0] or md_file.name
+    # Handle links relative to scan directory
+    if target_file.startswith("/"):
+        # Link is scan-relative (e.g., /TESTDIR/docs/file.md)
+        target_parts = Path(target_file).parts[1:]  # Remove leading '/'
+        if target_parts and target_parts[0].upper() == scan_path.name.upper():
+            # Link points within scan structure - convert to absolute path
+            rel_path = (
+                Path(*target_parts[1:]) if len(target_parts) > 1 else Path(".")
+            )
+            target_path = (scan_path / rel_path).resolve()
+            logging.debug(
+                f"Resolved scan-relative link {target_file} to {target_path}"
+            )
+        else:
+            # Link points outside scan structure
+            target_path = Path(target_file)
+    else:
+        # Link is relative to current file location
+        target_path = (md_file.parent / target_file).resolve()
 
+    # Determine status - check existence with absolute path
+    if target_path.exists():
+        if scan_path in target_path.parents or target_path == scan_path:
+            status = "Valid"
+        else:
+            status = "Outside Root"
+            logging.warning(
+                f"Link outside scan path: {md_file.name} -> {target_file}"
+            )
+    else:
+        status = "Broken"
+        logging.error(
+            f"Broken link: {md_file.name} -> {target_file} (resolved to {target_path})"
+        )
+    return target_path, status
+
+
+class TitleCache:
+    """Titles and heading anchors of markdown files by path, read from disk
+    on first use
+
+    With a maxsize only the most recently used titles are kept, so memory
+    stays flat however large the vault is.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.titles = OrderedDict()
+
+    def _entry(self, file_path, content=None):
+        entry = self.titles.get(file_path)
+        if entry is not None:
+            self.titles.move_to_end(file_path)
+            return entry
+
+        if content is None and file_path.is_file():
+            try:
+                content = read_markdown_doc(file_path)
+            except (OSError, UnicodeDecodeError) as e:
+                # an unreadable target still gets a title, its file name
+                logging.warning(f"Could not read the title of {file_path}: {e}")
+        title = (find_markdown_title(content) if content else None) or (
+            file_path.stem
+        )
+        # the anchors come from the same read as the title
+        entry = (title, set(heading_slugs(content)) if content else set())
+        self.titles[file_path] = entry
+        if self.maxsize and len(self.titles) > self.maxsize:
+            self.titles.popitem(last=False)
+        return entry
+
+    def get(self, file_path, content=None):
+        return self._entry(file_path, content)[0]
+
+    def anchors(self, file_path, content=None):
+        return self._entry(file_path, content)[1]
+
+
+def iter_document_links(
+    scan_path,
+    md_files,
+    titles,
+    file_stats=None,
+    template=DEFAULT_TEMPLATE,
+    progress=None,
+    failed=None,
+):
+    """Parse markdown files one at a time
+
+    When file_stats is a list, (source_rel, seconds, size, links) of each
+    file is appended to it, see print_profile_report. Each file read is
+    counted by progress, a backlinks.progress.Progress. A file that cannot be read is logged
+    and skipped, and recorded in failed when it is a dict.
+
+    Yields:
+        tuple: (source_rel, has_backlinks_section, backlinks, records) for
+            each file, backlinks being the (target_rel, source_title,
+            snippet) of its valid links and records its rows for
+            backlinks.csv
+    """
     for md_file in md_files:
-        content = read_markdown_doc(md_file)
+        start = time.perf_counter()
+        try:
+            content = read_markdown_doc(md_file)
+        except (OSError, UnicodeDecodeError) as e:
+            logging.error(f"Failed to read {md_file}: {e}")
+            if failed is not None:
+                source_rel = get_scan_relative_path(md_file, scan_path)
+                failed[source_rel] = f"{type(e).__name__}: {e}"
+            continue
+
+        # Links inside the backlinks section are ours, not the author's
+        main_body, backlinks_section = split_on_backlinks_section(
+            content, template["FINDER"], template["END"]
+        )
+        source_rel = get_scan_relative_path(md_file, scan_path)
+        source_title = titles.get(md_file, content)
 
-        links_found = find_markdown_links(content)
+        spans = []
+        links_found = scan_links(main_body, markdown_only=True, spans=spans)
         if links_found:
             logging.debug(f"Found {len(links_found)} links in {md_file.name}")
-        print(links_found)
-        for link_text, target_file in links_found:
-            # Handle links relative to scan directory
-            if target_file.startswith("/"):
-                # Link is scan-relative (e.g., /TESTDIR/docs/file.md)
-                target_parts = Path(target_file).parts[1:]  # Remove leading '/'
-                if (
-                    target_parts
-                    and target_parts[0].upper() == scan_path.name.upper()
-                ):
-                    # Link points within scan structure - convert to absolute path
-                    rel_path = (
-                        Path(*target_parts[1:])
-                        if len(target_parts) > 1
-                        else Path(".")
-                    )
-                    target_path = (scan_path / rel_path).resolve()
-                    logging.debug(
-                        f"Resolved scan-relative link {target_file} to {target_path}"
-                    )
-                else:
-                    # Link points outside scan structure
-                    target_path = Path(target_file)
-            else:
-                # Link is relative to current file location
-                target_path = (md_file.parent / target_file).resolve()
-
-            # Determine status - check existence with absolute path
-            if target_path.exists():
-                if scan_path in target_path.parents or target_path == scan_path:
-                    status = "Valid"
-                else:
-                    status = "Outside Root"
-                    logging.warning(
-                        f"Link outside scan path: {md_file.name} -> {target_file}"
-                    )
-            else:
-                status = "Broken"
-                logging.error(
-                    f"Broken link: {md_file.name} -> {target_file} (resolved to {target_path})"
-                )
+
+        # the first link to a target gives its snippet, links sharing a
+        # sentence share one string, see SnippetBuffer
+        snippet_buffer = SnippetBuffer()
+        links = []
+        for (link_text, target_file), (start, end) in zip(links_found, spans):
+            target_path, status = resolve_link_target(
+                target_file, md_file, scan_path
+            )
 
             # Convert to scan-relative paths for CSV
-            source_rel = get_scan_relative_path(md_file, scan_path)
             target_rel = get_scan_relative_path(target_path, scan_path)
-
-            # Get or find titles/headers
-            title_found = find_markdown_title(content)
-            if title_found:
-                logging.debug(f"Found header in {md_file.name}: {title_found}")
-
-            markdown_header = add_headers_dict(
-                markdown_header, md_file, title_found
+            snippet_buffer.add(target_rel, main_body, start, end)
+            links.append(
+                (link_text, target_file, target_path, target_rel, status)
             )
-
+        snippets = snippet_buffer.to_dict()
+
+        backlinks = []
+        records = []
+        for link_text, target_file, target_path, target_rel, status in links:
+            snippet = snippet_text(snippets, target_rel) or ""
+            target_title = titles.get(target_path)
+            fragment = target_file.partition("#")[2]
             if (
-                markdown_header.get(target_path) is None
-                and target_path.exists()
+                fragment
+                and status == "Valid"
+                and not has_anchor(titles.anchors(target_path), fragment)
             ):
-                with open(target_path, "r", encoding="utf-8") as tf:
-                    tcontent = tf.read()
-                ttitle_found = find_markdown_title(tcontent)
-
-                markdown_header = add_headers_dict(
-                    markdown_header, target_path, ttitle_found
-                )
+                status = "Broken Anchor"
+                logging.error(f"Broken anchor: {md_file.name} -> {target_file}")
 
             # Add original link
-            links_data.append(
+            records.append(
                 {
                     "source_file": source_rel,
-                    "source_title": markdown_header[md_file],
-                    "target_file": target_rel,
-                    "target_title": markdown_header[target_path],
+                    "source_title": source_title,
+                    "target_file": (
+                        f"{target_rel}#{fragment}" if fragment else target_rel
+                    ),
+                    "target_title": target_title,
                     "link_text": link_text,
                     "status": status,
                     "hierarchy_level": get_hierarchy_level(md_file, scan_path),
                     "link_type": "original",
+                    "snippet": snippet,
                 }
             )
 
             # Add backlink entry regardless of validity
-            links_data.append(
+            records.append(
                 {
                     "source_file": target_rel,
-                    "source_title": markdown_header[target_path],
+                    "source_title": target_title,
                     "target_file": source_rel,
-                    "target_title": markdown_header[md_file],
+                    "target_title": source_title,
                     "link_text": "",
                     "status": status,  # Use same status as original link
                     "hierarchy_level": get_hierarchy_level(
                         target_path, scan_path
                     ),
                     "link_type": "backlink",
+                    "snippet": snippet,
                 }
             )
 
-            if status == "Valid":
-                backlinks_map[target_rel].add(
-                    (source_rel, markdown_header[md_file])
+            if status in ("Valid", "Broken Anchor"):
+                backlinks.append((target_rel, source_title, snippet))
+
+        if file_stats is not None:
+            file_stats.append(
+                (
+                    source_rel,
+                    time.perf_counter() - start,
+                    md_file.stat().st_size,
+                    len(links_found),
                 )
+            )
+        if progress is not None:
+            progress.advance(
+                bytes=md_file.stat().st_size, links=len(links_found)
+            )
+        yield source_rel, bool(backlinks_section), backlinks, records
+
+
+def scan_documents(
+    scan_path,
+    file_stats=None,
+    template=DEFAULT_TEMPLATE,
+    progress=QUIET,
+    failed=None,
+):
+    """Scan all markdown files and build comprehensive link data
+
+    Files read are reported by progress, a ProgressReporter.
+    """
+    scan_path = Path(scan_path).resolve()
+    logging.info(f"Scanning documents in {scan_path}")
+    csv_path = scan_path / "backlinks.csv"
+    # existing_data = load_csv_data(csv_path)
+
+    links_data = []
+    backlinks_map = defaultdict(set)
+    md_files = list(scan_path.rglob("*.md"))
+
+    logging.info(f"Found {len(md_files)} markdown files")
+
+    reading = progress.stage("read", len(md_files))
+    for source_rel, has_section, backlinks, records in iter_document_links(
+        scan_path,
+        md_files,
+        TitleCache(),
+        file_stats,
+        template,
+        reading,
+        failed,
+    ):
+        if has_section:
+            # make sure the section gets reconciled, even if it ends up empty
+            backlinks_map[source_rel]
+        for target_rel, source_title, snippet in backlinks:
+            backlinks_map[target_rel].add((source_rel, source_title, snippet))
+        links_data += records
+    reading.close()
 
     save_csv_data(csv_path, links_data)
     return backlinks_map
 
 
-def add_backlinks(scan_path):
-    """Add backlinks to markdown files"""
+class BacklinkSpiller:
+    """Collects (target, source, title, snippet) backlinks within a memory budget
+
+    Once more than memory_budget entries are held they are sorted and
+    spilled to a run file in work_dir. Reading back merges the runs, so
+    the entries of each target arrive together whatever the vault size.
+    """
+
+    def __init__(self, work_dir, memory_budget=MEMORY_BUDGET):
+        self.work_dir = Path(work_dir)
+        self.memory_budget = memory_budget
+        self.entries = []
+        self.runs = []
+
+    def add(self, target_rel, source_rel="", source_title="", snippet=""):
+        """Record a backlink, an empty source only marks the target for review"""
+        self.entries.append((target_rel, source_rel, source_title, snippet))
+        if len(self.entries) >= self.memory_budget:
+            self.spill()
+
+    def spill(self):
+        run_path = self.work_dir / f"run{len(self.runs):05d}.csv"
+        with open(run_path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(sorted(self.entries))
+        logging.debug(f"Spilled {len(self.entries)} backlinks to {run_path}")
+        self.runs.append(run_path)
+        self.entries = []
+
+    def _read_run(self, run_path):
+        with open(run_path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                yield tuple(row)
+
+    def grouped(self):
+        """Yields (target_rel, {(source_rel, source_title, snippet), ...}) in order"""
+        if self.runs and self.entries:
+            self.spill()
+        streams = [self._read_run(run_path) for run_path in self.runs]
+        streams.append(iter(sorted(self.entries)))
+        for target_rel, entries in groupby(
+            heapq.merge(*streams), key=itemgetter(0)
+        ):
+            yield target_rel, {
+                (source_rel, source_title, snippet)
+                for _, source_rel, source_title, snippet in entries
+                if source_rel
+            }
+
+
+def stream_documents(
+    scan_path,
+    work_dir,
+    memory_budget=MEMORY_BUDGET,
+    file_stats=None,
+    template=DEFAULT_TEMPLATE,
+    progress=QUIET,
+    failed=None,
+):
+    """Bounded memory variant of scan_documents
+
+    CSV rows are written as each file is parsed, in walk order rather than
+    sorted, and backlinks go through a BacklinkSpiller in work_dir.
+
+    Returns:
+        BacklinkSpiller: call ``grouped`` for the backlinks of each target
+    """
     scan_path = Path(scan_path).resolve()
-    backlinks_map = scan_documents(scan_path)
+    logging.info(f"Streaming documents in {scan_path}")
+    csv_path = scan_path / "backlinks.csv"
+    spiller = BacklinkSpiller(work_dir, memory_budget)
+    titles = TitleCache(maxsize=memory_budget)
 
-    files_updated = 0
-    for target_file_rel, source_files_rel in backlinks_map.items():
-        # Convert scan-relative path back to absolute for file operations
-        if target_file_rel.startswith("/" + scan_path.name):
-            rel_part = target_file_rel[len("/" + scan_path.name) :].lstrip("/")
-            target_path = scan_path / rel_part if rel_part else scan_path
-        else:
-            target_path = Path(target_file_rel)  # Outside scan path, use as-is
+    record_count = 0
+    # the walk is not listed up front, so there is no total and no ETA
+    reading = progress.stage("read")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for source_rel, has_section, backlinks, records in iter_document_links(
+            scan_path,
+            scan_path.rglob("*.md"),
+            titles,
+            file_stats,
+            template,
+            reading,
+            failed,
+        ):
+            if has_section:
+                spiller.add(source_rel)
+            for target_rel, source_title, snippet in backlinks:
+                spiller.add(target_rel, source_rel, source_title, snippet)
+            writer.writerows(records)
+            record_count += len(records)
+    reading.close()
+
+    logging.info(
+        f"Saved {record_count} link records to {csv_path}, "
+        f"spilled backlinks to {len(spiller.runs)} runs"
+    )
+    return spiller
 
-        logging.debug(f"Processing backlinks for {target_path.name}")
 
-        with open(target_path, "r", encoding="utf-8") as f:
-            content = f.read()
+def vault_template(scan_path):
+    """Backlinks template of a vault and the patterns finding its section
 
-        existing_backlinks = get_existing_backlinks(content)
+    The template is the one the backlinks package loads, see
+    backlinks.markdown.templates.load_template. Its "date" sort needs front
+    matter of every source, which this script does not keep, so it falls
+    back to the planned order and ``{date}`` stays empty.
+    """
+    compiled = load_template(scan_path)
+    if compiled.SORT_BY == "date":
+        logging.warning("Sorting backlinks by date is not supported, ignoring")
+        compiled = replace(compiled, SORT_BY=None)
+
+    # an old "# Backlinks" section is replaced too, not kept as body text
+    finder = heading_regex(compiled.HEADING)
+    end = HEADING_LEVEL_REGEX.format(level=heading_level(compiled.HEADING))
+    return {
+        "COMPILED": compiled,
+        "FINDER": finder,
+        "SELECTOR": finder + rf"(.*?)(?={end}|\Z)",
+        "END": end,
+    }
 
-        # Remove existing backlinks section
-        content = re.sub(
-            r"\n# Backlinks\n.*?(?=\n# |\Z)", "", content, flags=re.DOTALL
-        )
 
-        # Build new backlinks section with only new links
-        new_backlinks = []
-        for source_file_rel in source_files_rel:
-            # Convert scan-relative path back to absolute for path calculations
-            if False:
-                print(source_file_rel)
-                if source_file_rel[0].startswith("/" + scan_path.name):
-                    rel_part = source_file_rel[0][
-                        len("/" + scan_path.name) :
-                    ].lstrip("/")
-                    print(rel_part)
-                    source_path = (
-                        scan_path / rel_part if rel_part else scan_path
-                    )
-                    print(rel_part, source_path)
-                else:
-                    source_path = Path(
-                        source_file_rel[0]
-                    )  # Outside scan path, use as-is
-            # source_path = Path(source_file_rel[0])  # Outside scan path, use as-is
-            # rel_path = os.path.relpath(source_path, target_path.parent)
-            rel_path = source_file_rel[0]
-            if rel_path not in existing_backlinks:
-                # source_name = source_path.stem
-                new_backlinks.append(f"- [{source_file_rel[1]}]({rel_path})")
-            # print(source_path, source_path.stem, rel_path, existing_backlinks)
-
-        if new_backlinks:
-            # Remove existing backlinks section
-            content = re.sub(
-                r"\n# Backlinks\n.*?(?=\n# |\Z)", "", content, flags=re.DOTALL
-            )
+def render_backlinks(backlinks, template=DEFAULT_TEMPLATE):
+    """Backlinks section of the entries, an empty string without any
+
+    The package's compiled template renders it, so the format strings are
+    parsed once per run and the section matches what the package writes.
+
+    Args:
+        backlinks (list): (title, rel_path, snippet) of each entry, in
+            planned order
+        template (dict): see vault_template
+    """
+    entries = [
+        backlink_entry(rel_path, title, None, snippet)
+        for title, rel_path, snippet in backlinks
+    ]
+    # the package's section starts with the blank line above the heading,
+    # here the body's last newline is that line
+    return template["COMPILED"].render(entries)[1:]
+
+
+def update_backlinks_file(
+    target_file_rel,
+    source_files_rel,
+    scan_path,
+    prune,
+    lock=None,
+    retries=RETRIES,
+    template=DEFAULT_TEMPLATE,
+):
+    """Reconcile the backlinks section of one target file
+
+    The file is read, reconciled and replaced under its lock. When someone
+    else writes it in between (an editor does not take the lock) the write
+    is dropped and the file reconciled again from its new content.
 
-            logging.info(
-                f"Adding {len(new_backlinks)} backlinks to {target_path.name}"
+    Returns:
+        bool: True when the file was rewritten
+    """
+    for attempt in range(retries + 1):
+        with lock.file(target_file_rel) if lock else nullcontext():
+            updated = _update_backlinks_file(
+                target_file_rel, source_files_rel, scan_path, prune, template
             )
-            backlinks_section = (
-                "\n# Backlinks\n\n" + "\n".join(new_backlinks) + "\n"
+        if updated is not None:
+            return updated
+        logging.info(f"{target_file_rel} changed while updating, retrying")
+    logging.warning(f"Skipping {target_file_rel}, it kept changing")
+    return False
+
+
+def _update_backlinks_file(
+    target_file_rel, source_files_rel, scan_path, prune, template
+):
+    """One attempt of update_backlinks_file, None when the file changed"""
+    # Convert scan-relative path back to absolute for file operations
+    if target_file_rel.startswith("/" + scan_path.name):
+        rel_part = target_file_rel[len("/" + scan_path.name) :].lstrip("/")
+        target_path = scan_path / rel_part if rel_part else scan_path
+    else:
+        target_path = Path(target_file_rel)  # Outside scan path, use as-is
+
+    logging.debug(f"Processing backlinks for {target_path.name}")
+
+    st = os.stat(target_path)
+    with open(target_path, "r", encoding="utf-8") as f:
+        original = f.read()
+
+    existing_backlinks = get_existing_backlinks(
+        find_backlinks_section(original, template["SELECTOR"])
+    )
+    existing_paths = {rel_path for _, rel_path in existing_backlinks}
+    wanted = {
+        rel_path: (title, snippet)
+        for rel_path, title, snippet in source_files_rel
+    }
+
+    added = wanted.keys() - existing_paths
+    stale = existing_paths - wanted.keys() if prune else set()
+
+    # Keep the order of entries that stay, new entries go at the end
+    new_backlinks = [
+        (title, rel_path, wanted.get(rel_path, (title, ""))[1])
+        for title, rel_path in existing_backlinks
+        if rel_path not in stale
+    ]
+    for rel_path in sorted(added):
+        title, snippet = wanted[rel_path]
+        new_backlinks.append((title, rel_path, snippet))
+
+    # Remove existing backlinks sections, the new one goes where the first
+    # was so the text after it stays after it
+    selector = re.compile("\n" + template["SELECTOR"], re.DOTALL)
+    first = selector.search(original)
+    position = len(original) if first is None else first.start()
+    content = selector.sub("", original)
+    section = render_backlinks(new_backlinks, template)
+    content = content[:position] + section + content[position:]
+    # also rewritten when only the template changed
+    if content == original:
+        return False
+
+    logging.info(
+        f"Adding {len(added)} and removing {len(stale)} backlinks "
+        f"in {target_path.name}"
+    )
+    expect_stat = (st.st_mtime_ns, st.st_size)
+    if not atomic_write(target_path, content.encode("utf-8"), expect_stat):
+        return None
+    return True
+
+
+def write_backlinks(grouped, scan_path, prune, lock, template, writing, failed):
+    """Reconciles the backlinks section of each target of grouped
+
+    A target that cannot be read or written is logged and recorded in failed,
+    the other targets are still written.
+
+    Returns:
+        int: the number of files rewritten
+    """
+    files_updated = 0
+    for target_file_rel, source_files_rel in grouped:
+        try:
+            updated = update_backlinks_file(
+                target_file_rel,
+                source_files_rel,
+                scan_path,
+                prune,
+                lock,
+                template=template,
             )
+        except (OSError, UnicodeDecodeError) as e:
+            logging.error(f"Failed to update {target_file_rel}: {e}")
+            failed[target_file_rel] = f"{type(e).__name__}: {e}"
+            updated = False
+        files_updated += updated
+        writing.advance(written=int(updated))
+    return files_updated
+
+
+def add_backlinks(
+    scan_path,
+    prune: bool = True,
+    streaming: bool = False,
+    memory_budget: int = MEMORY_BUDGET,
+    file_stats: list = None,
+    lock_timeout: float = LOCK_TIMEOUT,
+    progress_mode: str = "off",
+    links_format: str = "csv",
+    memory: MemoryTracker = None,
+):
+    """Add backlinks to markdown files
+
+    Each target's backlinks section is reconciled against the wanted set of
+    sources: missing entries are added and, when prune is set, entries whose
+    source no longer links here are removed. Files are only rewritten when
+    that delta is not empty.
 
-            with open(target_path, "w", encoding="utf-8") as f:
-                f.write(content + backlinks_section)
-            files_updated += 1
+    With streaming set the scan runs in bounded memory, see stream_documents.
+    Files are written under a VaultLock, so concurrent runs (a cron job and
+    an editor hook) do not overwrite each other's changes.
+
+    Sections are written with the vault's template, see vault_template.
+    With links_format "columnar" the link records of backlinks.csv are also
+    saved as binary columns in COLUMNAR_DIR, see csv_to_columnar.
+    Files read and targets reconciled are reported as set by progress_mode,
+    one of PROGRESS_MODES, and each stage is marked in memory when given.
+
+    A file that cannot be read or written does not end the run, the others
+    are still updated. Stale entries are then kept, as the links of a file
+    that could not be read are unknown rather than gone.
+
+    Returns:
+        dict: scan-relative path -> error of every file that failed
+    """
+    scan_path = Path(scan_path).resolve()
+    template = vault_template(scan_path)
+    progress = ProgressReporter(progress_mode, MEMORY=memory)
+    failed = {}
+    if not streaming:
+        backlinks_map = scan_documents(
+            scan_path, file_stats, template, progress, failed
+        )
+        if failed and prune:
+            logging.warning("Keeping stale backlinks, some files failed")
+            prune = False
+        writing = progress.stage("write", len(backlinks_map))
+        with VaultLock(scan_path, timeout=lock_timeout) as lock:
+            files_updated = write_backlinks(
+                backlinks_map.items(),
+                scan_path,
+                prune,
+                lock,
+                template,
+                writing,
+                failed,
+            )
+    else:
+        with tempfile.TemporaryDirectory(prefix="backlinks-") as work_dir:
+            spiller = stream_documents(
+                scan_path,
+                work_dir,
+                memory_budget,
+                file_stats,
+                template,
+                progress,
+                failed,
+            )
+            if failed and prune:
+                logging.warning("Keeping stale backlinks, some files failed")
+                prune = False
+            writing = progress.stage("write")
+            with VaultLock(scan_path, timeout=lock_timeout) as lock:
+                files_updated = write_backlinks(
+                    spiller.grouped(),
+                    scan_path,
+                    prune,
+                    lock,
+                    template,
+                    writing,
+                    failed,
+                )
+    writing.close()
+    if links_format == "columnar":
+        csv_to_columnar(scan_path / "backlinks.csv", scan_path / COLUMNAR_DIR)
 
     logging.info(f"Updated {files_updated} files with backlinks")
+    if failed:
+        logging.warning(f"{len(failed)} files failed: {', '.join(failed)}")
+    return failed
+
+
+def print_profile_report(file_stats, top=10):
+    """Print the slowest files and the files with the most links"""
+    total = sum(seconds for _, seconds, _, _ in file_stats)
+    print(f"Parsed {len(file_stats)} files in {total * 1000:.1f} ms")
+    for heading, key in (
+        ("slowest files", 1),
+        ("files with the most links", 3),
+    ):
+        print(f"\n{top} {heading}")
+        print(f"{'ms':>10} {'bytes':>10} {'links':>7}  path")
+        for rel_path, seconds, size, links in heapq.nlargest(
+            top, file_stats, key=itemgetter(key)
+        ):
+            print(f"{seconds * 1000:10.2f} {size:10d} {links:7d}  {rel_path}")
 
 
 if __name__ == "__main__":
@@ -798,6 +1289,59 @@ if __name__ == "__main__":
         help="Logging level",
     )
     parser.add_argument("--log-file", help="Log file path (optional)")
+    parser.add_argument(
+        "--keep-stale",
+        action="store_true",
+        help="Keep backlinks whose source no longer links to the file",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Scan in bounded memory, spilling backlinks to disk",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=MEMORY_BUDGET,
+        help="Backlinks held in memory before spilling, with --streaming",
+    )
+    parser.add_argument(
+        "--links-format",
+        choices=LINKS_FORMATS,
+        default="csv",
+        help="Also save the link records as binary columns with columnar",
+    )
+    parser.add_argument(
+        "--lock-timeout",
+        type=float,
+        default=LOCK_TIMEOUT,
+        help="Seconds to wait on another run holding a file",
+    )
+    parser.add_argument(
+        "--progress",
+        choices=PROGRESS_MODES,
+        default="auto",
+        help="Report progress as a bar, as log lines or not at all. auto "
+        "draws a bar on a terminal and logs otherwise.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="backlinks.pstats",
+        help="Run under cProfile and save the stats (default backlinks.pstats)",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        help="Functions and files listed by --profile and --memory",
+    )
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Trace memory with tracemalloc and report each stage's peak, "
+        "peak RSS and top allocating lines. Slows the run down.",
+    )
 
     args = parser.parse_args()
 
@@ -811,7 +1355,43 @@ if __name__ == "__main__":
         scan_path = args.scan_path or input("Enter scan folder path: ").strip()
 
     try:
-        add_backlinks(scan_path)
+        run_kwargs = dict(
+            prune=not args.keep_stale,
+            streaming=args.streaming,
+            memory_budget=args.memory_budget,
+            lock_timeout=args.lock_timeout,
+            progress_mode=args.progress,
+            links_format=args.links_format,
+            memory=None,
+        )
+        if args.memory:
+            run_kwargs["memory"] = MemoryTracker(TOP=args.profile_top).start()
+        if args.profile:
+            import cProfile
+            import pstats
+
+            file_stats = []
+            profiler = cProfile.Profile()
+            failed = profiler.runcall(
+                add_backlinks, scan_path, file_stats=file_stats, **run_kwargs
+            )
+            profiler.dump_stats(args.profile)
+            logging.info(f"Saved profile to {args.profile}")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(
+                args.profile_top
+            )
+            print_profile_report(file_stats, args.profile_top)
+        else:
+            failed = add_backlinks(scan_path, **run_kwargs)
+        if args.memory:
+            run_kwargs["memory"].stop()
+            print(run_kwargs["memory"].report(), file=sys.stderr)
+        if failed:
+            logging.error(
+                f"Backlinks processing finished with {len(failed)} failed "
+                f"files, fix them and run again"
+            )
+            sys.exit(1)
         logging.info("Backlinks processing completed successfully!")
         print(
             "Backlinks added successfully! Check backlinks.csv for link analysis."
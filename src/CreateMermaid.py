@@ -33,37 +33,32 @@ def read_csv_links(csv_path):
 def generate_mermaid_chart(links):
     """Generate Mermaid flowchart from links"""
     chart_lines = ["```mermaid", "flowchart TD"]
+    link_lines = []
 
-    # Track nodes to avoid duplicates
-    nodes = set()
+    # Track nodes to avoid duplicates, sanitizing each path only once
+    nodes = {}
 
-    for link in links:
-        source_node = sanitize_node_name(link["source"])
-        target_node = sanitize_node_name(link["target"])
-
-        # Add node definitions
-        if source_node not in nodes:
-            source_display = Path(link["source"]).stem
-            chart_lines.append(f'    {source_node}["{source_display}"]')
-            nodes.add(source_node)
-
-        if target_node not in nodes:
-            target_display = Path(link["target"]).stem
-            chart_lines.append(f'    {target_node}["{target_display}"]')
-            nodes.add(target_node)
+    def node_name(file_path):
+        if file_path not in nodes:
+            nodes[file_path] = sanitize_node_name(file_path)
+            chart_lines.append(
+                f'    {nodes[file_path]}["{Path(file_path).stem}"]'
+            )
+        return nodes[file_path]
 
-    # Add links with styling based on status
     for link in links:
-        source_node = sanitize_node_name(link["source"])
-        target_node = sanitize_node_name(link["target"])
+        source_node = node_name(link["source"])
+        target_node = node_name(link["target"])
 
+        # Add links with styling based on status
         if link["status"] == "Valid":
-            chart_lines.append(f"    {source_node} --> {target_node}")
+            link_lines.append(f"    {source_node} --> {target_node}")
         elif link["status"] == "Broken":
-            chart_lines.append(f"    {source_node} -.-> {target_node}")
+            link_lines.append(f"    {source_node} -.-> {target_node}")
         else:  # Outside Root
-            chart_lines.append(f"    {source_node} ==> {target_node}")
+            link_lines.append(f"    {source_node} ==> {target_node}")
 
+    chart_lines.extend(link_lines)
     chart_lines.append("```")
     return "\n".join(chart_lines)
 
@@ -0,0 +1,5 @@
+import sys
+
+from backlinks.cli import main
+
+sys.exit(main())
@@ -0,0 +1,301 @@
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+# ###
+# Variables
+# ###
+
+SRC_PATH = Path(__file__).resolve().parents[1]
+
+# inputs that make backtracking link regexes go quadratic
+ADVERSARIAL_UNITS = {
+    "open brackets": "[",
+    "unclosed links": "[a](",
+    "open parens": "(",
+    "bracket pairs": "[]",
+    "backticks": "`",
+    "mixed": "[`(]a",
+    "base64": "QUJD[RE]GRg==(",
+}
+# subcommands the bench times by default, with their vault-relative arguments.
+# files runs on its incremental path, the index being built beforehand
+STARTUP_COMMANDS = {
+    "files": ["a.md"],
+    "update": [],
+    "plan": [],
+    "query": [],
+}
+# linear input doubles the time of a doubled size, quadratic quadruples it
+MAX_SCALING = 3.0
+# seconds a timing lasts at least, quicker calls are repeated and averaged
+MIN_TIMING = 0.02
+
+
+# ###
+# Benchmarks
+# ###
+def _cold_start_env(cache_dir) -> dict:
+    """Environment of a fresh interpreter importing the package from src
+
+    Bytecode goes to cache_dir whatever PYTHONDONTWRITEBYTECODE says, so
+    once a first run has compiled them modules load from bytecode, as those
+    of an installed package do.
+    """
+    env = dict(
+        os.environ, PYTHONPATH=str(SRC_PATH), PYTHONPYCACHEPREFIX=str(cache_dir)
+    )
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def _top_level_imports(
+    argv: list, env: dict, cwd=None, nested: bool = False
+) -> dict:
+    """Cumulative microseconds of each top level import of a python run
+
+    With nested the imports they caused are listed too.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+        cwd=cwd,
+    )
+    imports = {}
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        # nested imports are indented under the one that caused them
+        if len(fields) != 3 or (fields[2][1:2] == " " and not nested):
+            continue
+        try:
+            imports[fields[2].strip()] = int(fields[1])
+        except ValueError:  # the header
+            continue
+    return imports
+
+
+def import_time(module: str, runs: int = 7) -> float:
+    """Median cold import time of module, in milliseconds
+
+    Every run is a fresh interpreter started with ``-X importtime``, the
+    cumulative time python reports for the module is what gets measured.
+    Interpreter start up itself is not counted.
+    """
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _cold_start_env(Path(tmp) / "pycache")
+        argv = ["-c", f"import {module}"]
+        _top_level_imports(argv, env)  # compiles the bytecode
+        for _ in range(runs):
+            imports = _top_level_imports(argv, env)
+            timings.append(imports.get(module, 0) / 1000)
+    return median(timings)
+
+
+def _command_imports(command: str, runs: int, nested: bool = False) -> list:
+    """Imports of runs cold starts of a subcommand on a one document vault
+
+    Returns:
+        list: the imports of each run, those of a bare interpreter left out
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _cold_start_env(Path(tmp) / "pycache")
+        start_up = _top_level_imports(["-c", "pass"], env, nested=nested)
+        vault = Path(tmp) / "vault"
+        vault.mkdir()
+        (vault / "a.md").write_text("# A\n\n[a](a.md)\n", encoding="utf-8")
+        run = ["-m", "backlinks", "--log-level", "ERROR"]
+        _top_level_imports(run + ["update", str(vault)], env, cwd=tmp)
+        argv = run + [command, str(vault)]
+        argv += [str(vault / arg) for arg in STARTUP_COMMANDS.get(command, [])]
+        _top_level_imports(argv, env, cwd=tmp)  # compiles the bytecode
+        for _ in range(runs):
+            imports = _top_level_imports(argv, env, cwd=tmp, nested=nested)
+            results.append(
+                {
+                    name: cumulative_us
+                    for name, cumulative_us in imports.items()
+                    if name not in start_up
+                }
+            )
+    return results
+
+
+def command_import_time(command: str, runs: int = 7) -> float:
+    """Median time a subcommand spends importing, from a cold start, in ms
+
+    The subcommand really runs, ``python -X importtime -m backlinks`` on a
+    one document vault, so every module its code path pulls in counts, not
+    only ``backlinks.cli``. Modules the interpreter imports before running
+    any code do not.
+    """
+    return median(
+        sum(imports.values()) / 1000
+        for imports in _command_imports(command, runs)
+    )
+
+
+def command_modules(command: str) -> set:
+    """Names of the modules a subcommand imports, see command_import_time"""
+    return set(_command_imports(command, 1, nested=True)[0])
+
+
+def _best_time(func, arg, runs: int) -> float:
+    # the fastest run is the least disturbed by the rest of the machine
+    timings = []
+    for _ in range(runs):
+        calls = 0
+        start = perf_counter()
+        while True:
+            func(arg)
+            calls += 1
+            elapsed = perf_counter() - start
+            if elapsed >= MIN_TIMING:
+                break
+        timings.append(elapsed / calls)
+    return min(timings)
+
+
+def scanner_scaling(size: int = 100_000, runs: int = 5) -> list:
+    """Scanner time on adversarial inputs of size and twice size characters
+
+    Returns:
+        list: (name, ms at size, ms at twice size, ratio) per input
+    """
+    from backlinks.markdown.scanner import scan_links
+
+    results = []
+    for name, unit in ADVERSARIAL_UNITS.items():
+        small = unit * (size // len(unit))
+        small_s = _best_time(scan_links, small, runs)
+        large_s = _best_time(scan_links, small * 2, runs)
+        results.append(
+            (name, small_s * 1000, large_s * 1000, large_s / max(small_s, 1e-9))
+        )
+    return results
+
+
+def _fuzz_document(rng: random.Random) -> tuple:
+    """Random markdown and the links a correct scanner finds in it"""
+    words = ["note", "a(b)", "[x]", "(", "[", "~", "\n", " "]
+    parts, expected = [], []
+    for _ in range(rng.randint(1, 20)):
+        kind = rng.random()
+        target = f"dir/n{rng.randint(0, 99)}.md"
+        if kind < 0.3:
+            text = rng.choice(["t", "a b", "x [y] z", ""])
+            if rng.random() < 0.3:
+                target = f"https://example.com/wiki/A_(b{rng.randint(0, 9)})"
+            parts.append(f"[{text}]({target})")
+            expected.append((text, target))
+        elif kind < 0.45:
+            parts.append(f"`[code]({target})`")
+        elif kind < 0.55:
+            parts.append(f"\n```\n[fenced]({target})\n```\n")
+        else:
+            # filler that never completes a link or a code span
+            parts.append(rng.choice(words))
+        parts.append(" ")
+    return "".join(parts), expected
+
+
+def fuzz_scanner(cases: int = 2000, seed: int = 0) -> list:
+    """Checks the scanner against generated documents with known links
+
+    Returns:
+        list: the documents the scanner got wrong
+    """
+    from backlinks.markdown.scanner import scan_links
+
+    rng = random.Random(seed)
+    failures = []
+    for _ in range(cases):
+        content, expected = _fuzz_document(rng)
+        if scan_links(content) != expected:
+            failures.append(content)
+
+    # garbage must not crash it, and whatever it finds must be in the input
+    for _ in range(cases):
+        content = "".join(
+            rng.choices("[]()`~\\\n <>ab.md", k=rng.randint(0, 300))
+        )
+        try:
+            links = scan_links(content)
+        except Exception:
+            failures.append(content)
+            continue
+        if any(target not in content for _, target in links):
+            failures.append(content)
+    return failures
+
+
+def synthetic_vault(
+    path, documents: int = 2000, links: int = 5, seed: int = 0
+) -> Path:
+    """Writes a vault of documents notes linking to each other
+
+    Notes are spread over ten folders, each with front matter, a heading,
+    some text and links to links random notes.
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    for i in range(documents):
+        folder = path / f"f{i % 10}"
+        folder.mkdir(parents=True, exist_ok=True)
+        body = "\n\n".join(
+            f"Some words about note {t}, see [note {t}](../f{t % 10}/n{t}.md)."
+            for t in (rng.randrange(documents) for _ in range(links))
+        )
+        (folder / f"n{i}.md").write_text(
+            f"---\ntitle: Note {i}\ntags: [t{i % 7}]\n---\n\n"
+            f"# Note {i}\n\n{body}\n",
+            encoding="utf-8",
+        )
+    return path
+
+
+def memory_per_document(documents: int = 2000, links: int = 5) -> tuple:
+    """Memory of loading, indexing and planning a synthetic vault
+
+    The vault is written to a temporary folder, then loaded, indexed and
+    planned the way the update subcommand does, under tracemalloc.
+
+    Returns:
+        tuple: (MemoryTracker of the run, peak traced bytes per document)
+    """
+    from backlinks.collector.book import BookDictionary
+    from backlinks.core.index import LinkIndex
+    from backlinks.core.plan import plan_books
+    from backlinks.memory import MemoryTracker
+    from backlinks.progress import ProgressReporter
+
+    with tempfile.TemporaryDirectory(prefix="backlinks-bench-") as work_dir:
+        vault = synthetic_vault(Path(work_dir) / "Vault", documents, links)
+        memory = MemoryTracker()
+        book = BookDictionary(
+            vault,
+            vault.parent,
+            JSON_PATH=vault / "crosswalk.json",
+            PROGRESS=ProgressReporter("off", MEMORY=memory),
+        )
+        memory.start()
+        try:
+            book.load(store_content=False)
+            index = LinkIndex.from_books([book], book.PROGRESS)
+            plan = plan_books([book], index)
+            memory.mark("plan")
+            memory.watch("PAGES", book.PAGES)
+            memory.watch("INDEX", index)
+            memory.watch("PLAN", plan)
+        finally:
+            memory.stop()
+    return memory, memory.peak() / documents
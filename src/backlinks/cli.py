@@ -0,0 +1,774 @@
+import argparse
+import sys
+from pathlib import Path
+
+# ###
+# Variables
+# ###
+
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+# everything a subcommand imports once it runs, the cli module included
+IMPORT_BUDGET_MS = 50.0
+# peak traced memory per document of the synthetic vault benchmark
+MEMORY_BUDGET_KB = 16.0
+
+
+# ###
+# Helpers
+# ###
+def _load_book(args, scan_path=None, parse_cache=None, files=None):
+    """Loads a BookDictionary for scan_path without keeping document content
+
+    files, the ``walked`` output of an earlier load, stands in for walking
+    scan_path.
+    """
+    from backlinks.collector.book import BookDictionary
+    from backlinks.collector.cache import ParseCache
+
+    scan_path = Path(scan_path or args.scan_path).resolve()
+    if parse_cache is None and args.cache:
+        parse_cache = ParseCache(Path(args.cache))
+    book = BookDictionary(
+        scan_path,
+        scan_path.parent,
+        JSON_PATH=scan_path / "crosswalk.json",
+        PARSE_CACHE=parse_cache,
+        PROFILE=getattr(args, "parse_profile", None),
+        GIT=args.git,
+        PROGRESS=getattr(args, "progress_reporter", None),
+        FILES=files,
+    )
+    book.load(store_content=False)
+    return book
+
+
+def _load_books(args, parse_cache=None, walked=None) -> list:
+    """Loads scan_path and every --root, sharing one parse cache
+
+    walked maps a resolved root to the files of an earlier load of it, see
+    ``_load_book``.
+    """
+    from backlinks.collector.cache import ParseCache
+
+    if parse_cache is None and args.cache:
+        parse_cache = ParseCache(Path(args.cache))
+    walked = walked or {}
+    return [
+        _load_book(
+            args,
+            scan_path,
+            parse_cache,
+            walked.get(str(Path(scan_path).resolve())),
+        )
+        for scan_path in [args.scan_path, *args.root]
+    ]
+
+
+def _load_metadata(args, scan_path):
+    """Front matter store of scan_path, saved at its root between runs
+
+    Only files whose mtime or size changed since it was saved are read, the
+    store is saved again when any row changed.
+    """
+    from backlinks.collector.document import FileDictionary
+    from backlinks.collector.metadata import METADATA_FILE, MetadataStore
+    from backlinks.markdown.templates import load_template
+    from backlinks.path.path import generate_file_list
+
+    scan_path = Path(scan_path).resolve()
+    store_path = scan_path / METADATA_FILE
+    store = MetadataStore.load(store_path) or MetadataStore()
+    template = load_template(scan_path)
+
+    def load_document(md_file):
+        return FileDictionary().load_document(
+            md_file, scan_path, store_content=False, template=template
+        )
+
+    file_list = generate_file_list(scan_path, use_git=args.git)
+    if store.refresh(scan_path, file_list, load_document):
+        store.dump(store_path)
+    return store
+
+
+def _check_urls(args, index) -> dict:
+    """Status of every URL linked from index, through the URL cache"""
+    from backlinks.core.urls import (
+        URL_CACHE_FILE,
+        StubTransport,
+        UrlChecker,
+        UrlStatusCache,
+        index_urls,
+    )
+
+    cache_path = args.url_cache or Path(args.scan_path) / URL_CACHE_FILE
+    # stubbed answers are not real results, they are kept out of the cache file
+    if args.url_stub:
+        cache_path = None
+    cache = UrlStatusCache(cache_path, TTL=args.url_ttl * 3600).load()
+    checker = UrlChecker(
+        CACHE=cache,
+        MAX_PER_HOST=args.max_per_host,
+        HOST_INTERVAL=args.host_interval,
+    )
+    if args.url_stub:
+        checker.TRANSPORT = StubTransport.from_file(args.url_stub)
+    results = checker.check(index_urls(index))
+    cache.dump()
+    return results
+
+
+def _write_output(text: str, output):
+    if output:
+        from backlinks.io.locking import atomic_write
+
+        # a plan cut short would otherwise be applied as it is
+        atomic_write(output, text.encode("utf-8"))
+    else:
+        sys.stdout.write(text + "\n")
+
+
+# ###
+# Subcommands
+# ###
+# Each subcommand imports what it needs when it runs, so a single file update
+# does not pay for analytics or graph code it never touches.
+def cmd_update(args) -> int:
+    """Plan and write backlinks for a scan path"""
+    from backlinks.collector.cache import ParseCache
+    from backlinks.collector.metadata import METADATA_FILE
+    from backlinks.core.checkpoint import (
+        CHECKPOINT_DIR,
+        Checkpoint,
+        books_fingerprint,
+        fingerprint,
+    )
+    from backlinks.core.incremental import dump_index
+    from backlinks.core.index import LinkIndex
+    from backlinks.core.linkage import make_Crosslink
+    from backlinks.core.plan import (
+        apply_plan,
+        load_plan,
+        mark_applied,
+        plan_books,
+        save_plan,
+    )
+    from backlinks.logging import logging
+
+    progress = getattr(args, "progress_reporter", None)
+    checkpoint = None
+    parse_cache = None
+    if getattr(args, "checkpoint", False):
+        checkpoint_path = Path(args.scan_path).resolve() / CHECKPOINT_DIR
+        checkpoint = Checkpoint(checkpoint_path).load()
+        if checkpoint.failures():
+            logging.info(
+                f"Retrying {len(checkpoint.failures())} files that failed"
+            )
+        # parse results are the parse stage's output, keyed by content hash
+        if not args.cache:
+            parse_cache = ParseCache(checkpoint.stage_path("parse"))
+
+    # a resumed run lists the files of the last one instead of walking, and
+    # only reads those whose mtime or size changed since
+    walked = None
+    walk_key = fingerprint(
+        [str(Path(p).resolve()) for p in [args.scan_path, *args.root]],
+        args.git,
+    )
+    if checkpoint and checkpoint.done("walk", walk_key):
+        walked = checkpoint.load_stage("walk")
+    books = _load_books(args, parse_cache, walked)
+    if checkpoint:
+        checkpoint.dump_stage(
+            "walk", {str(book.PATH): book.walked() for book in books}
+        )
+        checkpoint.complete("walk", walk_key)
+    failed = {}
+    for book in books:
+        failed.update(book.FAILED)
+    key = books_fingerprint(books)
+    if checkpoint:
+        checkpoint.complete("parse", key, failed)
+
+    check_urls = getattr(args, "check_urls", False)
+    key = fingerprint(key, check_urls)
+    index = None
+    if checkpoint and checkpoint.done("crosswalk", key):
+        index = LinkIndex.load(checkpoint.stage_path("crosswalk"))
+    if index is None:
+        index = LinkIndex.from_books(books, progress)
+        url_status = _check_urls(args, index) if check_urls else None
+        for book in books:
+            make_Crosslink(book, index, url_status)
+            book.STORAGE_ENGINE.dump(book.JSON_PATH)
+        if checkpoint:
+            index.dump(checkpoint.stage_path("crosswalk"))
+            checkpoint.complete("crosswalk", key)
+    memory = getattr(args, "memory_tracker", None)
+    if memory is not None:
+        memory.mark("crosswalk")
+
+    # a file that failed to load still links out, its links are only unknown
+    prune = not args.keep_stale and not failed
+    if failed and not args.keep_stale:
+        logging.warning("Keeping stale backlinks, some files failed to load")
+    key = fingerprint(key, prune)
+    if checkpoint and checkpoint.done("plan", key):
+        plan = load_plan(checkpoint.stage_path("plan"))
+    else:
+        plan = plan_books(books, index, prune=prune)
+        if checkpoint:
+            save_plan(plan, checkpoint.stage_path("plan"))
+            checkpoint.complete("plan", key)
+    if memory is not None:
+        memory.mark("plan")
+        memory.watch("PAGES", [book.PAGES for book in books])
+        memory.watch(
+            "CONTENT",
+            [
+                doc.get("CONTENT", "")
+                for book in books
+                for doc in book.PAGES.values()
+                if doc is not None
+            ],
+        )
+        memory.watch(
+            "CROSSLINK", [book.STORAGE_ENGINE.CROSSLINK for book in books]
+        )
+        memory.watch("INDEX", index)
+        memory.watch("PLAN", plan)
+
+    write_failed = {}
+    skipped = apply_plan(plan, progress=progress, failed=write_failed)
+    # the index lets the files subcommand skip the full scan next time
+    mark_applied(index, plan, skipped)
+    dump_index(index, [book.PATH for book in books])
+    # the query subcommand answers from it without loading the vault
+    for book in books:
+        for change in plan["FILES"]:
+            if change["REL_PATH"] not in skipped:
+                book.METADATA.touch(change["REL_PATH"], change["PATH"])
+        book.METADATA.dump(Path(book.PATH) / METADATA_FILE)
+    failed.update(write_failed)
+    if checkpoint:
+        if failed or skipped:
+            checkpoint.complete("write", key, write_failed)
+            logging.warning(
+                f"{len(failed)} files failed, {len(skipped)} were not "
+                f"written, run again with --checkpoint to retry them"
+            )
+        else:
+            checkpoint.clear()
+    return 1 if skipped or failed else 0
+
+
+def cmd_files(args) -> int:
+    """Update only the backlinks implied by a list of changed files"""
+    from backlinks.core.incremental import (
+        git_changed_files,
+        read_file_list,
+        update_files,
+    )
+
+    changed_files = read_file_list(args.files)
+    if args.stdin:
+        changed_files += read_file_list(sys.stdin)
+    if args.git_diff or args.staged or args.since:
+        changed_files += git_changed_files(
+            args.scan_path, staged=args.staged, since=args.since
+        )
+
+    skipped = update_files(
+        args.scan_path, changed_files, prune=not args.keep_stale
+    )
+    if skipped is None:
+        return cmd_update(args)
+    return 1 if skipped else 0
+
+
+def cmd_plan(args) -> int:
+    """Write the pending backlinks changes as json, without touching files"""
+    from json import dumps
+
+    from backlinks.core.plan import plan_books
+
+    plan = plan_books(_load_books(args), prune=not args.keep_stale)
+    _write_output(dumps(plan, indent=4), args.output)
+    return 0
+
+
+def cmd_urls(args) -> int:
+    """Check the URLs linked from the vault and list the broken ones"""
+    from json import dumps
+
+    from backlinks.core.index import LinkIndex
+    from backlinks.core.urls import broken_urls
+
+    index = LinkIndex.from_books(_load_books(args))
+    results = _check_urls(args, index)
+    broken = broken_urls(index, results)
+    report = {
+        "URLS": results,
+        "BROKEN": {index.PATHS[i]: urls for i, urls in broken.items()},
+    }
+    _write_output(dumps(report, indent=4), args.output)
+    return 1 if broken else 0
+
+
+def cmd_query(args) -> int:
+    """List documents by tag, link, date and front matter, as json"""
+    from json import dumps
+
+    from backlinks.collector.metadata import METADATA_FILE
+    from backlinks.core.index import LinkIndex
+
+    index = None
+    if args.links_to or args.linked_from:
+        # link filters need the links of every document, the vault is loaded
+        books = _load_books(args)
+        index = LinkIndex.from_books(books)
+        stores = [book.METADATA for book in books]
+        for book in books:
+            book.METADATA.dump(Path(book.PATH) / METADATA_FILE)
+    else:
+        stores = [
+            _load_metadata(args, scan_path)
+            for scan_path in [args.scan_path, *args.root]
+        ]
+    where = dict(condition.split("=", 1) for condition in args.where)
+    rows = []
+    for store in stores:
+        rows += store.query(
+            index=index,
+            tags=args.tag,
+            any_tags=args.any_tag,
+            links_to=args.links_to,
+            linked_from=args.linked_from,
+            after=args.after,
+            before=args.before,
+            date_field=args.date_field,
+            where=where,
+            fields=args.fields,
+        )
+    _write_output(dumps(rows, indent=4), args.output)
+    return 0
+
+
+def cmd_apply(args) -> int:
+    """Write a plan saved by the plan subcommand"""
+    from backlinks.core.plan import apply_plan, load_plan
+
+    skipped = apply_plan(
+        load_plan(args.plan),
+        progress=getattr(args, "progress_reporter", None),
+    )
+    return 1 if skipped else 0
+
+
+def cmd_graph(args) -> int:
+    """Print a Mermaid graph of the links"""
+    from backlinks.core.index import LinkIndex
+    from backlinks.io.mermaid import mermaid_graph
+
+    index = LinkIndex.from_books(_load_books(args))
+    chart = mermaid_graph(
+        index,
+        focus=args.focus,
+        hops=args.hops,
+        cluster=not args.no_cluster,
+        max_nodes=args.max_nodes,
+        max_edges=args.max_edges,
+        direction=args.direction,
+    )
+    _write_output(chart, args.output)
+    return 0
+
+
+def cmd_analytics(args) -> int:
+    """Write degree, PageRank and component metrics to CSV"""
+    from backlinks.core.analytics import analyse, save_analytics_report
+    from backlinks.core.index import LinkIndex
+
+    index = LinkIndex.from_books(_load_books(args))
+    save_analytics_report(args.output, index, analyse(index))
+    return 0
+
+
+def cmd_serve(args) -> int:
+    """Keep the link index in memory and answer queries over a socket or HTTP"""
+    from backlinks.collector.cache import ParseCache
+    from backlinks.server import DEFAULT_PORT, LinkService, serve
+
+    service = LinkService(
+        args.scan_path,
+        ROOTS=args.root,
+        GIT=args.git,
+        PARSE_CACHE=ParseCache(Path(args.cache)) if args.cache else None,
+    )
+    service.load()
+    port = args.port
+    if port is None and not args.socket:
+        port = DEFAULT_PORT
+    serve(
+        service,
+        socket_path=args.socket,
+        host=args.host,
+        port=port,
+        interval=args.refresh,
+    )
+    return 0
+
+
+def cmd_bench(args) -> int:
+    """Measure subcommand import time, link scanner worst cases or memory"""
+    if args.scanner:
+        return _bench_scanner(args)
+    if args.vault:
+        return _bench_memory(args)
+
+    from backlinks.bench import (
+        STARTUP_COMMANDS,
+        command_import_time,
+        import_time,
+    )
+
+    budget_ms = args.budget_ms
+    if args.module:
+        timings = {args.module: import_time(args.module, runs=args.runs)}
+    else:
+        timings = {
+            command: command_import_time(command, runs=args.runs)
+            for command in args.command or STARTUP_COMMANDS
+        }
+    status = 0
+    for name, median_ms in timings.items():
+        print(f"{name}: {median_ms:.1f} ms median cold import")
+        if median_ms > budget_ms:
+            print(
+                f"{name} is over the {budget_ms:.1f} ms budget", file=sys.stderr
+            )
+            status = 1
+    return status
+
+
+def _bench_scanner(args) -> int:
+    from backlinks.bench import MAX_SCALING, fuzz_scanner, scanner_scaling
+
+    status = 0
+    print(f"{'input':<16} {'ms':>10} {'ms at 2x':>10} {'ratio':>6}")
+    for name, small_ms, large_ms, ratio in scanner_scaling(args.size):
+        print(f"{name:<16} {small_ms:10.1f} {large_ms:10.1f} {ratio:6.2f}")
+        if ratio > MAX_SCALING:
+            print(f"{name} scales worse than linear", file=sys.stderr)
+            status = 1
+
+    failures = fuzz_scanner(args.fuzz_cases)
+    print(f"{len(failures)} of {2 * args.fuzz_cases} fuzz cases failed")
+    for content in failures[:5]:
+        print(repr(content), file=sys.stderr)
+    return 1 if failures else status
+
+
+def _bench_memory(args) -> int:
+    from backlinks.bench import memory_per_document
+
+    memory, per_document = memory_per_document(args.documents, args.links)
+    print(memory.report())
+    print(
+        f"{args.documents} documents: {per_document / 1024:.1f} KB peak "
+        f"traced memory per document"
+    )
+    if per_document > args.budget_kb * 1024:
+        print(f"Over the {args.budget_kb:.1f} KB budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+# ###
+# Parser
+# ###
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="backlinks", description="Generate backlinks for markdown files"
+    )
+    parser.add_argument(
+        "--log-level", choices=LOG_LEVELS, default="INFO", help="Logging level"
+    )
+    parser.add_argument("--log-file", help="Log file path (optional)")
+    parser.add_argument(
+        "--progress",
+        choices=["auto", "bar", "log", "off"],
+        default="auto",
+        help="Report progress as a bar, as log lines or not at all. auto "
+        "draws a bar on a terminal and logs otherwise.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="backlinks.pstats",
+        help="Run under cProfile and save the stats (default backlinks.pstats)",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        help="Functions and files listed by --profile and --memory",
+    )
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Trace memory with tracemalloc and report each stage's peak, "
+        "peak RSS and top allocating lines. Slows the run down.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    vault_parser = argparse.ArgumentParser(add_help=False)
+    vault_parser.add_argument("scan_path", help="Folder path to scan")
+    vault_parser.add_argument("--cache", help="Parse cache file (optional)")
+    vault_parser.add_argument(
+        "--git",
+        action="store_true",
+        help="List files and content hashes from the git index",
+    )
+    vault_parser.add_argument(
+        "--root",
+        action="append",
+        default=[],
+        help="Another vault indexed with scan_path, links between them resolve"
+        " (repeatable)",
+    )
+    # the options of subcommands that write or plan backlinks
+    scan_parser = argparse.ArgumentParser(
+        add_help=False, parents=[vault_parser]
+    )
+    scan_parser.add_argument(
+        "--keep-stale",
+        action="store_true",
+        help="Keep backlinks whose source no longer links to the file",
+    )
+
+    url_parser = argparse.ArgumentParser(add_help=False)
+    url_parser.add_argument(
+        "--url-cache",
+        help="URL status cache, scan_path/.backlinks_urls.json by default",
+    )
+    url_parser.add_argument(
+        "--url-ttl",
+        type=float,
+        default=168.0,
+        help="Hours a checked URL is not checked again",
+    )
+    url_parser.add_argument(
+        "--url-stub",
+        help="Answer URL checks from a json file of url -> status, offline."
+        " The URL cache is neither read nor written",
+    )
+    url_parser.add_argument(
+        "--max-per-host",
+        type=int,
+        default=4,
+        help="Requests in flight to one host",
+    )
+    url_parser.add_argument(
+        "--host-interval",
+        type=float,
+        default=0.25,
+        help="Seconds between requests to one host",
+    )
+
+    sub = subparsers.add_parser(
+        "update", parents=[scan_parser, url_parser], help=cmd_update.__doc__
+    )
+    sub.add_argument(
+        "--check-urls",
+        action="store_true",
+        help="Check URLs and record their status in crosswalk.json",
+    )
+    sub.add_argument(
+        "--checkpoint",
+        action="store_true",
+        help="Save each completed stage in scan_path/.backlinks_checkpoint "
+        "and resume from it, retrying only the files that failed",
+    )
+    sub.set_defaults(func=cmd_update)
+
+    sub = subparsers.add_parser(
+        "files", parents=[scan_parser], help=cmd_files.__doc__
+    )
+    sub.add_argument("files", nargs="*", help="Changed markdown files")
+    sub.add_argument(
+        "--stdin", action="store_true", help="Read file paths from stdin"
+    )
+    sub.add_argument(
+        "--git-diff", action="store_true", help="Files changed against HEAD"
+    )
+    sub.add_argument(
+        "--staged", action="store_true", help="Files staged for commit"
+    )
+    sub.add_argument(
+        "--since", help="Files changed since a revision, e.g. ORIG_HEAD"
+    )
+    sub.set_defaults(func=cmd_files)
+
+    sub = subparsers.add_parser(
+        "plan", parents=[scan_parser], help=cmd_plan.__doc__
+    )
+    sub.add_argument("-o", "--output", help="Plan file, stdout by default")
+    sub.set_defaults(func=cmd_plan)
+
+    sub = subparsers.add_parser(
+        "urls", parents=[scan_parser, url_parser], help=cmd_urls.__doc__
+    )
+    sub.add_argument("-o", "--output", help="Report file, stdout by default")
+    sub.set_defaults(func=cmd_urls)
+
+    sub = subparsers.add_parser(
+        "query", parents=[scan_parser], help=cmd_query.__doc__
+    )
+    sub.add_argument(
+        "--tag", action="append", default=[], help="Required tag (repeatable)"
+    )
+    sub.add_argument(
+        "--any-tag",
+        action="append",
+        default=[],
+        help="Documents need one of these tags (repeatable)",
+    )
+    sub.add_argument("--links-to", help="Scan-relative path linked to")
+    sub.add_argument("--linked-from", help="Scan-relative path linking in")
+    sub.add_argument("--after", help="Earliest date, YYYY-MM-DD")
+    sub.add_argument("--before", help="Latest date, YYYY-MM-DD")
+    sub.add_argument(
+        "--date-field",
+        default="PUBLISHED",
+        help="Front matter date --after and --before apply to",
+    )
+    sub.add_argument(
+        "--where",
+        action="append",
+        default=[],
+        help="FIELD=VALUE front matter match (repeatable)",
+    )
+    sub.add_argument(
+        "--fields", nargs="+", help="Fields listed, TITLE TAGS PUBLISHED DATE"
+    )
+    sub.add_argument("-o", "--output", help="Output file, stdout by default")
+    sub.set_defaults(func=cmd_query)
+
+    sub = subparsers.add_parser("apply", help=cmd_apply.__doc__)
+    sub.add_argument("plan", help="Plan file written by the plan subcommand")
+    sub.set_defaults(func=cmd_apply)
+
+    sub = subparsers.add_parser(
+        "graph", parents=[scan_parser], help=cmd_graph.__doc__
+    )
+    sub.add_argument("--focus", help="Scan-relative path to center on")
+    sub.add_argument("--hops", type=int, default=1)
+    sub.add_argument("--max-nodes", type=int, default=200)
+    sub.add_argument("--max-edges", type=int, default=1000)
+    sub.add_argument("--direction", default="TD")
+    sub.add_argument("--no-cluster", action="store_true")
+    sub.add_argument("-o", "--output", help="Output file, stdout by default")
+    sub.set_defaults(func=cmd_graph)
+
+    sub = subparsers.add_parser(
+        "analytics", parents=[scan_parser], help=cmd_analytics.__doc__
+    )
+    sub.add_argument("-o", "--output", default="link_analytics.csv")
+    sub.set_defaults(func=cmd_analytics)
+
+    sub = subparsers.add_parser(
+        "serve", parents=[vault_parser], help=cmd_serve.__doc__
+    )
+    sub.add_argument("--socket", help="Unix socket path")
+    sub.add_argument(
+        "--port", type=int, help="HTTP port, used by default when no socket"
+    )
+    sub.add_argument("--host", default="127.0.0.1", help="HTTP address")
+    sub.add_argument(
+        "--refresh",
+        type=float,
+        default=2.0,
+        help="Seconds between checks for changed files, 0 to disable",
+    )
+    sub.set_defaults(func=cmd_serve)
+
+    sub = subparsers.add_parser("bench", help=cmd_bench.__doc__)
+    sub.add_argument(
+        "--command",
+        action="append",
+        help="Subcommand whose imports are timed (repeatable). Defaults to "
+        "files, update, plan and query",
+    )
+    sub.add_argument(
+        "--module",
+        help="Time importing this module instead, e.g. backlinks.cli",
+    )
+    sub.add_argument("--runs", type=int, default=7)
+    sub.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    sub.add_argument(
+        "--scanner",
+        action="store_true",
+        help="Time the link scanner on adversarial input and fuzz it instead",
+    )
+    sub.add_argument("--size", type=int, default=100_000)
+    sub.add_argument("--fuzz-cases", type=int, default=2000)
+    sub.add_argument(
+        "--vault",
+        action="store_true",
+        help="Measure memory per document on a synthetic vault instead",
+    )
+    sub.add_argument("--documents", type=int, default=2000)
+    sub.add_argument("--links", type=int, default=5, help="Links per document")
+    sub.add_argument("--budget-kb", type=float, default=MEMORY_BUDGET_KB)
+    sub.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    from backlinks.logging.logging import setup_logging
+
+    setup_logging(args.log_level, args.log_file)
+
+    from backlinks.progress import ProgressReporter
+
+    args.memory_tracker = None
+    if args.memory:
+        from backlinks.memory import MemoryTracker
+
+        args.memory_tracker = MemoryTracker(TOP=args.profile_top).start()
+    args.progress_reporter = ProgressReporter(
+        args.progress, MEMORY=args.memory_tracker
+    )
+    if args.memory_tracker is None:
+        return _run(args)
+    try:
+        return _run(args)
+    finally:
+        args.memory_tracker.mark(args.command)
+        args.memory_tracker.stop()
+        print(args.memory_tracker.report(), file=sys.stderr)
+
+
+def _run(args) -> int:
+    """Runs the subcommand, under cProfile with --profile"""
+    if not args.profile:
+        return args.func(args)
+
+    from backlinks.profiling import ParseProfile, profile_call
+
+    args.parse_profile = ParseProfile()
+    status = profile_call(
+        args.func, args, stats_path=args.profile, top=args.profile_top
+    )
+    if args.parse_profile:
+        print(args.parse_profile.report(args.profile_top), file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,21 @@
 # Defining the all module for backlinks io
-__all__ = ["callabledict", "book", "document"]
+__all__ = ["callabledict", "book", "cache", "document", "metadata"]
 
-from backlinks.collector.book import BookDictionary
-from backlinks.collector.callabledict import CallableDict
-from backlinks.collector.document import FileDictionary
+from importlib import import_module
+
+# classes are loaded on first use, importing the package stays cheap
+_LAZY_NAMES = {
+    "BookDictionary": "backlinks.collector.book",
+    "ParseCache": "backlinks.collector.cache",
+    "CallableDict": "backlinks.collector.callabledict",
+    "FileDictionary": "backlinks.collector.document",
+    "MetadataStore": "backlinks.collector.metadata",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        return getattr(import_module(_LAZY_NAMES[name]), name)
+    if name in __all__:
+        return import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
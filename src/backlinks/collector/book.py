@@ -1,12 +1,24 @@
 from dataclasses import dataclass, field
 
 # from json import dump, load
+from os import stat
 from pathlib import Path
+from time import perf_counter
 from typing import Any
 
+from backlinks.collector.cache import ParseCache
 from backlinks.collector.document import FileDictionary, JsonDictionary
+from backlinks.collector.metadata import MetadataStore
 from backlinks.logging import logging
-from backlinks.path.path import empty_path, generate_file_list
+from backlinks.markdown.templates import BacklinksTemplate, load_template
+from backlinks.path.path import (
+    empty_path,
+    generate_file_list,
+    get_scan_relative_path,
+    git_file_list,
+)
+from backlinks.profiling import ParseProfile
+from backlinks.progress import QUIET, ProgressReporter
 
 # ###
 # Variables
@@ -30,16 +42,31 @@ class BookDictionary:
         PATH (Path): the invocation pint of the program
         root_path (Path): the root path of the scan
         documents (dict): A dictionary of DocumentDictionary objects
+        FAILED (dict): scan-relative path -> error of the files that failed
+            to load, they are left out of PAGES rather than ending the load
+        FILES (dict): path -> [mtime, size, content hash] from an earlier
+            load (see ``walked``), listed instead of walking the root. Files
+            whose mtime and size are unchanged keep their hash, so with a
+            parse cache they are not read at all. Files added since are not
+            seen.
     """
 
     PATH: Path
     ROOT_PATH: Path
-    DOCUMENT_COLLECTOR: FileDictionary
-    STORAGE_ENGINE: JsonDictionary
-    JSON_PATH: Path = field(defauly=Path("./crosswalk.json"))
-    PAGES: dict[Path, Any] = field(default=dict)
-    SAVE_PATH: Path = field(defauly=Path())
-    CROSSLINK: dict = field(default={"CROSSLINK": []})
+    DOCUMENT_COLLECTOR: type = FileDictionary
+    STORAGE_ENGINE: JsonDictionary = field(default_factory=JsonDictionary)
+    JSON_PATH: Path = field(default=Path("./crosswalk.json"))
+    PAGES: dict[Path, Any] = field(default_factory=dict)
+    SAVE_PATH: Path = field(default=Path())
+    CROSSLINK: dict = field(default_factory=lambda: {"CROSSLINK": []})
+    PARSE_CACHE: ParseCache = None
+    PROFILE: ParseProfile = None
+    GIT: bool = False
+    METADATA: MetadataStore = field(default_factory=MetadataStore)
+    TEMPLATE: BacklinksTemplate = None
+    PROGRESS: ProgressReporter = None
+    FAILED: dict = field(default_factory=dict)
+    FILES: dict = None
 
     def load(
         self,
@@ -47,26 +74,152 @@ class BookDictionary:
         set_value: dict = None,
         store_content: bool = True,
     ):
-        """Loads the book structure by scanning the root path for markdown files"""
+        """Loads the book structure by scanning the root path for markdown files
+
+        Args:
+            default_value (dict, optional): values for fields a document leaves empty
+            set_value (dict, optional): values forced onto every document
+            store_content (bool, optional): keep each document's text in memory.
+                When False only metadata, links and section offsets are kept and
+                the content is re-read on demand (see ``rehydrate``).
+                Defaults to True.
+        """
         if self.JSON_PATH.exists():
-            self.STORAGE_ENGINE(PATH=self.JSON_PATH)
-            self.STORAGE_ENGINE.load()
+            self.STORAGE_ENGINE.load(self.JSON_PATH)
 
         if self.PAGES:
             return None
 
-        self.PAGES = dict.fromkeys(generate_file_list(self.PATH), None)
+        if self.PARSE_CACHE is not None and self.PARSE_CACHE.PATH:
+            self.PARSE_CACHE.load()
+
+        scan_path = Path(self.PATH).resolve()
+        if self.TEMPLATE is None:
+            self.TEMPLATE = load_template(scan_path)
+        manifest = self.STORAGE_ENGINE.CROSSLINK.setdefault("ITEMS", {})
+        # blob hashes from git let cached documents skip being read at all
+        if self.FILES is not None:
+            known_hashes = self._unchanged_hashes()
+        else:
+            known_hashes = git_file_list(scan_path) if self.GIT else None
+        if known_hashes is None:
+            known_hashes = dict.fromkeys(generate_file_list(scan_path))
+        self.PAGES = dict.fromkeys(known_hashes, None)
+        progress = (self.PROGRESS or QUIET).stage("read", len(self.PAGES))
         for md_file in self.PAGES.keys():
             logging.debug(f"Processing markdown file: {md_file}")
             # Further processing can be added here
             try:
-                DC = self.DOCUMENT_COLLECTOR.copy()
+                start = perf_counter()
+                DC = self.DOCUMENT_COLLECTOR()
                 self.PAGES[md_file] = DC.load_document(
                     md_file,
-                    self.PATH,
-                    default_value=default_value,
+                    scan_path,
+                    default_values=default_value,
                     set_values=set_value,
                     store_content=store_content,
+                    parse_cache=self.PARSE_CACHE,
+                    known_hash=known_hashes[md_file],
+                    template=self.TEMPLATE,
                 )
+                if self.PROFILE is not None:
+                    self.PROFILE.record(
+                        DC["REL_PATH"],
+                        perf_counter() - start,
+                        DC["SIZE"],
+                        len(DC["LINKS"]),
+                    )
+                self.METADATA.add(DC)
+                manifest[DC["REL_PATH"]] = {
+                    "HASH": DC["HASH"],
+                    "SIZE": DC["SIZE"],
+                    "MTIME": DC["MTIME"],
+                }
+                progress.advance(bytes=DC["SIZE"], links=len(DC["LINKS"]))
             except Exception as e:
-                logging.error(f"Exception found: {e}")
+                logging.error(f"Failed to load {md_file}: {e}")
+                self.PAGES[md_file] = None
+                rel_path = get_scan_relative_path(md_file, scan_path)
+                self.FAILED[rel_path] = f"{type(e).__name__}: {e}"
+        progress.close()
+        if self.FAILED:
+            logging.warning(f"{len(self.FAILED)} files failed to load")
+
+        if self.PARSE_CACHE is not None and self.PARSE_CACHE.PATH:
+            self.PARSE_CACHE.dump()
+
+    def walked(self) -> dict:
+        """What loading found, the FILES a later load can start from
+
+        Returns:
+            dict: path -> [mtime, size, content hash], None for files that
+                failed to load
+        """
+        return {
+            str(md_file): (
+                None
+                if doc is None
+                else [doc["MTIME"], doc["SIZE"], doc["HASH"]]
+            )
+            for md_file, doc in self.PAGES.items()
+        }
+
+    def _unchanged_hashes(self) -> dict:
+        known_hashes = {}
+        for md_file, walked in self.FILES.items():
+            try:
+                file_stat = stat(md_file)
+            except FileNotFoundError:
+                continue
+            unchanged = walked is not None and walked[:2] == [
+                file_stat.st_mtime,
+                file_stat.st_size,
+            ]
+            known_hashes[Path(md_file)] = walked[2] if unchanged else None
+        return known_hashes
+
+    def query(self, index=None, **filters) -> list:
+        """Documents of the book matching front matter and link filters
+
+        Answered from METADATA, which is filled while loading, so no file is
+        read. See MetadataStore.query for the filters.
+
+        Args:
+            index (LinkIndex, optional): link index of the book, built when a
+                link filter needs one. Pass it in when querying repeatedly.
+
+        Returns:
+            list: path and fields of each matching document
+        """
+        if index is None and (
+            filters.get("links_to") or filters.get("linked_from")
+        ):
+            from backlinks.core.index import LinkIndex
+
+            index = LinkIndex.from_book(self)
+        return self.METADATA.query(index=index, **filters)
+
+    def rehydrate(self, verify: bool = True) -> list:
+        """Re-reads the content of every document flagged NEED2UPDATE
+
+        Args:
+            verify (bool, optional): check the content against the manifest hash.
+                Defaults to True.
+
+        Returns:
+            list: the documents that had their content loaded
+        """
+        rehydrated = []
+        for md_file, doc in self.PAGES.items():
+            if doc is None or not doc["NEED2UPDATE"]:
+                continue
+            doc.load_content(verify=verify)
+            rehydrated.append(doc)
+        logging.info(f"Rehydrated content for {len(rehydrated)} documents")
+        return rehydrated
+
+    def release_content(self):
+        """Drops stored content from documents that are not waiting on an update"""
+        for doc in self.PAGES.values():
+            if doc is not None and not doc["NEED2UPDATE"]:
+                doc.delete_content()
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from json import dumps, load
+from pathlib import Path
+
+from backlinks.io.locking import atomic_write
+from backlinks.logging import logging
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+CACHE_VERSION = 7
+MAX_ENTRIES = 50000
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class ParseCache:
+    """A content addressed cache of document parse results
+
+    Results are keyed by the hash of the raw file bytes, so every document
+    with the same content shares one entry. Entries only hold what was parsed
+    out of the content (links as written, front-matter, section offsets);
+    anything depending on where the file lives is worked out per document.
+    The least recently used entries are evicted past MAX_ENTRIES.
+
+    Args:
+        PATH (Path): json file the cache persists to, None to keep it in memory
+        MAX_ENTRIES (int): the most entries kept
+        ENTRIES (OrderedDict): hash -> parse result, oldest first
+    """
+
+    PATH: Path = None
+    MAX_ENTRIES: int = MAX_ENTRIES
+    ENTRIES: OrderedDict = field(default_factory=OrderedDict)
+    HITS: int = 0
+    MISSES: int = 0
+
+    def __len__(self) -> int:
+        return len(self.ENTRIES)
+
+    def get(self, content_hash: str):
+        """Returns the parse result for content_hash, None when missing"""
+        result = self.ENTRIES.get(content_hash)
+        if result is None:
+            self.MISSES += 1
+            return None
+        self.ENTRIES.move_to_end(content_hash)
+        self.HITS += 1
+        return result
+
+    def put(self, content_hash: str, result: dict):
+        """Stores a parse result, evicting the least recently used entries"""
+        self.ENTRIES[content_hash] = result
+        self.ENTRIES.move_to_end(content_hash)
+        while len(self.ENTRIES) > self.MAX_ENTRIES:
+            self.ENTRIES.popitem(last=False)
+
+    def load(self, file_path: Path = None):
+        """Load cache entries from a json file, a missing file is an empty cache"""
+        file_path = Path(file_path or self.PATH)
+        if not file_path.exists():
+            logging.info(f"No parse cache found at {file_path}, starting fresh")
+            return self
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = load(f)
+        if data.get("VERSION") != CACHE_VERSION:
+            logging.info(f"Ignoring out of date parse cache {file_path}")
+            return self
+        self.ENTRIES = OrderedDict(data["ENTRIES"])
+        while len(self.ENTRIES) > self.MAX_ENTRIES:
+            self.ENTRIES.popitem(last=False)
+        logging.debug(f"Loaded {len(self.ENTRIES)} parse cache entries")
+        return self
+
+    def dump(self, file_path: Path = None):
+        """Dump cache entries to a json file"""
+        file_path = Path(file_path or self.PATH)
+        data = {"VERSION": CACHE_VERSION, "ENTRIES": self.ENTRIES}
+        atomic_write(file_path, dumps(data).encode("utf-8"))
+        logging.info(
+            f"Saved {len(self.ENTRIES)} parse cache entries to {file_path} "
+            f"({self.HITS} hits, {self.MISSES} misses)"
+        )
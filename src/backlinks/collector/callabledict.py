@@ -1,5 +1,4 @@
-from collections.abc import MutableMapping
-from typing import Any, Iterator, Mapping, Optional
+from collections.abc import Iterator, Mapping, MutableMapping
 
 
 class CallableDict(MutableMapping):
@@ -18,14 +17,12 @@ class CallableDict(MutableMapping):
     on `__getitem__`.
     """
 
-    def __init__(
-        self, mapping: Optional[Mapping] = None, *, call_on_get: bool = True
-    ):
+    def __init__(self, mapping: Mapping = None, *, call_on_get: bool = True):
         self._store = dict(mapping) if mapping is not None else {}
         self.call_on_get = bool(call_on_get)
 
     # MutableMapping required methods
-    def __getitem__(self, key: Any) -> Any:
+    def __getitem__(self, key: object) -> object:
         try:
             val = self._store[key]
         except KeyError as e:
@@ -35,10 +32,10 @@ class CallableDict(MutableMapping):
             return val()
         return val
 
-    def __setitem__(self, key: Any, value: Any) -> None:
+    def __setitem__(self, key: object, value: object) -> None:
         self._store[key] = value
 
-    def __delitem__(self, key: Any) -> None:
+    def __delitem__(self, key: object) -> None:
         del self._store[key]
 
     def __iter__(self) -> Iterator:
@@ -57,11 +54,11 @@ class CallableDict(MutableMapping):
         return str(self._store)
 
     # Convenience helpers
-    def raw(self, key: Any) -> Any:
+    def raw(self, key: object) -> object:
         """Return the stored value for `key` without calling it."""
         return self._store[key]
 
-    def call(self, key: Any, *args, **kwargs) -> Any:
+    def call(self, key: object, *args, **kwargs) -> object:
         """Call the stored callable for `key` with given args/kwargs.
 
         Raises a TypeError if the stored value is not callable.
@@ -72,7 +69,7 @@ class CallableDict(MutableMapping):
         return val(*args, **kwargs)
 
     # Attribute-style access: d.foo -> d['foo'] behavior
-    def __getattr__(self, name: str) -> Any:
+    def __getattr__(self, name: str) -> object:
         if name.startswith("_"):
             raise AttributeError(name)
         try:
@@ -80,7 +77,7 @@ class CallableDict(MutableMapping):
         except KeyError as exc:
             raise AttributeError(name) from exc
 
-    def __setattr__(self, name: str, value: Any) -> None:
+    def __setattr__(self, name: str, value: object) -> None:
         # Keep internal attributes as real attributes
         if name in {"_store", "call_on_get"}:
             object.__setattr__(self, name, value)
@@ -90,7 +87,7 @@ class CallableDict(MutableMapping):
             # Non-internal attribute assignment maps to setting a key
             self[name] = value
 
-    def get(self, key, default_value) -> Any:
+    def get(self, key, default_value) -> object:
         """function to replicate the dict.get"""
         if self[key]:
             return self[key]
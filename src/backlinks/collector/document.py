@@ -1,12 +1,24 @@
+from copy import deepcopy
 from dataclasses import dataclass, field
-from json import dump, load
+from json import dumps, load
+from os import stat, urandom
 from pathlib import Path
-from secrets import token_hex
 
-from backlinks.collector import CallableDict
+from backlinks.collector.callabledict import CallableDict
+from backlinks.io.locking import atomic_write
+from backlinks.io.markdown import content_hash, read_markdown_bytes
 from backlinks.lib import type_of_link
 from backlinks.logging import logging
-from backlinks.markdown.markdown import add_backlinks_section, get_links
+from backlinks.markdown.markdown import (
+    BACKLINKS_REGEX,
+    add_backlinks_section,
+    find_backlinks_bounds,
+    find_first_heading,
+    get_links,
+    heading_slugs,
+)
+from backlinks.markdown.snippets import SnippetBuffer
+from backlinks.markdown.templates import DEFAULT_HEADING, BacklinksTemplate
 from backlinks.path.path import empty_path, get_scan_relative_path
 from backlinks.yaml import meta_to_dict
 
@@ -25,6 +37,14 @@ DOCUMENT_FIELDS = {
     "LINKS_PATH": [],
     "NEED2UPDATE": False,
     "CONTENT": "",
+    "HASH": "",
+    "SIZE": 0,
+    "MTIME": 0.0,
+    "SECTIONS": {"BACKLINKS": -1},
+    "HEADERS": [],
+    "HEADING": None,
+    "ANCHORS": [],
+    "SNIPPETS": {},
     # "ID": None,
     # "DESCRIPTION": "",
     # "TAGS": [],
@@ -37,7 +57,11 @@ DOCUMENT_FIELDS = {
 
 
 def id():
-    return token_hex(nbytes=16)
+    return urandom(16).hex()
+
+
+class StaleDocumentError(RuntimeError):
+    """Raised when a document changed on disk after it was loaded"""
 
 
 ###
@@ -54,8 +78,8 @@ class FileDictionary(CallableDict):
 
     def __init__(self, initial_data=None, call_on_get=False):
         if initial_data is None or not isinstance(initial_data, dict):
-            initial_data = DOCUMENT_FIELDS.copy()
-        super().__init__(initial_data=initial_data, call_on_get=call_on_get)
+            initial_data = deepcopy(DOCUMENT_FIELDS)
+        super().__init__(initial_data, call_on_get=call_on_get)
         # self.MARKDOWN_HEADER_FINDERR = r"title:.*"
         self.document_type = "markdown"
         self.update_content = False
@@ -82,6 +106,12 @@ class FileDictionary(CallableDict):
         """
         if self.document_type == "markdown":
             LNK, BACKLNK = get_links(*args, **kwargs)
+            # only documents belong in a backlinks section
+            BACKLNK = {
+                lnk: lnk_type
+                for lnk, lnk_type in BACKLNK.items()
+                if lnk_type == "MARKDOWN"
+            }
             self["LINKS"] = LNK
             self["BACKLINKS"] = BACKLNK
             if len(BACKLNK) > 0:
@@ -95,17 +125,47 @@ class FileDictionary(CallableDict):
             header = meta_to_dict(*args, **kwargs)
         for x in header.keys():
             self[x] = header[x]
+        self["HEADERS"] = list(header.keys())
+
+    def parse_result(self) -> dict:
+        """The parts of the document worked out purely from its content"""
+        return {
+            "LINKS": dict(self["LINKS"]),
+            "BACKLINKS": dict(self["BACKLINKS"]),
+            "HEADERS": {x: self[x] for x in self["HEADERS"]},
+            "SECTIONS": dict(self["SECTIONS"]),
+            "HEADING": self["HEADING"],
+            "ANCHORS": list(self["ANCHORS"]),
+            "SNIPPETS": self["SNIPPETS"],
+        }
+
+    def apply_parse_result(self, result: dict) -> None:
+        """Populates links, headers and sections from a cached parse result"""
+        self["LINKS"] = dict(result["LINKS"])
+        self["BACKLINKS"] = dict(result["BACKLINKS"])
+        if len(self["BACKLINKS"]) > 0:
+            self["BACKLINKS_PATH"] = self["BACKLINKS"].keys()
+        if len(self["LINKS"]) > 0:
+            self["LINKS_PATH"] = self["LINKS"].keys()
+        for x, v in result["HEADERS"].items():
+            self[x] = v
+        self["HEADERS"] = list(result["HEADERS"])
+        self["SECTIONS"] = dict(result["SECTIONS"])
+        self["HEADING"] = result["HEADING"]
+        self["ANCHORS"] = list(result["ANCHORS"])
+        self["SNIPPETS"] = result["SNIPPETS"]
 
     def add_link(self, link: str):
         """adds a link to the dictionary"""
         if link not in self["LINKS"].keys():
-            self["LNKS"][link] = type_of_link(link)
+            self["LINKS"][link] = type_of_link(link)
             self.update_content = True
 
     def add_backlink(self, link: str):
         """adds a backlink to the dictionary"""
         if link not in self["BACKLINKS"].keys():
-            self["BACKLNKS"][link] = type_of_link(link)
+            self["BACKLINKS"][link] = type_of_link(link)
+            self["NEED2UPDATE"] = True
             self.update_content = True
 
     def delete_content(self):
@@ -118,14 +178,37 @@ class FileDictionary(CallableDict):
         self["CONTENT"] = content
         self.update_content = True
 
-    def _read_document(self, doc_filepath: str):
-        """Function that opens a file"""
+    def _read_document(self, doc_filepath: str) -> bytes:
+        """Function that reads the raw bytes of a file"""
         logging.debug(f"Loading {doc_filepath}")
-        with open(doc_filepath, "r", encoding="utf-8") as f:
-            content = f.read()
-        return content
+        return read_markdown_bytes(doc_filepath)
+
+    def load_content(self, verify: bool = True) -> str:
+        """Returns the document content, re-reading it from disk if it was not stored
+
+        Args:
+            verify (bool, optional): check the re-read bytes against the hash
+                recorded when the document was loaded. Defaults to True.
+
+        Raises:
+            StaleDocumentError: the file changed on disk since it was loaded
+
+        Returns:
+            str: the document content
+        """
+        if self["CONTENT"]:
+            return self["CONTENT"]
+
+        raw_content = self._read_document(self["PATH"])
+        if verify and content_hash(raw_content) != self["HASH"]:
+            raise StaleDocumentError(
+                f"{self['REL_PATH']} changed on disk since it was loaded"
+            )
+        logging.debug(f"Rehydrated content for {self['REL_PATH']}")
+        self["CONTENT"] = raw_content.decode("utf-8")
+        return self["CONTENT"]
 
-    def _write_document(doc_filepath: str, content: str):
+    def _write_document(self, doc_filepath: str, content: str):
         """Function that writes a markdown file"""
         with open(doc_filepath, "w", encoding="utf-8") as f:
             f.write(content)
@@ -138,36 +221,96 @@ class FileDictionary(CallableDict):
         default_values: dict = None,
         set_values: dict = None,
         store_content: bool = True,
+        parse_cache=None,
+        known_hash: str = None,
+        template: BacklinksTemplate = None,
     ):
         """Populates the DocumentDictionary from a given dictionary
 
         Args:
             data_dict (dict): The dictionary to populate from
+            parse_cache (ParseCache, optional): reuse the links and headers of
+                documents with identical content instead of parsing again
+            known_hash (str, optional): content hash already known, such as a
+                git blob hash. On a parse cache hit the file is not read at
+                all when store_content is False.
+            template (BacklinksTemplate, optional): the vault's backlinks
+                template, whose heading marks the backlinks section
         """
         logging.debug(f"Generating the necessary infromation from {path}")
-        loaded_content = self._read_document(path)
         self["PATH"] = path
         self["REL_PATH"] = get_scan_relative_path(path, system_path)
 
-        self.load_links(loaded_content)
+        # manifest entries, used to verify content re-read later on
+        file_stat = stat(path)
+        self["SIZE"] = file_stat.st_size
+        self["MTIME"] = file_stat.st_mtime
+
+        backlinks_regex = BACKLINKS_REGEX
+        # the same content splits differently under another heading
+        cache_suffix = ""
+        if template is not None and template.HEADING != DEFAULT_HEADING:
+            backlinks_regex = template.REGEX
+            cache_suffix = f":{template.HEADING}"
+
+        cached = looked_up = None
+        if known_hash and parse_cache is not None and not store_content:
+            looked_up = known_hash
+            cached = parse_cache.get(known_hash + cache_suffix)
+        if cached is not None:
+            self["HASH"] = known_hash
+        else:
+            raw_content = self._read_document(path)
+            loaded_content = raw_content.decode("utf-8")
+            self["HASH"] = content_hash(raw_content)
+            if parse_cache is not None and self["HASH"] != looked_up:
+                cached = parse_cache.get(self["HASH"] + cache_suffix)
+
+        if cached is not None:
+            logging.debug(f"Using cached parse result for {path}")
+            self.apply_parse_result(cached)
+        else:
+            offset, end = find_backlinks_bounds(raw_content, backlinks_regex)
+            self["SECTIONS"] = {"BACKLINKS": offset}
+            if offset >= 0:
+                # the text after the section is the author's, kept as is
+                self["SECTIONS"]["END"] = end
+                # lets planning tell a section that is already as rendered
+                self["SECTIONS"]["HASH"] = content_hash(raw_content[offset:end])
+            # URLs are kept too, for the URL checker
+            snippets = SnippetBuffer()
+            self.load_links(
+                loaded_content,
+                markdown_only=False,
+                backlinks_regex=backlinks_regex,
+                snippets=snippets,
+            )
+            self["SNIPPETS"] = snippets.to_dict()
+            self.load_headers(loaded_content)
+            self["HEADING"] = find_first_heading(loaded_content)
+            self["ANCHORS"] = heading_slugs(loaded_content)
+            if parse_cache is not None:
+                parse_cache.put(
+                    self["HASH"] + cache_suffix, self.parse_result()
+                )
 
         self["NEED2UPDATE"] = False
 
-        self.load_headers(loaded_content)
-
         if store_content:
             self.save_content(loaded_content)
             self.update_content = False
 
-        if self["ID"] == "":
+        if not self["ID"]:
             self.generate_id()
 
-        for k, v in default_values.items():
+        for k, v in (default_values or {}).items():
             self[k] = self.get(k, v)
 
-        for k, v in set_values.items():
+        for k, v in (set_values or {}).items():
             self[k] = v
 
+        return self
+
     def save_file(self, path: Path = None, Raw: bool = False):
         """Populates the DocumentDictionary from a given dictionary
 
@@ -175,12 +318,13 @@ class FileDictionary(CallableDict):
             data_dict (dict): The dictionary to populate from
         """
         logging.debug(f"Writing document to {self['PATH']}")
-        if self.update_content is True:
-            self["CONTENT"] = add_backlinks_section(
-                self["CONTENT"], self["BACKLINKS"]
+        content = self.load_content()
+        if self.update_content is True or self["NEED2UPDATE"]:
+            content = add_backlinks_section(
+                content, {p: Path(p).stem for p in self["BACKLINKS"]}
             )
 
-        self._write_document(self["CONTENT"], path if path else self["PATH"])
+        self._write_document(path if path else self["PATH"], content)
 
 
 JSON_FIELDS = {"CROSSLINK": [], "ITEMS": {}}
@@ -195,7 +339,7 @@ class JsonDictionary:
     """
 
     FILE: Path = field(default=Path())
-    CROSSLINK: dict = field(default=JSON_FIELDS.copy())
+    CROSSLINK: dict = field(default_factory=lambda: deepcopy(JSON_FIELDS))
 
     def load(self, file_path):
         """Load JSON data from a file."""
@@ -203,6 +347,5 @@ class JsonDictionary:
             self.CROSSLINK = load(f)
 
     def dump(self, file_path):
-        """Dump JSON data to a file."""
-        with open(file_path, "w", encoding="utf-8") as f:
-            dump(self.CROSSLINK, f, indent=4)
+        """Dump JSON data to a file, replacing it in one step"""
+        atomic_write(file_path, dumps(self.CROSSLINK, indent=4).encode("utf-8"))
@@ -0,0 +1,315 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from json import dumps, load
+from os import stat
+from pathlib import Path
+
+from backlinks.io.locking import atomic_write
+from backlinks.logging import logging
+from backlinks.path.path import get_scan_relative_path
+from backlinks.yaml import DATE_FIELDS, META_FIELDS, parse_date, parse_list
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+# kept at the root of a vault, next to the link index
+METADATA_FILE = ".backlinks_metadata.json"
+METADATA_VERSION = 1
+DEFAULT_FIELDS = ["TITLE", "TAGS", "PUBLISHED", "DATE"]
+
+
+# ###
+# Functions
+# ###
+def normalize_tag(tag: str) -> str:
+    return tag.strip().lstrip("#").casefold()
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class MetadataStore:
+    """Front matter of every document of a book, held column by column
+
+    Each document is a row, each META_FIELDS name a column. Tags are also
+    kept as an inverted index and date fields as sorted arrays, so tag and
+    date filters are lookups and bisects rather than a pass over the rows.
+
+    Args:
+        PATHS (list): scan-relative path of each row, "" for removed rows
+        ROWS (dict): reverse lookup of PATHS
+        COLUMNS (dict): values of a field, one per row
+        TAGS (dict): rows carrying each casefolded tag
+        DATES (dict): sorted (ISO date, row) pairs of each date field, built
+            lazily and dropped when rows change
+        STATS (dict): [mtime, size] of each document's file when its row
+            was recorded, to tell which rows a saved store has out of date
+    """
+
+    PATHS: list = field(default_factory=list)
+    ROWS: dict = field(default_factory=dict)
+    COLUMNS: dict = field(
+        default_factory=lambda: {name: [] for name in META_FIELDS}
+    )
+    TAGS: dict = field(default_factory=dict)
+    DATES: dict = field(default_factory=dict)
+    STATS: dict = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.ROWS)
+
+    def add(self, doc) -> int:
+        """Records the front matter of a document, replacing an earlier row"""
+        rel_path = doc["REL_PATH"]
+        if rel_path in self.ROWS:
+            self.remove(rel_path)
+        row = len(self.PATHS)
+        self.PATHS.append(rel_path)
+        self.ROWS[rel_path] = row
+        for name, column in self.COLUMNS.items():
+            value = doc.get(name, None)
+            if name == "TAGS":
+                value = [normalize_tag(tag) for tag in parse_list(value)]
+            column.append(value)
+        for tag in self.COLUMNS["TAGS"][row]:
+            self.TAGS.setdefault(tag, set()).add(row)
+        self.STATS[rel_path] = [doc.get("MTIME", None), doc.get("SIZE", None)]
+        self.DATES.clear()
+        return row
+
+    def remove(self, rel_path: str):
+        """Forgets a document, its row is left empty"""
+        row = self.ROWS.pop(rel_path)
+        for tag in self.COLUMNS["TAGS"][row]:
+            rows = self.TAGS.get(tag, set())
+            rows.discard(row)
+            if not rows:
+                self.TAGS.pop(tag, None)
+        self.PATHS[row] = ""
+        for column in self.COLUMNS.values():
+            column[row] = None
+        self.COLUMNS["TAGS"][row] = []
+        self.STATS.pop(rel_path, None)
+        self.DATES.clear()
+
+    def touch(self, rel_path: str, file_path):
+        """Records the stat of a file rewritten with the same front matter"""
+        if rel_path in self.ROWS:
+            file_stat = stat(file_path)
+            self.STATS[rel_path] = [file_stat.st_mtime, file_stat.st_size]
+
+    def dump(self, file_path):
+        """Save the rows to a json file
+
+        The tag and date indexes are not saved, ``load`` rebuilds them.
+        """
+        # removed rows are dropped, the saved rows are numbered anew
+        rows = sorted(self.ROWS.values())
+        data = {
+            "VERSION": METADATA_VERSION,
+            "PATHS": [self.PATHS[row] for row in rows],
+            "COLUMNS": {
+                name: [column[row] for row in rows]
+                for name, column in self.COLUMNS.items()
+            },
+            "STATS": self.STATS,
+        }
+        atomic_write(file_path, dumps(data, default=str).encode("utf-8"))
+        logging.info(f"Saved front matter of {len(rows)} documents")
+
+    @classmethod
+    def load(cls, file_path):
+        """A store saved by ``dump``, None when missing or out of date"""
+        file_path = Path(file_path)
+        if not file_path.exists():
+            return None
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = load(f)
+        if data.get("VERSION") != METADATA_VERSION or set(
+            data["COLUMNS"]
+        ) != set(META_FIELDS):
+            logging.info(f"Ignoring out of date front matter {file_path}")
+            return None
+        store = cls(PATHS=data["PATHS"], COLUMNS=data["COLUMNS"])
+        store.ROWS = {rel_path: row for row, rel_path in enumerate(store.PATHS)}
+        for row, tags in enumerate(store.COLUMNS["TAGS"]):
+            for tag in tags:
+                store.TAGS.setdefault(tag, set()).add(row)
+        store.STATS = data["STATS"]
+        return store
+
+    def refresh(self, scan_path, file_list, load_document) -> int:
+        """Brings the rows up to date with the files of scan_path
+
+        Only files whose mtime or size differ from STATS are loaded again,
+        rows of files no longer listed are removed.
+
+        Args:
+            scan_path (Path): root the scan-relative paths are relative to
+            file_list (list): absolute paths of the vault's markdown files
+            load_document (callable): path -> loaded document
+
+        Returns:
+            int: the number of rows added, replaced or removed
+        """
+        changed = 0
+        listed = set()
+        for md_file in file_list:
+            rel_path = get_scan_relative_path(md_file, scan_path)
+            listed.add(rel_path)
+            file_stat = stat(md_file)
+            if self.STATS.get(rel_path) == [
+                file_stat.st_mtime,
+                file_stat.st_size,
+            ]:
+                continue
+            try:
+                self.add(load_document(md_file))
+            except Exception as e:
+                logging.error(f"Failed to load {md_file}: {e}")
+                if rel_path in self.ROWS:
+                    self.remove(rel_path)
+            changed += 1
+        for rel_path in set(self.ROWS) - listed:
+            self.remove(rel_path)
+            changed += 1
+        return changed
+
+    def row(self, row: int, fields: list = None) -> dict:
+        """One document's path and fields"""
+        values = {"PATH": self.PATHS[row]}
+        for name in fields or self.COLUMNS:
+            values[name] = self.COLUMNS[name][row]
+        return values
+
+    def tagged(self, tag: str) -> set:
+        """Rows carrying tag, ignoring case and a leading #"""
+        return set(self.TAGS.get(normalize_tag(tag), ()))
+
+    def dated(self, name: str, after: str = None, before: str = None) -> set:
+        """Rows whose date field falls after and before the given dates
+
+        Both bounds are inclusive ISO dates, rows without a valid date are
+        never returned.
+        """
+        if name not in self.DATES:
+            column = self.COLUMNS[name]
+            self.DATES[name] = sorted(
+                (parsed, row)
+                for row, value in enumerate(column)
+                if (parsed := parse_date(value)) is not None
+            )
+        for bound in (after, before):
+            if bound and parse_date(bound) is None:
+                raise ValueError(f"{bound} is not an ISO date")
+        keys = self.DATES[name]
+        start = bisect_left(keys, (parse_date(after), -1)) if after else 0
+        end = (
+            bisect_right(keys, (parse_date(before), len(self.PATHS)))
+            if before
+            else len(keys)
+        )
+        return {row for _, row in keys[start:end]}
+
+    def where(self, name: str, value: str, rows=None) -> set:
+        """Rows whose field equals value, ignoring case, by scanning the column
+
+        Only rows are scanned when given.
+        """
+        column = self.COLUMNS[name]
+        value = value.casefold()
+        return {
+            row
+            for row in (self.ROWS.values() if rows is None else rows)
+            if isinstance(column[row], str) and column[row].casefold() == value
+        }
+
+    def query(
+        self,
+        tags: list = (),
+        any_tags: list = (),
+        links_to: str = None,
+        linked_from: str = None,
+        after: str = None,
+        before: str = None,
+        date_field: str = "PUBLISHED",
+        where: dict = None,
+        index=None,
+        fields: list = None,
+    ) -> list:
+        """Documents matching every filter given
+
+        Args:
+            tags (list, optional): tags a document must all carry
+            any_tags (list, optional): tags a document must carry one of
+            links_to (str, optional): scan-relative path the document links to
+            linked_from (str, optional): scan-relative path linking to it
+            after (str, optional): earliest date_field, an ISO date
+            before (str, optional): latest date_field, an ISO date
+            date_field (str, optional): the date after and before apply to.
+                Defaults to "PUBLISHED".
+            where (dict, optional): field -> value equality filters
+            index (LinkIndex, optional): link index, needed by links_to and
+                linked_from
+            fields (list, optional): fields returned. Defaults to
+                DEFAULT_FIELDS.
+
+        Returns:
+            list: path and fields of each matching document, by path
+        """
+        unknown = [
+            name
+            for name in [*(where or {}), *(fields or []), date_field]
+            if name.upper() not in self.COLUMNS
+        ]
+        if unknown:
+            raise ValueError(
+                f"Unknown fields {unknown}, expected {META_FIELDS}"
+            )
+
+        candidates = []
+        candidates += [self.tagged(tag) for tag in tags]
+        if any_tags:
+            candidates.append(set().union(*map(self.tagged, any_tags)))
+        if after or before:
+            candidates.append(self.dated(date_field.upper(), after, before))
+        for linked, direction in (
+            (links_to, "BACKLINKS"),
+            (linked_from, "LINKS"),
+        ):
+            if linked is None:
+                continue
+            if index is None:
+                raise ValueError("Link filters need a link index")
+            node_id = index.IDS.get(linked)
+            node_ids = (
+                getattr(index, direction)[node_id]
+                if node_id is not None
+                else ()
+            )
+            candidates.append(
+                {
+                    self.ROWS[index.PATHS[i]]
+                    for i in node_ids
+                    if index.PATHS[i] in self.ROWS
+                }
+            )
+        candidates.sort(key=len)
+        rows = set.intersection(*candidates) if candidates else None
+        # the column scans go last, over what the indexes left
+        for name, value in (where or {}).items():
+            rows = self.where(name.upper(), value, rows)
+        if rows is None:
+            rows = self.ROWS.values()
+
+        fields = [name.upper() for name in fields or DEFAULT_FIELDS]
+        return [
+            self.row(row, fields)
+            for row in sorted(rows, key=self.PATHS.__getitem__)
+        ]
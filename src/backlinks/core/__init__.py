@@ -0,0 +1,20 @@
+# Defining the all module for backlinks core
+__all__ = [
+    "analytics",
+    "checkpoint",
+    "incremental",
+    "index",
+    "plan",
+    "reconcile",
+    "titles",
+    "urls",
+]
+
+from importlib import import_module
+
+
+# modules are loaded on first use, importing the package stays cheap
+def __getattr__(name):
+    if name in __all__:
+        return import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
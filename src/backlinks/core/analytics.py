@@ -0,0 +1,369 @@
+import csv
+import heapq
+from array import array
+from dataclasses import dataclass, field
+from itertools import accumulate, chain
+
+from backlinks.logging import logging
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1.0e-6
+PAGERANK_ITERATIONS = 100
+REPORT_FIELDS = [
+    "path",
+    "title",
+    "in_degree",
+    "out_degree",
+    "pagerank",
+    "component",
+]
+
+
+def _numpy():
+    """numpy when it is installed, None otherwise"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _csgraph():
+    """scipy.sparse.csgraph when scipy is installed, None otherwise"""
+    try:
+        from scipy.sparse import csgraph
+    except ImportError:
+        return None
+    return csgraph
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class CSRGraph:
+    """A directed graph in compressed sparse row form
+
+    The targets of node ``i`` are ``INDICES[INDPTR[i]:INDPTR[i + 1]]``. Both
+    are flat ``array.array`` buffers, so numpy can wrap them without a copy
+    through ``numpy.frombuffer``.
+
+    Args:
+        N (int): number of nodes
+        INDPTR (array): row offsets, N + 1 long
+        INDICES (array): target node of every edge
+    """
+
+    N: int = 0
+    INDPTR: array = field(default_factory=lambda: array("q", [0]))
+    INDICES: array = field(default_factory=lambda: array("i"))
+
+    @classmethod
+    def from_edges(cls, sources, targets, n: int):
+        """Builds the graph from parallel source/target id sequences
+
+        Uses a counting sort, so construction is O(N + E). With numpy the
+        counts, offsets and order come from bincount, cumsum and a stable
+        argsort over the whole edge list.
+        """
+        np = _numpy()
+        if np is not None:
+            sources = np.asarray(sources, dtype=np.int64)
+            targets = np.asarray(targets, dtype=np.int32)
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+            indices = targets[np.argsort(sources, kind="stable")]
+            return cls(
+                N=n,
+                INDPTR=array("q", indptr.tobytes()),
+                INDICES=array("i", indices.tobytes()),
+            )
+
+        indptr = array("q", bytes(8 * (n + 1)))
+        for source_id in sources:
+            indptr[source_id + 1] += 1
+        for i in range(n):
+            indptr[i + 1] += indptr[i]
+
+        cursor = array("q", indptr[:-1])
+        indices = array("i", bytes(4 * indptr[n]))
+        for source_id, target_id in zip(sources, targets):
+            indices[cursor[source_id]] = target_id
+            cursor[source_id] += 1
+        return cls(N=n, INDPTR=indptr, INDICES=indices)
+
+    @classmethod
+    def from_index(cls, index):
+        """Builds the graph from a LinkIndex
+
+        The index keeps the targets of each node together, so they are the
+        rows as they are. Only the row lengths are counted in Python, the
+        targets are copied without a loop over the edges.
+        """
+        indptr = array("q", [0])
+        indptr.extend(accumulate(len(targets) for targets in index.LINKS))
+        indices = array("i", chain.from_iterable(index.LINKS))
+        return cls(N=len(index), INDPTR=indptr, INDICES=indices)
+
+    def edge_count(self) -> int:
+        return len(self.INDICES)
+
+    def sources(self) -> array:
+        """Source node of every edge, aligned with INDICES"""
+        np = _numpy()
+        if np is not None:
+            indptr = np.frombuffer(self.INDPTR, dtype=np.int64)
+            sources = np.repeat(
+                np.arange(self.N, dtype=np.int32), np.diff(indptr)
+            )
+            return array("i", sources.tobytes())
+
+        sources = array("i")
+        for i in range(self.N):
+            sources.extend([i] * (self.INDPTR[i + 1] - self.INDPTR[i]))
+        return sources
+
+
+# ###
+# Functions
+# ###
+def out_degree(graph: CSRGraph) -> array:
+    np = _numpy()
+    if np is not None:
+        indptr = np.frombuffer(graph.INDPTR, dtype=np.int64)
+        return array("i", np.diff(indptr).astype(np.int32).tobytes())
+
+    return array(
+        "i", (graph.INDPTR[i + 1] - graph.INDPTR[i] for i in range(graph.N))
+    )
+
+
+def in_degree(graph: CSRGraph) -> array:
+    np = _numpy()
+    if np is not None:
+        counts = np.bincount(
+            np.frombuffer(graph.INDICES, dtype=np.int32), minlength=graph.N
+        )
+        return array("i", counts.astype(np.int32).tobytes())
+
+    degree = array("i", bytes(4 * graph.N))
+    for target_id in graph.INDICES:
+        degree[target_id] += 1
+    return degree
+
+
+def orphans(in_deg: array, out_deg: array) -> list:
+    """Nodes with no links in or out"""
+    return [
+        i for i, (a, b) in enumerate(zip(in_deg, out_deg)) if not a and not b
+    ]
+
+
+def dead_ends(in_deg: array, out_deg: array) -> list:
+    """Nodes that are linked to but link nowhere"""
+    return [i for i, (a, b) in enumerate(zip(in_deg, out_deg)) if a and not b]
+
+
+def hubs(in_deg: array, top: int = 10) -> list:
+    """The `top` most linked-to nodes, the lower id first on a tie"""
+    return heapq.nlargest(top, range(len(in_deg)), key=in_deg.__getitem__)
+
+
+def _components_numpy(np, graph: CSRGraph):
+    """Component labels over the CSR arrays, scipy's csgraph when installed
+
+    Without scipy every node's label is hooked to the smallest label across
+    its edges and the labels are then compressed by pointer jumping, each
+    round being a few whole-array operations. It stops when no label moves,
+    every label then being the smallest node id of its component.
+    """
+    n = graph.N
+    indptr = np.frombuffer(graph.INDPTR, dtype=np.int64)
+    indices = np.frombuffer(graph.INDICES, dtype=np.int32)
+    csgraph = _csgraph()
+    if csgraph is not None:
+        from scipy.sparse import csr_matrix
+
+        matrix = csr_matrix(
+            (np.ones(len(indices), dtype=np.int8), indices, indptr),
+            shape=(n, n),
+        )
+        _, labels = csgraph.connected_components(matrix, connection="weak")
+        # scipy numbers components its own way, by first node instead
+        _, first, labels = np.unique(
+            labels, return_index=True, return_inverse=True
+        )
+        order = np.empty(len(first), dtype=np.int64)
+        order[np.argsort(first)] = np.arange(len(first))
+        return order[labels]
+
+    sources = np.repeat(np.arange(n), np.diff(indptr))
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[sources], labels[indices])
+        hooked = labels.copy()
+        np.minimum.at(hooked, labels[sources], low)
+        np.minimum.at(hooked, labels[indices], low)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            break
+        labels = hooked
+    # ordered by smallest node id, which is the order of first appearance
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def connected_components(graph: CSRGraph) -> array:
+    """Weakly connected component label of every node
+
+    Components are numbered 0..k-1 by first appearance. With numpy the CSR
+    arrays are labelled without a Python loop (see ``_components_numpy``),
+    otherwise by union-find over the edge list with path halving.
+    """
+    np = _numpy()
+    if np is not None and graph.N:
+        labels = _components_numpy(np, graph)
+        return array("i", labels.astype(np.int32).tobytes())
+
+    parent = array("i", range(graph.N))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for source_id in range(graph.N):
+        for k in range(graph.INDPTR[source_id], graph.INDPTR[source_id + 1]):
+            a, b = find(source_id), find(graph.INDICES[k])
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+
+    labels = array("i", bytes(4 * graph.N))
+    renumber = {}
+    for i in range(graph.N):
+        labels[i] = renumber.setdefault(find(i), len(renumber))
+    return labels
+
+
+def pagerank(
+    graph: CSRGraph,
+    damping: float = PAGERANK_DAMPING,
+    tolerance: float = PAGERANK_TOLERANCE,
+    max_iterations: int = PAGERANK_ITERATIONS,
+) -> array:
+    """PageRank by power iteration, dangling nodes spread their rank evenly
+
+    Vectorized with numpy when it is installed.
+    """
+    n = graph.N
+    if n == 0:
+        return array("d")
+    out_deg = out_degree(graph)
+    np = _numpy()
+
+    if np is not None:
+        indices = np.frombuffer(graph.INDICES, dtype=np.int32)
+        sources = np.repeat(
+            np.arange(n), np.diff(np.frombuffer(graph.INDPTR, dtype=np.int64))
+        )
+        degree = np.frombuffer(out_deg, dtype=np.int32).astype(np.float64)
+        dangling = degree == 0
+        inv_degree = np.divide(1.0, degree, out=np.zeros(n), where=~dangling)
+        rank = np.full(n, 1.0 / n)
+        for iteration in range(max_iterations):
+            spread = np.bincount(
+                indices, weights=(rank * inv_degree)[sources], minlength=n
+            )
+            new_rank = (1.0 - damping) / n + damping * (
+                spread + rank[dangling].sum() / n
+            )
+            delta = np.abs(new_rank - rank).sum()
+            rank = new_rank
+            if delta < tolerance:
+                break
+        logging.debug(f"PageRank converged after {iteration + 1} iterations")
+        return array("d", rank.tobytes())
+
+    rank = array("d", [1.0 / n]) * n
+    for iteration in range(max_iterations):
+        dangling_sum = sum(rank[i] for i in range(n) if not out_deg[i])
+        base = (1.0 - damping) / n + damping * dangling_sum / n
+        new_rank = array("d", [base]) * n
+        for source_id in range(n):
+            if not out_deg[source_id]:
+                continue
+            share = damping * rank[source_id] / out_deg[source_id]
+            for k in range(
+                graph.INDPTR[source_id], graph.INDPTR[source_id + 1]
+            ):
+                new_rank[graph.INDICES[k]] += share
+        delta = sum(abs(a - b) for a, b in zip(new_rank, rank))
+        rank = new_rank
+        if delta < tolerance:
+            break
+    logging.debug(f"PageRank converged after {iteration + 1} iterations")
+    return rank
+
+
+def analyse(index) -> dict:
+    """Runs every metric over a LinkIndex
+
+    Args:
+        index (LinkIndex): the link index
+
+    Returns:
+        dict: per node arrays (in_degree, out_degree, pagerank, component)
+            and node id lists (orphans, dead_ends, hubs)
+    """
+    logging.info("Running link graph analytics")
+    graph = CSRGraph.from_index(index)
+    in_deg = in_degree(graph)
+    out_deg = out_degree(graph)
+    components = connected_components(graph)
+    results = {
+        "in_degree": in_deg,
+        "out_degree": out_deg,
+        "pagerank": pagerank(graph),
+        "component": components,
+        "orphans": orphans(in_deg, out_deg),
+        "dead_ends": dead_ends(in_deg, out_deg),
+        "hubs": hubs(in_deg),
+    }
+    logging.info(
+        f"Found {len(results['orphans'])} orphans, "
+        f"{len(results['dead_ends'])} dead ends and "
+        f"{len(set(components))} components"
+    )
+    return results
+
+
+def save_analytics_report(csv_path, index, results: dict):
+    """Save the per document metrics to CSV, highest PageRank first"""
+    logging.info(f"Saving link analytics report to {csv_path}")
+    rank = results["pagerank"]
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        for node_id in sorted(range(len(index)), key=lambda i: -rank[i]):
+            writer.writerow(
+                {
+                    "path": index.PATHS[node_id],
+                    "title": index.TITLES[node_id],
+                    "in_degree": results["in_degree"][node_id],
+                    "out_degree": results["out_degree"][node_id],
+                    "pagerank": round(rank[node_id], 6),
+                    "component": results["component"][node_id],
+                }
+            )
@@ -0,0 +1,165 @@
+import shutil
+from dataclasses import dataclass, field
+from hashlib import sha1
+from json import dumps, load
+from pathlib import Path
+
+from backlinks.io.locking import atomic_write
+from backlinks.logging import logging
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+CHECKPOINT_DIR = ".backlinks_checkpoint"
+CHECKPOINT_VERSION = 1
+# in run order, completing a stage drops the checkpoints of those after it
+STAGES = ["walk", "parse", "crosswalk", "plan", "write"]
+
+
+# ###
+# Functions
+# ###
+def fingerprint(*parts) -> str:
+    """A hash of json serializable parts, equal parts give equal hashes"""
+    data = dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return sha1(data).hexdigest()
+
+
+def books_fingerprint(books) -> str:
+    """Fingerprint of what loading books produced
+
+    Covers each root, its template and the content hash of every document
+    read, so editing, adding or removing a file changes it, as does a file
+    failing to load or loading again after a failure.
+    """
+    return fingerprint(
+        [
+            [
+                str(Path(book.PATH).resolve()),
+                repr(book.TEMPLATE),
+                sorted(
+                    (doc["REL_PATH"], doc["HASH"])
+                    for doc in book.PAGES.values()
+                    if doc is not None
+                ),
+                sorted(book.FAILED),
+            ]
+            for book in books
+        ]
+    )
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class Checkpoint:
+    """Outputs of the completed stages of a run, to resume it from
+
+    Each stage is recorded with the fingerprint of its inputs and its output
+    kept at ``stage_path``. A later run whose inputs have the same
+    fingerprint reuses the output instead of running the stage again, a
+    different fingerprint means the stage and every one after it run again.
+    Files that failed are recorded per stage, they are the only work left
+    once the inputs of the others stop changing.
+
+    Args:
+        PATH (Path): folder holding the checkpoint, CHECKPOINT_DIR in the vault
+        STAGES (dict): stage -> fingerprint of the inputs it completed with
+        FAILED (dict): stage -> {scan-relative path: error} of its last run
+    """
+
+    PATH: Path
+    STAGES: dict = field(default_factory=dict)
+    FAILED: dict = field(default_factory=dict)
+
+    @property
+    def STATE_PATH(self) -> Path:
+        return Path(self.PATH) / "state.json"
+
+    def stage_path(self, stage: str) -> Path:
+        """Where the output of stage is kept"""
+        return Path(self.PATH) / f"{stage}.json"
+
+    def load(self):
+        """Load the checkpoint, a missing or outdated one is empty
+
+        The folder is made ready for the stages to write their outputs to.
+        """
+        Path(self.PATH).mkdir(parents=True, exist_ok=True)
+        if not self.STATE_PATH.exists():
+            return self
+        with open(self.STATE_PATH, "r", encoding="utf-8") as f:
+            data = load(f)
+        if data.get("VERSION") != CHECKPOINT_VERSION:
+            logging.info(f"Ignoring out of date checkpoint {self.PATH}")
+            return self
+        self.STAGES = data["STAGES"]
+        self.FAILED = data["FAILED"]
+        logging.info(
+            f"Resuming from checkpoint {self.PATH}, completed stages: "
+            f"{', '.join(self.STAGES) or 'none'}"
+        )
+        return self
+
+    def dump(self):
+        """Save the checkpoint state"""
+        Path(self.PATH).mkdir(parents=True, exist_ok=True)
+        data = {
+            "VERSION": CHECKPOINT_VERSION,
+            "STAGES": self.STAGES,
+            "FAILED": self.FAILED,
+        }
+        atomic_write(self.STATE_PATH, dumps(data, indent=4).encode("utf-8"))
+
+    def load_stage(self, stage: str):
+        """The json output of stage, for stages without a format of their own"""
+        with open(self.stage_path(stage), "r", encoding="utf-8") as f:
+            return load(f)
+
+    def dump_stage(self, stage: str, data):
+        atomic_write(self.stage_path(stage), dumps(data).encode("utf-8"))
+
+    def done(self, stage: str, key: str) -> bool:
+        """True when stage completed with inputs of fingerprint key"""
+        return self.STAGES.get(stage) == key
+
+    def complete(self, stage: str, key: str, failed: dict = None):
+        """Records stage as completed with inputs of fingerprint key
+
+        Completing it with other inputs than before drops the later stages.
+
+        Args:
+            stage (str): one of STAGES
+            key (str): fingerprint of the stage's inputs
+            failed (dict, optional): scan-relative path -> error of the files
+                the stage could not process
+        """
+        if self.STAGES.get(stage) != key:
+            # new inputs, the outputs of the later stages no longer follow
+            for later in STAGES[STAGES.index(stage) + 1 :]:
+                self.STAGES.pop(later, None)
+                self.FAILED.pop(later, None)
+        self.STAGES[stage] = key
+        if failed:
+            self.FAILED[stage] = dict(failed)
+        else:
+            self.FAILED.pop(stage, None)
+        self.dump()
+
+    def failures(self) -> dict:
+        """scan-relative path -> error of every file failed by a stage"""
+        failed = {}
+        for stage in STAGES:
+            failed.update(self.FAILED.get(stage, {}))
+        return failed
+
+    def clear(self):
+        """Removes the checkpoint, once a run completed without failures"""
+        shutil.rmtree(self.PATH, ignore_errors=True)
+        self.STAGES, self.FAILED = {}, {}
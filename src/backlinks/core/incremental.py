@@ -0,0 +1,237 @@
+from pathlib import Path
+
+from backlinks.collector.document import FileDictionary
+from backlinks.core.index import LinkIndex
+from backlinks.core.plan import (
+    PLAN_VERSION,
+    apply_plan,
+    mark_applied,
+    plan_file,
+    wants_backlinks,
+)
+from backlinks.io.locking import atomic_write
+from backlinks.logging import logging
+from backlinks.markdown.templates import load_template
+from backlinks.path.path import (
+    find_root,
+    get_scan_absolute_path,
+    get_scan_relative_path,
+    resolve_link_path,
+)
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+INDEX_FILE = ".backlinks_index.json"
+# kept in every root but the first of a multi-root index, holds the index path
+INDEX_POINTER_FILE = ".backlinks_index_path"
+
+
+# ###
+# Functions
+# ###
+def git_changed_files(
+    scan_path, staged: bool = False, since: str = None
+) -> list:
+    """Markdown files git reports as changed under scan_path
+
+    Args:
+        scan_path (Path): root of the scan, inside a git work tree
+        staged (bool, optional): only staged changes, as a pre-commit hook
+            sees them. Defaults to False, changes against HEAD.
+        since (str, optional): a revision to compare the work tree with
+            instead of HEAD, e.g. ORIG_HEAD after a pull
+
+    Returns:
+        list: absolute paths, deleted files included
+    """
+    # imported here, update_files runs without it
+    import subprocess
+
+    command = ["git", "-C", str(scan_path), "diff", "--name-only", "--relative"]
+    command += ["--cached"] if staged else [since or "HEAD"]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return [
+        (Path(scan_path) / name).resolve()
+        for name in result.stdout.splitlines()
+        if name.lower().endswith(".md")
+    ]
+
+
+def read_file_list(lines) -> list:
+    """Paths from lines of text (stdin, ``git diff --name-only`` output, ...)"""
+    return [
+        Path(line.strip()).resolve()
+        for line in lines
+        if line.strip().lower().endswith(".md")
+    ]
+
+
+def find_index(scan_path) -> Path:
+    """The link index of scan_path, wherever the run that built it saved it
+
+    A root's own index comes first, then the pointer a multi-root run left
+    in it to the index kept in its first root.
+    """
+    index_path = Path(scan_path) / INDEX_FILE
+    pointer = Path(scan_path) / INDEX_POINTER_FILE
+    if not index_path.exists() and pointer.exists():
+        index_path = Path(pointer.read_text(encoding="utf-8").strip())
+    return index_path
+
+
+def dump_index(index: LinkIndex, roots: list) -> Path:
+    """Saves index in the first root and points the other roots at it
+
+    Any root the index covers then finds it, so an update started from
+    another root resolves links across all of them.
+
+    Returns:
+        Path: where the index was saved
+    """
+    roots = [Path(root) for root in roots]
+    index_path = roots[0] / INDEX_FILE
+    index.dump(index_path)
+    (roots[0] / INDEX_POINTER_FILE).unlink(missing_ok=True)
+    for root in roots[1:]:
+        # an index of the root alone would shadow the pointer
+        (root / INDEX_FILE).unlink(missing_ok=True)
+        atomic_write(
+            root / INDEX_POINTER_FILE, str(index_path.resolve()).encode("utf-8")
+        )
+    return index_path
+
+
+def _load(md_file: Path, roots: list, templates: dict):
+    return FileDictionary().load_document(
+        md_file,
+        roots,
+        store_content=False,
+        template=templates.get(find_root(md_file, roots)),
+    )
+
+
+def update_files(scan_path, changed_files, index_path=None, prune: bool = True):
+    """Updates backlinks for a few changed files without scanning the vault
+
+    The link index persisted by the previous run gives the old outgoing links
+    of each changed file. Only the changed files are parsed, and only the
+    targets whose set of incoming links changed (plus the changed files
+    themselves) are re-read and rewritten.
+
+    Args:
+        scan_path (Path): root of the scan
+        changed_files (list): paths of created, edited or deleted files,
+            those outside every root of the index are skipped
+        index_path (Path, optional): persisted link index. Defaults to
+            the one ``find_index`` finds for scan_path.
+        prune (bool, optional): remove stale backlinks. Defaults to True.
+
+    Returns:
+        list: scan-relative paths of files that could not be updated, or
+            None when there was no index and a full run is needed
+    """
+    scan_path = Path(scan_path).resolve()
+    explicit = index_path is not None
+    index_path = Path(index_path or find_index(scan_path))
+    index = LinkIndex.load(index_path)
+    if index is None:
+        logging.warning(f"No link index at {index_path}, run a full update")
+        return None
+    # an index built over several roots resolves links across all of them
+    roots = [Path(root) for root in index.ROOTS] or [scan_path]
+    templates = {root: load_template(root) for root in roots}
+
+    affected = set()
+    loaded = {}
+    new_files = False
+    for md_file in changed_files:
+        md_file = Path(md_file).resolve()
+        if find_root(md_file, roots) is None:
+            logging.warning(f"Skipping {md_file}, it is outside the vault")
+            continue
+        rel_path = get_scan_relative_path(md_file, roots)
+        node_id = index.IDS.get(rel_path)
+        if not md_file.exists():
+            if node_id is not None:
+                logging.info(f"Removing deleted {rel_path} from the index")
+                affected |= index.LINKS[node_id]
+                index.remove(rel_path)
+            continue
+
+        old_links = set(index.LINKS[node_id]) if node_id is not None else set()
+        old_title = index.TITLES[node_id] if node_id is not None else None
+        old_snippets = {t: index.snippet(node_id, t) for t in old_links}
+        new_files |= node_id is None
+        doc = _load(md_file, roots, templates)
+        node_id = index.index_document(doc, roots)
+        new_links = index.LINKS[node_id]
+
+        # targets gaining or losing this source, all of them on a new title
+        affected |= old_links ^ new_links
+        if old_title != index.TITLES[node_id]:
+            affected |= new_links
+        # and those whose snippet of the link changed, for {snippet} templates
+        affected |= {
+            t
+            for t in new_links
+            if index.snippet(node_id, t) != old_snippets.get(t)
+        }
+        loaded[node_id] = doc
+
+    # documents a changed file links to that the index has not seen yet
+    for node_id, doc in list(loaded.items()):
+        for lnk in index.BROKEN.get(node_id, []):
+            target = resolve_link_path(lnk, doc["PATH"], roots)
+            if (
+                target.suffix.lower() == ".md"
+                and target.is_file()
+                and find_root(target, roots) is not None
+                and get_scan_relative_path(target, roots) not in index.IDS
+            ):
+                logging.info(f"Adding new {target} to the index")
+                target_doc = _load(target, roots, templates)
+                loaded[index.index_document(target_doc, roots)] = target_doc
+                new_files = True
+    # links to the new documents were broken until now
+    if new_files:
+        affected |= index.resolve_broken(roots)
+
+    files = []
+    for node_id in sorted(affected | loaded.keys()):
+        rel_path = index.PATHS[node_id]
+        if not rel_path:
+            continue
+        doc = loaded.get(node_id)
+        if doc is None:
+            doc = _load(
+                get_scan_absolute_path(rel_path, roots), roots, templates
+            )
+            index.index_document(doc, roots)
+        if not wants_backlinks(doc):
+            continue
+        template = templates.get(find_root(doc["PATH"], roots))
+        change = plan_file(doc, index, prune, template)
+        if change is not None:
+            files.append(change)
+
+    logging.info(
+        f"{len(loaded)} changed files touch {len(affected)} targets, "
+        f"{len(files)} need new backlinks"
+    )
+    plan = {
+        "VERSION": PLAN_VERSION,
+        "ROOT": str(scan_path),
+        "ROOTS": [str(root) for root in roots],
+        "FILES": files,
+    }
+    skipped = apply_plan(plan)
+    mark_applied(index, plan, skipped)
+    if explicit:
+        index.dump(index_path)
+    else:
+        dump_index(index, roots)
+    return skipped
@@ -0,0 +1,432 @@
+from dataclasses import dataclass, field
+from json import dumps, load
+from pathlib import Path
+from urllib.parse import unquote
+
+from backlinks.core.titles import (
+    TitleIndex,
+    document_aliases,
+    document_date,
+    document_title,
+)
+from backlinks.io.locking import atomic_write
+from backlinks.logging import logging
+from backlinks.markdown.markdown import has_anchor
+from backlinks.markdown.snippets import snippet_text
+from backlinks.path.path import (
+    get_scan_absolute_path,
+    get_scan_relative_path,
+    resolve_link_path,
+)
+from backlinks.progress import QUIET
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+INDEX_VERSION = 6
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class LinkIndex:
+    """An interned, in-memory view of the links between documents
+
+    Every document gets an integer id, so the link structure is held as sets
+    of ids instead of path strings.
+
+    Args:
+        PATHS (list): scan-relative path of each id
+        TITLES (list): display title of each id
+        IDS (dict): reverse lookup of PATHS
+        LINKS (list): outgoing document ids of each id
+        BACKLINKS (list): incoming document ids of each id
+        BROKEN (dict): markdown links of an id that do not resolve to a document
+        EXTERNAL (dict): URL links of an id
+        LISTED (list): ids named in each id's backlinks section, mapped to
+            the link as written
+        UNLISTED (dict): backlinks section entries of an id that do not
+            resolve to a document
+        ALIASES (dict): front matter aliases of an id
+        TITLE_INDEX (TitleIndex): ids by title and alias
+        ROOTS (list): the scan roots indexed, each root's name is the
+            namespace of its paths
+        ANCHORS (dict): heading anchors of an id
+        FRAGMENTS (dict): (target id, fragment, link) of every link of an
+            id that points into a section of another document
+        DATES (dict): front matter date of an id, an ISO date
+        SNIPPETS (dict): text around the links of an id, the document's
+            snippet buffer and the [start, end] in it of each target id
+    """
+
+    PATHS: list = field(default_factory=list)
+    TITLES: list = field(default_factory=list)
+    IDS: dict = field(default_factory=dict)
+    LINKS: list = field(default_factory=list)
+    BACKLINKS: list = field(default_factory=list)
+    BROKEN: dict = field(default_factory=dict)
+    EXTERNAL: dict = field(default_factory=dict)
+    LISTED: list = field(default_factory=list)
+    UNLISTED: dict = field(default_factory=dict)
+    ALIASES: dict = field(default_factory=dict)
+    TITLE_INDEX: TitleIndex = field(default_factory=TitleIndex)
+    ROOTS: list = field(default_factory=list)
+    ANCHORS: dict = field(default_factory=dict)
+    FRAGMENTS: dict = field(default_factory=dict)
+    DATES: dict = field(default_factory=dict)
+    SNIPPETS: dict = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.PATHS)
+
+    def intern(
+        self, rel_path: str, title: str = None, aliases: list = None
+    ) -> int:
+        """Returns the id of rel_path, adding it to the index if needed
+
+        A title or aliases given for a known path replace the recorded ones.
+        """
+        node_id = self.IDS.get(rel_path)
+        if node_id is None:
+            node_id = len(self.PATHS)
+            self.IDS[rel_path] = node_id
+            self.PATHS.append(rel_path)
+            self.TITLES.append(title or Path(rel_path).stem)
+            self.LINKS.append(set())
+            self.BACKLINKS.append(set())
+            self.LISTED.append({})
+        elif title is None and aliases is None:
+            return node_id
+        elif title:
+            self.TITLES[node_id] = title
+
+        if aliases:
+            self.ALIASES[node_id] = list(aliases)
+        elif aliases is not None:
+            self.ALIASES.pop(node_id, None)
+        self.TITLE_INDEX.add(
+            node_id, self.TITLES[node_id], self.ALIASES.get(node_id, [])
+        )
+        return node_id
+
+    def add_link(self, source_id: int, target_id: int):
+        """Records a link from source_id to target_id"""
+        self.LINKS[source_id].add(target_id)
+        self.BACKLINKS[target_id].add(source_id)
+
+    def _add_fragment(self, source_id: int, target_id: int, lnk: str):
+        fragment = lnk.partition("#")[2]
+        if fragment:
+            self.FRAGMENTS.setdefault(source_id, []).append(
+                (target_id, fragment, lnk)
+            )
+
+    def edges(self):
+        """Yields every (source_id, target_id) pair"""
+        for source_id, targets in enumerate(self.LINKS):
+            for target_id in targets:
+                yield source_id, target_id
+
+    def edge_count(self) -> int:
+        return sum(len(targets) for targets in self.LINKS)
+
+    def degree(self, node_id: int) -> int:
+        return len(self.LINKS[node_id]) + len(self.BACKLINKS[node_id])
+
+    def resolve(self, lnk: str, doc, scan_path):
+        """Id of the document a link points to, None when it is not indexed
+
+        A link whose path is not a document falls back to the document whose
+        title or alias is the link's file name, when exactly one matches.
+        """
+        node_id = self.IDS.get(
+            get_scan_relative_path(
+                resolve_link_path(lnk, doc["PATH"], scan_path), scan_path
+            )
+        )
+        if node_id is None:
+            matches = self.TITLE_INDEX.lookup(
+                unquote(Path(lnk.split("#")[0]).stem)
+            )
+            if len(matches) == 1:
+                node_id = matches[0]
+        return node_id
+
+    def index_document(self, doc, scan_path) -> int:
+        """(Re)indexes the links and backlinks section of one document
+
+        Any previous links of the document are dropped first, so this also
+        serves to refresh a single changed file.
+
+        Returns:
+            int: the id of the document
+        """
+        source_id = self.intern(
+            doc["REL_PATH"], document_title(doc), document_aliases(doc)
+        )
+        for target_id in self.LINKS[source_id]:
+            self.BACKLINKS[target_id].discard(source_id)
+        self.LINKS[source_id] = set()
+        self.LISTED[source_id] = {}
+        for table in (
+            self.BROKEN,
+            self.EXTERNAL,
+            self.UNLISTED,
+            self.FRAGMENTS,
+            self.SNIPPETS,
+        ):
+            table.pop(source_id, None)
+        if doc.get("ANCHORS", None):
+            self.ANCHORS[source_id] = set(doc["ANCHORS"])
+        else:
+            self.ANCHORS.pop(source_id, None)
+        doc_date = document_date(doc)
+        if doc_date:
+            self.DATES[source_id] = doc_date
+        else:
+            self.DATES.pop(source_id, None)
+
+        snippets = doc.get("SNIPPETS", None) or {}
+        offsets = {}
+        for lnk, lnk_type in doc["LINKS"].items():
+            if lnk_type == "URL":
+                self.EXTERNAL.setdefault(source_id, []).append(lnk)
+                continue
+            if lnk_type == "FILE":
+                # images and attachments are not documents
+                continue
+            target_id = self.resolve(lnk, doc, scan_path)
+            if target_id is None:
+                self.BROKEN.setdefault(source_id, []).append(lnk)
+                continue
+            self.add_link(source_id, target_id)
+            self._add_fragment(source_id, target_id, lnk)
+            bounds = snippets.get("LINKS", {}).get(lnk)
+            if bounds is not None:
+                offsets.setdefault(target_id, bounds)
+        if offsets:
+            # the document's buffer is shared, not copied per link
+            self.SNIPPETS[source_id] = {
+                "TEXT": snippets["TEXT"],
+                "LINKS": offsets,
+            }
+
+        for lnk in doc["BACKLINKS"]:
+            listed_id = self.resolve(lnk, doc, scan_path)
+            if listed_id is None:
+                self.UNLISTED.setdefault(source_id, []).append(lnk)
+            else:
+                self.LISTED[source_id][listed_id] = lnk
+        return source_id
+
+    def remove(self, rel_path: str):
+        """Drops a deleted document, links to it become broken links"""
+        node_id = self.IDS.pop(rel_path)
+        for target_id in self.LINKS[node_id]:
+            self.BACKLINKS[target_id].discard(node_id)
+        for source_id in self.BACKLINKS[node_id]:
+            self.LINKS[source_id].discard(node_id)
+            self.BROKEN.setdefault(source_id, []).append(rel_path)
+            if source_id in self.FRAGMENTS:
+                self.FRAGMENTS[source_id] = [
+                    f for f in self.FRAGMENTS[source_id] if f[0] != node_id
+                ]
+        # ids stay stable, the slot is left empty
+        self.PATHS[node_id] = ""
+        self.LINKS[node_id] = set()
+        self.BACKLINKS[node_id] = set()
+        self.LISTED[node_id] = {}
+        for table in (
+            self.BROKEN,
+            self.EXTERNAL,
+            self.UNLISTED,
+            self.ALIASES,
+            self.ANCHORS,
+            self.FRAGMENTS,
+            self.DATES,
+            self.SNIPPETS,
+        ):
+            table.pop(node_id, None)
+        self.TITLE_INDEX.remove(node_id)
+
+    def resolve_broken(self, scan_path) -> set:
+        """Turns broken links into links where the target now exists
+
+        Returns:
+            set: ids of the documents that gained links, whose backlinks
+                section is out of date
+        """
+        resolved = set()
+        for source_id, broken in list(self.BROKEN.items()):
+            source = {
+                "PATH": get_scan_absolute_path(self.PATHS[source_id], scan_path)
+            }
+            still_broken = []
+            for lnk in broken:
+                target_id = self.resolve(lnk, source, scan_path)
+                if target_id is None:
+                    still_broken.append(lnk)
+                else:
+                    self.add_link(source_id, target_id)
+                    self._add_fragment(source_id, target_id, lnk)
+                    resolved.add(target_id)
+            if still_broken:
+                self.BROKEN[source_id] = still_broken
+            else:
+                del self.BROKEN[source_id]
+        return resolved
+
+    def has_anchor(self, node_id: int, fragment: str) -> bool:
+        """True when fragment names a heading of node_id, see has_anchor"""
+        return has_anchor(self.ANCHORS.get(node_id, set()), fragment)
+
+    def snippet(self, source_id: int, target_id: int) -> str:
+        """Text around the link from source_id to target_id, None if unknown"""
+        return snippet_text(self.SNIPPETS.get(source_id), target_id)
+
+    def broken_anchors(self) -> dict:
+        """Links of each id whose target exists but has no such heading
+
+        Returns:
+            dict: source id to the links as written
+        """
+        broken = {}
+        for source_id, fragments in self.FRAGMENTS.items():
+            for target_id, fragment, lnk in fragments:
+                if not self.has_anchor(target_id, fragment):
+                    broken.setdefault(source_id, []).append(lnk)
+        return broken
+
+    @classmethod
+    def from_book(cls, book):
+        """Builds the index from the documents already loaded in a BookDictionary
+
+        Only the parsed link tables are used, nothing is read from disk.
+
+        Args:
+            book (BookDictionary): a loaded book
+
+        Returns:
+            LinkIndex: the index
+        """
+        return cls.from_books([book])
+
+    @classmethod
+    def from_books(cls, books, progress=None):
+        """Builds one index over several loaded books
+
+        Each book's root name is the namespace of its paths, so links
+        between the books resolve like links within one.
+
+        Args:
+            books (list): loaded BookDictionary objects
+            progress (ProgressReporter, optional): reports the documents
+                and links resolved
+
+        Raises:
+            ValueError: two roots share a name
+        """
+        roots = [Path(book.PATH).resolve() for book in books]
+        names = [root.name.upper() for root in roots]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Scan roots need distinct names: {roots}")
+
+        index = cls(ROOTS=[str(root) for root in roots])
+        documents = [
+            doc
+            for book in books
+            for doc in book.PAGES.values()
+            if doc is not None
+        ]
+        for doc in documents:
+            index.intern(
+                doc["REL_PATH"], document_title(doc), document_aliases(doc)
+            )
+
+        resolving = (progress or QUIET).stage("resolve", len(documents))
+        for doc in documents:
+            index.index_document(doc, roots)
+            resolving.advance(links=len(doc["LINKS"]))
+        resolving.close()
+
+        logging.info(
+            f"Indexed {len(index)} documents and {index.edge_count()} links "
+            f"in {len(roots)} roots"
+        )
+        return index
+
+    def dump(self, file_path):
+        """Dump the index to a json file"""
+        data = {
+            "VERSION": INDEX_VERSION,
+            "PATHS": self.PATHS,
+            "TITLES": self.TITLES,
+            "LINKS": [sorted(targets) for targets in self.LINKS],
+            "LISTED": [list(listed.items()) for listed in self.LISTED],
+            "BROKEN": self.BROKEN,
+            "EXTERNAL": self.EXTERNAL,
+            "UNLISTED": self.UNLISTED,
+            "ALIASES": self.ALIASES,
+            "ROOTS": self.ROOTS,
+            "ANCHORS": {k: sorted(v) for k, v in self.ANCHORS.items()},
+            "FRAGMENTS": self.FRAGMENTS,
+            "DATES": self.DATES,
+            "SNIPPETS": self.SNIPPETS,
+        }
+        # concurrent runs read it, they must never see half a file
+        atomic_write(file_path, dumps(data).encode("utf-8"))
+        logging.debug(
+            f"Saved link index of {len(self)} documents to {file_path}"
+        )
+
+    @classmethod
+    def load(cls, file_path):
+        """Load an index saved by dump, None when the file is missing or outdated"""
+        file_path = Path(file_path)
+        if not file_path.exists():
+            return None
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = load(f)
+        if data.get("VERSION") != INDEX_VERSION:
+            logging.info(f"Ignoring out of date link index {file_path}")
+            return None
+
+        index = cls(
+            PATHS=data["PATHS"], TITLES=data["TITLES"], ROOTS=data["ROOTS"]
+        )
+        index.IDS = {p: i for i, p in enumerate(index.PATHS) if p}
+        index.LINKS = [set(targets) for targets in data["LINKS"]]
+        index.BACKLINKS = [set() for _ in index.PATHS]
+        for source_id, target_id in index.edges():
+            index.BACKLINKS[target_id].add(source_id)
+        index.LISTED = [dict(listed) for listed in data["LISTED"]]
+        # json object keys are strings
+        for name in ("BROKEN", "EXTERNAL", "UNLISTED", "ALIASES", "DATES"):
+            setattr(index, name, {int(k): v for k, v in data[name].items()})
+        index.ANCHORS = {int(k): set(v) for k, v in data["ANCHORS"].items()}
+        index.SNIPPETS = {
+            int(k): {
+                "TEXT": v["TEXT"],
+                "LINKS": {int(t): b for t, b in v["LINKS"].items()},
+            }
+            for k, v in data["SNIPPETS"].items()
+        }
+        index.FRAGMENTS = {
+            int(k): [tuple(fragment) for fragment in v]
+            for k, v in data["FRAGMENTS"].items()
+        }
+        for node_id, rel_path in enumerate(index.PATHS):
+            if rel_path:
+                index.TITLE_INDEX.add(
+                    node_id,
+                    index.TITLES[node_id],
+                    index.ALIASES.get(node_id, []),
+                )
+        logging.debug(f"Loaded link index of {len(index)} documents")
+        return index
@@ -1,22 +1,27 @@
 from urllib.parse import urlparse
 
 from backlinks.collector.book import BookDictionary
-from backlinks.collector.document import DocumentDictionary
+from backlinks.collector.document import FileDictionary
+from backlinks.core.index import LinkIndex
+from backlinks.core.plan import wants_backlinks
 from backlinks.logging import logging
 
 # ###
 # Variables
 # ###
 
+logging.getLogger(__name__)
+
 
 ###
 # Functions
 # ###
 def post_linkage(
-    source: DocumentDictionary,
-    target: DocumentDictionary,
+    source: FileDictionary,
+    target: FileDictionary,
     link_type: str,
     link_status: str = "invalid",
+    snippet: str = None,
 ) -> dict:
     return {
         "source_file": source["REL_PATH"],
@@ -25,6 +30,7 @@ def post_linkage(
         "target_title": target["TITLE"],
         "status": link_status,
         "link_type": link_type,
+        "snippet": snippet,
     }
 
 
@@ -35,82 +41,111 @@ def pull_markdown_link_list(markdown_dict):
     return link_list
 
 
-def make_Crosslink(Book: BookDictionary):
+def make_Crosslink(
+    Book: BookDictionary, index: LinkIndex = None, url_status: dict = None
+) -> list:
     """builds the links between markdown files and external files
 
+    Links are read from the link index rather than re-resolved, a link to a
+    section of a document (``note.md#section``) gets a record of its own,
+    "Valid" when the target has that heading and "Broken Anchor" otherwise.
+    Links between documents carry the snippet of text around the link.
+
     Args:
-        markdown_dict (_type_): markdown dict
+        Book (BookDictionary): a loaded book
+        index (LinkIndex, optional): index of the book, built when None
+        url_status (dict, optional): result of each URL from a UrlChecker,
+            URLs missing from it are "Unchecked"
+
+    Returns:
+        list: the records, also stored in ``Book.STORAGE_ENGINE``
     """
-    Crosslinks_list = Book.STORAGE_ENGINE.CROSSLINK
-
-    for source_lnk, source_dic in BookDictionary.PAGES:
-        for lnk, lnk_type in source_dic["LINKS"].keys():
-            if lnk_type == "URL":
-                Crosslinks_list.append(
-                    post_linkage(
-                        source_dic,
-                        {"REL_PATH": lnk, "TITLE": urlparse(lnk).netloc},
-                        "URL LINK",
-                        "Valid",
-                    )
+    if index is None:
+        index = LinkIndex.from_book(Book)
+    Crosslinks_list = Book.STORAGE_ENGINE.CROSSLINK["CROSSLINK"] = []
+
+    def node(node_id):
+        return {
+            "REL_PATH": index.PATHS[node_id],
+            "TITLE": index.TITLES[node_id],
+        }
+
+    documents = {
+        doc["REL_PATH"]: doc for doc in Book.PAGES.values() if doc is not None
+    }
+    for source_dic in documents.values():
+        source_id = index.IDS[source_dic["REL_PATH"]]
+        source = node(source_id)
+
+        for lnk in index.EXTERNAL.get(source_id, []):
+            Crosslinks_list.append(
+                post_linkage(
+                    source,
+                    {"REL_PATH": lnk, "TITLE": urlparse(lnk).netloc},
+                    "URL LINK",
+                    (url_status or {}).get(lnk, "Unchecked"),
+                )
+            )
+
+        for target_id in sorted(
+            index.LINKS[source_id], key=index.PATHS.__getitem__
+        ):
+            target = node(target_id)
+            snippet = index.snippet(source_id, target_id)
+            Crosslinks_list.append(
+                post_linkage(source, target, "Markdown Link", "Valid", snippet)
+            )
+            target_dic = documents.get(target["REL_PATH"])
+            if target_dic is not None and not wants_backlinks(target_dic):
+                logging.debug(
+                    f"{target['REL_PATH']} doesn't want to backlink to "
+                    f"{source['REL_PATH']}"
                 )
                 continue
+            Crosslinks_list.append(
+                post_linkage(
+                    target,
+                    source,
+                    "Markdown Backlink",
+                    (
+                        "Valid"
+                        if source_id in index.LISTED[target_id]
+                        else "Added"
+                    ),
+                    snippet,
+                )
+            )
+
+        for target_id, fragment, lnk in index.FRAGMENTS.get(source_id, []):
+            target = node(target_id)
+            Crosslinks_list.append(
+                post_linkage(
+                    source,
+                    {
+                        "REL_PATH": f"{target['REL_PATH']}#{fragment}",
+                        "TITLE": target["TITLE"],
+                    },
+                    "Markdown Fragment Link",
+                    (
+                        "Valid"
+                        if index.has_anchor(target_id, fragment)
+                        else "Broken Anchor"
+                    ),
+                )
+            )
+
+        for lnk in index.BROKEN.get(source_id, []):
+            Crosslinks_list.append(
+                post_linkage(
+                    source,
+                    {"REL_PATH": lnk, "TITLE": ""},
+                    "Unknown LINK",
+                    "Invalid",
+                )
+            )
 
-            try:
-                if lnk in BookDictionary.PAGES.keys():
-
-                    target_dic = BookDictionary.PAGES[lnk]
-                    logging.debug(f"The {lnk} does have a target file")
-                    Crosslinks_list.append(
-                        post_linkage(
-                            source_dic, target_dic, "Markedon Link", "Valid"
-                        )
-                    )
-                    # Checking if we want backlinks
-                    if target_dic["BACKLINK"] is not True:
-                        logging.debug(
-                            f"The {lnk} does have a target file, but doesn't want to backlink to it"
-                        )
-                        continue
-
-                    if lnk in target_dic["BACKLINKS_PATH"]:
-                        logging.debug(
-                            f"backlinks exists from {lnk} to {source_lnk}"
-                        )
-                        Crosslinks_list.append(
-                            post_linkage(
-                                target_dic,
-                                source_dic,
-                                "Markdown Backlink",
-                                "Valid",
-                            )
-                        )
-                    else:
-                        logging.debug(
-                            f"backlinks DOES NOT exists from {lnk} to {source_lnk}"
-                        )
-                        target_dic.add_backlink(lnk)
-                        Crosslinks_list.append(
-                            post_linkage(
-                                target_dic,
-                                source_dic,
-                                "Markdown Backlink",
-                                "Added",
-                            )
-                        )
-                    continue
-                else:
-                    Crosslinks_list.append(
-                        post_linkage(
-                            source_dic,
-                            {"REL_PATH": lnk, "TITLE": ""},
-                            "Unknown LINK",
-                            "Invalid",
-                        )
-                    )
-            except Exception as e:
-                logging.error(f"Exception found when processing link {lnk}")
-                print(f"Caught this error: {e}")
+    logging.info(f"Found {len(Crosslinks_list)} crosslinks")
+    return Crosslinks_list
 
 
 def markdown_crossrefrence(system_dict):
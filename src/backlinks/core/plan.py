@@ -0,0 +1,318 @@
+import os
+from contextlib import ExitStack, nullcontext
+from json import dumps, load
+from pathlib import Path
+
+from backlinks.collector.document import StaleDocumentError
+from backlinks.core.index import LinkIndex
+from backlinks.core.reconcile import foreign_entries, reconcile
+from backlinks.io.locking import LOCK_TIMEOUT, VaultLock, atomic_write
+from backlinks.io.markdown import content_hash, read_markdown_bytes
+from backlinks.logging import logging
+from backlinks.markdown.markdown import (
+    DEFAULT_TEMPLATE,
+    find_backlinks_bounds,
+    render_backlinks_section,
+)
+from backlinks.markdown.templates import (
+    DEFAULT_HEADING,
+    BacklinksTemplate,
+    backlink_entry,
+    heading_regex,
+)
+from backlinks.path.path import find_root
+from backlinks.progress import QUIET
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+PLAN_VERSION = 1
+# times a file that changed under a run is re-read and written again
+RETRIES = 3
+BACKLINK_OPT_OUT = {"false", "no", "0", "off"}
+
+
+# ###
+# Functions
+# ###
+def wants_backlinks(doc) -> bool:
+    """A document takes backlinks unless its BACKLINK front-matter says no"""
+    return str(doc.get("BACKLINK", "")).strip().lower() not in BACKLINK_OPT_OUT
+
+
+def plan_file(
+    doc,
+    index: LinkIndex,
+    prune: bool = True,
+    template: BacklinksTemplate = None,
+) -> dict:
+    """The backlinks change set of one document, None when it is up to date
+
+    A document whose backlinks are unchanged is still rewritten when its
+    section is not the one the template renders, after the template changed.
+
+    Args:
+        doc (FileDictionary): a loaded document, its content is not needed
+        index (LinkIndex): the link index of the book
+        prune (bool, optional): remove stale entries. Defaults to True.
+        template (BacklinksTemplate, optional): how the section is written.
+            Defaults to a ``# Backlinks`` list.
+
+    Returns:
+        dict: the change set, with the byte range the new section replaces
+            and the section replacing it. Text after END is kept.
+    """
+    template = template or DEFAULT_TEMPLATE
+    node_id = index.IDS[doc["REL_PATH"]]
+    added, removed, unlisted = reconcile(index, node_id, prune)
+
+    # keep the order of entries that stay, new entries go at the end
+    listed = index.LISTED[node_id]
+    backlinks = [i for i in listed if i not in removed]
+    backlinks += sorted(added, key=index.PATHS.__getitem__)
+    entries = [
+        backlink_entry(
+            index.PATHS[i],
+            index.TITLES[i],
+            index.DATES.get(i),
+            index.snippet(i, node_id),
+        )
+        for i in backlinks
+    ]
+    # entries of roots not in the index are kept, under their file name as
+    # their titles are not known
+    foreign = foreign_entries(index, node_id) if prune else []
+    kept = index.UNLISTED.get(node_id, []) if not prune else foreign
+    entries += [backlink_entry(lnk, Path(lnk).stem) for lnk in kept]
+    section = template.render(entries)
+
+    if not added and not removed and not unlisted:
+        if foreign:
+            # rendering would rename them, the section is left as written
+            return None
+        section_hash = doc["SECTIONS"].get("HASH")
+        if (
+            not entries
+            or section_hash is None
+            or section_hash
+            == content_hash(section.lstrip("\n").encode("utf-8"))
+        ):
+            return None
+
+    offset = doc["SECTIONS"]["BACKLINKS"]
+    return {
+        "PATH": str(doc["PATH"]),
+        "REL_PATH": doc["REL_PATH"],
+        "HASH": doc["HASH"],
+        "OFFSET": doc["SIZE"] if offset < 0 else offset,
+        "END": doc["SECTIONS"].get("END", doc["SIZE"]),
+        "ADDED": [[index.PATHS[i], index.TITLES[i]] for i in sorted(added)],
+        "REMOVED": [listed[i] for i in sorted(removed)] + list(unlisted),
+        "BACKLINKS": [[e["path"], e["title"]] for e in entries],
+        "HEADING": template.HEADING,
+        "SECTION": section,
+    }
+
+
+def plan_backlinks(book, index: LinkIndex = None, prune: bool = True) -> dict:
+    """Works out every pending backlinks change without touching any file
+
+    Only the parsed link tables and section offsets held by the book are used,
+    so a book loaded with ``store_content=False`` plans without re-reading.
+
+    Args:
+        book (BookDictionary): a loaded book
+        index (LinkIndex, optional): the book's link index, built when missing
+        prune (bool, optional): remove backlinks whose source no longer links
+            to the document. Defaults to True.
+
+    Returns:
+        dict: a json serializable plan, see ``apply_plan``
+    """
+    return plan_books([book], index, prune)
+
+
+def plan_books(books, index: LinkIndex = None, prune: bool = True) -> dict:
+    """Plans several books against one shared index, see ``plan_backlinks``"""
+    logging.info("Planning backlinks changes")
+    if index is None:
+        index = LinkIndex.from_books(books)
+
+    files = []
+    for book in books:
+        for doc in book.PAGES.values():
+            if doc is None or not wants_backlinks(doc):
+                continue
+            change = plan_file(doc, index, prune, book.TEMPLATE)
+            if change is None:
+                continue
+            doc["NEED2UPDATE"] = True
+            files.append(change)
+
+    logging.info(f"Planned backlinks changes to {len(files)} files")
+    roots = [str(Path(book.PATH).resolve()) for book in books]
+    return {
+        "VERSION": PLAN_VERSION,
+        "ROOT": roots[0],
+        "ROOTS": roots,
+        "FILES": files,
+    }
+
+
+def save_plan(plan: dict, file_path):
+    """Dump a plan to a json file, an interrupted dump leaves the old one"""
+    atomic_write(file_path, dumps(plan, indent=4).encode("utf-8"))
+    logging.debug(f"Saved plan of {len(plan['FILES'])} files to {file_path}")
+
+
+def load_plan(file_path) -> dict:
+    """Load a plan from a json file"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        plan = load(f)
+    if plan.get("VERSION") != PLAN_VERSION:
+        raise ValueError(f"Unsupported plan version in {file_path}")
+    return plan
+
+
+def apply_change(change: dict) -> bytes:
+    """Apply one file change set, returning the new file content
+
+    The file is replaced atomically, and only if its mtime and size are still
+    the ones seen when it was read.
+
+    Raises:
+        StaleDocumentError: the file no longer matches the planned hash, or
+            was written by someone else while the change was applied
+    """
+    st = os.stat(change["PATH"])
+    raw_content = read_markdown_bytes(change["PATH"])
+    if content_hash(raw_content) != change["HASH"]:
+        raise StaleDocumentError(
+            f"{change['REL_PATH']} changed on disk since it was planned"
+        )
+    # plans saved before templates carry only the list of backlinks
+    section = change.get("SECTION")
+    if section is None:
+        section = render_backlinks_section(dict(change["BACKLINKS"]))
+    main_body = raw_content[: change["OFFSET"]].rstrip(b"\n")
+    # what follows the section is the author's, plans without END had none
+    tail = raw_content[change.get("END", len(raw_content)) :]
+    new_content = main_body + section.encode("utf-8") + tail
+    if not atomic_write(
+        change["PATH"], new_content, (st.st_mtime_ns, st.st_size)
+    ):
+        raise StaleDocumentError(
+            f"{change['REL_PATH']} changed on disk while it was written"
+        )
+    logging.debug(
+        f"Added {len(change['ADDED'])} and removed {len(change['REMOVED'])} "
+        f"backlinks in {change['REL_PATH']}"
+    )
+    return new_content
+
+
+def rebase_change(change: dict) -> dict:
+    """The same backlinks, planned against the file as it is now
+
+    A file's backlinks depend on the files linking to it, not on its own
+    text, so a file edited since planning still takes the planned section.
+    """
+    raw_content = read_markdown_bytes(change["PATH"])
+    offset, end = find_backlinks_bounds(
+        raw_content, heading_regex(change.get("HEADING", DEFAULT_HEADING))
+    )
+    if offset < 0:
+        offset = end = len(raw_content)
+    return dict(change, HASH=content_hash(raw_content), OFFSET=offset, END=end)
+
+
+def apply_with_retry(
+    change: dict, lock: VaultLock = None, retries: int = RETRIES
+) -> bool:
+    """Applies one change under its file lock, rebasing it when it conflicts
+
+    Returns:
+        bool: False when the file still conflicted after every retry
+    """
+    for attempt in range(retries + 1):
+        try:
+            with lock.file(change["REL_PATH"]) if lock else nullcontext():
+                apply_change(change)
+            return True
+        except StaleDocumentError as e:
+            if attempt == retries:
+                logging.warning(f"Skipping stale file: {e}")
+                return False
+            logging.info(f"Retrying: {e}")
+        try:
+            change = rebase_change(change)
+        except FileNotFoundError:
+            logging.warning(f"Skipping deleted file {change['REL_PATH']}")
+            return False
+    return False
+
+
+def apply_plan(
+    plan: dict,
+    retries: int = RETRIES,
+    timeout: float = LOCK_TIMEOUT,
+    progress=None,
+    failed: dict = None,
+) -> list:
+    """Writes a plan to disk, safe against other runs writing the same vault
+
+    Each root is locked shared, so runs go side by side, and each file is
+    locked while it is read, checked and replaced. A file that changed since
+    planning is re-read and retried on its own, up to retries times.
+    A file that cannot be read or written is skipped, the others are still
+    written. The files written are reported to progress, a ProgressReporter.
+
+    Args:
+        failed (dict, optional): filled with scan-relative path -> error of
+            the files that raised an error
+
+    Returns:
+        list: scan-relative paths of the files that could not be applied
+    """
+    skipped = []
+    writing = (progress or QUIET).stage("write", len(plan["FILES"]))
+    roots = [Path(root) for root in plan.get("ROOTS", [plan["ROOT"]])]
+    with ExitStack() as stack:
+        locks = {
+            root: stack.enter_context(VaultLock(root, timeout=timeout))
+            for root in roots
+        }
+        for change in plan["FILES"]:
+            lock = locks.get(find_root(change["PATH"], roots))
+            try:
+                applied = apply_with_retry(change, lock, retries)
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to write {change['REL_PATH']}: {e}")
+                if failed is not None:
+                    failed[change["REL_PATH"]] = f"{type(e).__name__}: {e}"
+                applied = False
+            if not applied:
+                skipped.append(change["REL_PATH"])
+            writing.advance()
+    writing.close()
+    logging.info(
+        f"Updated {len(plan['FILES']) - len(skipped)} files with backlinks"
+    )
+    return skipped
+
+
+def mark_applied(index: LinkIndex, plan: dict, skipped: list = ()):
+    """Brings the backlinks sections recorded in the index in line with a plan"""
+    for change in plan["FILES"]:
+        if change["REL_PATH"] in skipped:
+            continue
+        node_id = index.IDS[change["REL_PATH"]]
+        index.LISTED[node_id] = {
+            index.IDS[p]: p for p, _ in change["BACKLINKS"] if p in index.IDS
+        }
+        index.UNLISTED[node_id] = [
+            p for p, _ in change["BACKLINKS"] if p not in index.IDS
+        ]
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+from backlinks.core.index import LinkIndex
+from backlinks.logging import logging
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+
+# ###
+# Functions
+# ###
+def foreign_entries(index: LinkIndex, node_id: int) -> list:
+    """Unresolvable backlinks entries under a namespace no indexed root has
+
+    They were written by a run over other roots, e.g. ``/one/o.md`` in a
+    document of root ``two`` when only ``two`` is scanned. Not being able to
+    resolve them says nothing about whether they are stale.
+    """
+    names = {Path(root).name.upper() for root in index.ROOTS}
+    if not names:
+        return []
+    return [
+        lnk
+        for lnk in index.UNLISTED.get(node_id, [])
+        if lnk.startswith("/")
+        and "/" in lnk[1:]
+        and lnk[1:].split("/", 1)[0].upper() not in names
+    ]
+
+
+def reconcile(index: LinkIndex, node_id: int, prune: bool = True) -> tuple:
+    """Difference between the wanted and listed backlinks of one document
+
+    Both sides are sets of interned ids, so this costs O(backlinks) however
+    large the hub note is.
+
+    Args:
+        index (LinkIndex): the link index
+        node_id (int): id of the document
+        prune (bool, optional): report listed entries whose source no longer
+            links here, or that point to no document at all, except those of
+            other namespaces (see ``foreign_entries``). Defaults to True.
+
+    Returns:
+        tuple: ``(added, removed, unlisted)``, the ids to add, the ids to
+            remove and the unresolvable entries (as written) to remove
+    """
+    wanted = index.BACKLINKS[node_id]
+    listed = index.LISTED[node_id].keys()
+    added = wanted - listed
+    if not prune:
+        return added, set(), []
+    foreign = foreign_entries(index, node_id)
+    unlisted = [
+        lnk for lnk in index.UNLISTED.get(node_id, []) if lnk not in foreign
+    ]
+    return added, listed - wanted, unlisted
+
+
+def reconcile_backlinks(index: LinkIndex, prune: bool = True) -> dict:
+    """Per document backlinks delta, only documents with something to change
+
+    Returns:
+        dict: node id -> ``(added, removed, unlisted)``, see ``reconcile``
+    """
+    deltas = {}
+    for node_id in range(len(index)):
+        added, removed, unlisted = reconcile(index, node_id, prune)
+        if added or removed or unlisted:
+            deltas[node_id] = (added, removed, unlisted)
+    logging.info(f"Found backlinks changes for {len(deltas)} documents")
+    return deltas
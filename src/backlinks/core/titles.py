@@ -0,0 +1,123 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from backlinks.logging import logging
+from backlinks.yaml import DATE_FIELDS, parse_date, parse_list
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+
+# ###
+# Functions
+# ###
+def document_title(doc) -> str:
+    """Display title of a document: front matter title, first heading, file name"""
+    return (
+        doc.get("TITLE", None)
+        or doc.get("HEADING", None)
+        or Path(doc["REL_PATH"]).stem
+    )
+
+
+def document_date(doc) -> str:
+    """ISO date of a document, the first valid one of DATE_FIELDS"""
+    for name in DATE_FIELDS:
+        parsed = parse_date(doc.get(name, None))
+        if parsed is not None:
+            return parsed
+    return None
+
+
+def document_aliases(doc) -> list:
+    """Alternative names a document goes by, from its ``aliases`` front matter"""
+    return parse_list(doc.get("ALIASES", None))
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class TitleIndex:
+    """Titles and aliases of documents, looked up by name
+
+    Names map to document ids of a LinkIndex. Exact and case-insensitive
+    lookups are dictionary hits, prefix lookups bisect a sorted array of
+    casefolded names which is rebuilt lazily after the index changes.
+
+    Args:
+        NAMES (dict): title and aliases of each id, the title first
+        EXACT (dict): ids known by each name
+        FOLDED (dict): ids known by each casefolded name
+        KEYS (list): sorted (casefolded name, id) pairs, None when out of date
+    """
+
+    NAMES: dict = field(default_factory=dict)
+    EXACT: dict = field(default_factory=dict)
+    FOLDED: dict = field(default_factory=dict)
+    KEYS: list = None
+
+    def __len__(self) -> int:
+        return len(self.NAMES)
+
+    def add(self, node_id: int, title: str, aliases: list = ()):
+        """Records the title and aliases of node_id, replacing earlier ones"""
+        self.remove(node_id)
+        names = list(dict.fromkeys([title, *aliases]))
+        self.NAMES[node_id] = names
+        for name in names:
+            self.EXACT.setdefault(name, set()).add(node_id)
+            self.FOLDED.setdefault(name.casefold(), set()).add(node_id)
+        self.KEYS = None
+
+    def remove(self, node_id: int):
+        """Forgets every name of node_id"""
+        for name in self.NAMES.pop(node_id, []):
+            for table, key in (
+                (self.EXACT, name),
+                (self.FOLDED, name.casefold()),
+            ):
+                node_ids = table.get(key, set())
+                node_ids.discard(node_id)
+                if not node_ids:
+                    table.pop(key, None)
+        self.KEYS = None
+
+    def exact(self, name: str) -> list:
+        """Ids whose title or an alias is exactly name"""
+        return sorted(self.EXACT.get(name, ()))
+
+    def casefold(self, name: str) -> list:
+        """Ids whose title or an alias matches name, ignoring case"""
+        return sorted(self.FOLDED.get(name.casefold(), ()))
+
+    def lookup(self, name: str) -> list:
+        """Exact matches, or case-insensitive ones when there are none"""
+        return self.exact(name) or self.casefold(name)
+
+    def prefix(self, prefix: str, limit: int = None) -> list:
+        """Ids with a title or alias starting with prefix, ignoring case
+
+        Returns:
+            list: ids in order of the matching name, each id once
+        """
+        if self.KEYS is None:
+            self.KEYS = sorted(
+                (key, node_id)
+                for key, node_ids in self.FOLDED.items()
+                for node_id in node_ids
+            )
+        prefix = prefix.casefold()
+        found = {}
+        start = bisect_left(self.KEYS, (prefix, -1))
+        for key, node_id in self.KEYS[start:]:
+            if not key.startswith(prefix) or len(found) == limit:
+                break
+            found.setdefault(node_id, None)
+        return list(found)
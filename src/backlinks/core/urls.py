@@ -0,0 +1,383 @@
+import asyncio
+from dataclasses import dataclass, field
+from json import dumps, load
+from pathlib import Path
+from time import monotonic, time
+from urllib.parse import quote, urlsplit
+
+from backlinks.io.locking import atomic_write
+from backlinks.logging import logging
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+URL_CACHE_FILE = ".backlinks_urls.json"
+URL_CACHE_VERSION = 1
+URL_TTL = 7 * 24 * 3600.0
+CHECKED_SCHEMES = ("http", "https")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+MAX_CONNECTIONS = 32
+MAX_PER_HOST = 4
+# seconds between the start of two requests to one host
+HOST_INTERVAL = 0.25
+TIMEOUT = 10.0
+USER_AGENT = "backlinks-url-check"
+# statuses of servers that refuse HEAD, retried with GET
+HEAD_REFUSED = (405, 501)
+# characters left as written in a request target, the rest are %-encoded
+TARGET_SAFE = "/%?=&:@!$'()*+,;~"
+
+
+# ###
+# Functions
+# ###
+def url_result(status: int) -> str:
+    """Link status of an HTTP status code, None being no response at all"""
+    if status is None:
+        return "Unreachable"
+    return "Valid" if status < 400 else "Broken"
+
+
+def index_urls(index) -> list:
+    """Every distinct URL linked from an index, in a stable order"""
+    return sorted({url for urls in index.EXTERNAL.values() for url in urls})
+
+
+def request_host(parts) -> str:
+    """The ASCII host of a split URL, IDNA-encoded and without a port"""
+    if ":" in parts.hostname:
+        return parts.hostname  # an IPv6 address
+    return parts.hostname.encode("idna").decode("ascii")
+
+
+def request_target(parts) -> str:
+    """The request line target of a split URL, %-encoded to ASCII"""
+    target = parts.path or "/"
+    if parts.query:
+        target += f"?{parts.query}"
+    return quote(target, safe=TARGET_SAFE)
+
+
+def host_header(parts) -> str:
+    """The Host header of a split URL, IPv6 addresses in brackets"""
+    host = request_host(parts)
+    if ":" in host:
+        host = f"[{host}]"
+    if parts.port:
+        host += f":{parts.port}"
+    return host
+
+
+def broken_urls(index, results: dict) -> dict:
+    """URLs of each id that were checked and are not valid
+
+    Returns:
+        dict: source id to the URLs as written
+    """
+    broken = {}
+    for source_id, urls in sorted(index.EXTERNAL.items()):
+        for url in urls:
+            if results.get(url, "Valid") not in ("Valid", "Unchecked"):
+                broken.setdefault(source_id, []).append(url)
+    return broken
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class UrlStatusCache:
+    """Results of earlier URL checks, trusted until they are TTL seconds old
+
+    Args:
+        PATH (Path): json file the cache persists to, None to keep it in memory
+        TTL (float): seconds a result stays fresh
+        ENTRIES (dict): url -> [HTTP status or None, result, checked at]
+    """
+
+    PATH: Path = None
+    TTL: float = URL_TTL
+    ENTRIES: dict = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.ENTRIES)
+
+    def get(self, url: str, now: float = None) -> str:
+        """The cached result of url, None when missing or expired"""
+        entry = self.ENTRIES.get(url)
+        if entry is None or (now or time()) - entry[2] > self.TTL:
+            return None
+        return entry[1]
+
+    def put(self, url: str, status: int, result: str, now: float = None):
+        self.ENTRIES[url] = [status, result, now or time()]
+
+    def load(self, file_path: Path = None):
+        """Load entries from a json file, a missing file is an empty cache"""
+        if file_path is None and self.PATH is None:
+            return self
+        file_path = Path(file_path or self.PATH)
+        if not file_path.exists():
+            logging.info(f"No URL cache found at {file_path}, starting fresh")
+            return self
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = load(f)
+        if data.get("VERSION") != URL_CACHE_VERSION:
+            logging.info(f"Ignoring out of date URL cache {file_path}")
+            return self
+        self.ENTRIES = data["ENTRIES"]
+        logging.debug(f"Loaded {len(self.ENTRIES)} URL cache entries")
+        return self
+
+    def dump(self, file_path: Path = None):
+        """Dump the entries that are still fresh to a json file"""
+        if file_path is None and self.PATH is None:
+            return
+        file_path = Path(file_path or self.PATH)
+        now = time()
+        entries = {
+            url: entry
+            for url, entry in self.ENTRIES.items()
+            if now - entry[2] <= self.TTL
+        }
+        data = {"VERSION": URL_CACHE_VERSION, "ENTRIES": entries}
+        atomic_write(file_path, dumps(data).encode("utf-8"))
+        logging.info(f"Saved {len(entries)} URL cache entries to {file_path}")
+
+
+@dataclass
+class HttpTransport:
+    """HEAD requests over asyncio streams, reusing connections per host
+
+    Connections are kept alive and pooled by (scheme, host, port), so a vault
+    linking a hundred pages of one site opens a handful of connections to it
+    rather than a hundred. Servers refusing HEAD are asked with GET, whose
+    connection is closed after the status line instead of reading the body.
+
+    Args:
+        TIMEOUT (float): seconds allowed for connecting and for each response
+        POOL (dict): idle (reader, writer) pairs of each host
+    """
+
+    TIMEOUT: float = TIMEOUT
+    POOL: dict = field(default_factory=dict)
+
+    async def head(self, url: str) -> int:
+        """HTTP status of url"""
+        parts = urlsplit(url)
+        if parts.scheme not in DEFAULT_PORTS or not parts.hostname:
+            raise ValueError(f"Cannot check {url}")
+        status = await self._request("HEAD", parts)
+        if status in HEAD_REFUSED:
+            status = await self._request("GET", parts)
+        return status
+
+    async def _request(self, method: str, parts) -> int:
+        key = (parts.scheme, parts.hostname, parts.port)
+        idle = self.POOL.setdefault(key, [])
+        while True:
+            reused = bool(idle)
+            reader, writer = idle.pop() if idle else await self._connect(parts)
+            try:
+                status, keep_alive = await asyncio.wait_for(
+                    self._exchange(method, parts, reader, writer), self.TIMEOUT
+                )
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # the server may have dropped an idle connection, try a new one
+                if not reused:
+                    raise
+            except BaseException:
+                writer.close()
+                raise
+
+        if keep_alive and method == "HEAD":
+            idle.append((reader, writer))
+        else:
+            writer.close()
+        return status
+
+    async def _connect(self, parts):
+        port = parts.port or DEFAULT_PORTS[parts.scheme]
+        return await asyncio.wait_for(
+            asyncio.open_connection(
+                request_host(parts),
+                port,
+                ssl=True if parts.scheme == "https" else None,
+            ),
+            self.TIMEOUT,
+        )
+
+    async def _exchange(self, method: str, parts, reader, writer) -> tuple:
+        writer.write(
+            (
+                f"{method} {request_target(parts)} HTTP/1.1\r\n"
+                f"Host: {host_header(parts)}\r\n"
+                f"User-Agent: {USER_AGENT}\r\n"
+                "Accept: */*\r\n"
+                "Connection: keep-alive\r\n\r\n"
+            ).encode("latin-1")
+        )
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before a response")
+        version, status = status_line.decode("latin-1").split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+        keep_alive = (
+            version == "HTTP/1.1" and headers.get("connection") != "close"
+        )
+        return int(status), keep_alive
+
+    def close(self):
+        """Closes every pooled connection"""
+        for idle in self.POOL.values():
+            for _, writer in idle:
+                writer.close()
+        self.POOL.clear()
+
+
+@dataclass
+class StubTransport:
+    """Answers URL checks from a table, for tests and offline runs
+
+    Args:
+        RESPONSES (dict): HTTP status of each url, None for unreachable
+        DEFAULT (int): status of urls missing from RESPONSES
+        DELAY (float): seconds each answer takes
+        CALLS (list): urls asked about, in order
+    """
+
+    RESPONSES: dict = field(default_factory=dict)
+    DEFAULT: int = 200
+    DELAY: float = 0.0
+    CALLS: list = field(default_factory=list)
+
+    async def head(self, url: str) -> int:
+        self.CALLS.append(url)
+        if self.DELAY:
+            await asyncio.sleep(self.DELAY)
+        status = self.RESPONSES.get(url, self.DEFAULT)
+        if status is None:
+            raise ConnectionRefusedError(f"{url} is unreachable")
+        return status
+
+    def close(self):
+        pass
+
+    @classmethod
+    def from_file(cls, file_path):
+        """A stub answering from a json object of url -> status
+
+        A ``DEFAULT`` key sets the status of every other url.
+        """
+        with open(file_path, "r", encoding="utf-8") as f:
+            responses = load(f)
+        return cls(responses, DEFAULT=responses.pop("DEFAULT", 200))
+
+
+class _HostLimit:
+    """At most limit requests in flight to a host, starting interval apart"""
+
+    def __init__(self, limit: int, interval: float):
+        self.slots = asyncio.Semaphore(limit)
+        self.interval = interval
+        self.next_start = 0.0
+
+    async def __aenter__(self):
+        await self.slots.acquire()
+        now = monotonic()
+        wait = self.next_start - now
+        self.next_start = max(now, self.next_start) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def __aexit__(self, *exc_info):
+        self.slots.release()
+
+
+@dataclass
+class UrlChecker:
+    """Checks URLs concurrently, skipping those with a fresh cached result
+
+    Any object with an async ``head(url) -> status`` and a ``close()`` can
+    be the transport, HttpTransport goes to the network and StubTransport
+    does not.
+
+    Args:
+        TRANSPORT (HttpTransport): what sends the requests
+        CACHE (UrlStatusCache): earlier results (optional)
+        MAX_CONNECTIONS (int): requests in flight over all hosts
+        MAX_PER_HOST (int): requests in flight to one host
+        HOST_INTERVAL (float): seconds between requests to one host
+    """
+
+    TRANSPORT: object = field(default_factory=HttpTransport)
+    CACHE: UrlStatusCache = None
+    MAX_CONNECTIONS: int = MAX_CONNECTIONS
+    MAX_PER_HOST: int = MAX_PER_HOST
+    HOST_INTERVAL: float = HOST_INTERVAL
+
+    def check(self, urls) -> dict:
+        """Link status of each url
+
+        Returns:
+            dict: url -> "Valid", "Broken", "Unreachable", or "Unchecked"
+                for schemes that are not checked (mailto:, ftp:)
+        """
+        results = {}
+        pending = []
+        for url in dict.fromkeys(urls):
+            if urlsplit(url).scheme.lower() not in CHECKED_SCHEMES:
+                results[url] = "Unchecked"
+                continue
+            cached = self.CACHE.get(url) if self.CACHE is not None else None
+            if cached is None:
+                pending.append(url)
+            else:
+                results[url] = cached
+
+        if pending:
+            logging.info(
+                f"Checking {len(pending)} URLs, {len(results)} known already"
+            )
+            for url, status in asyncio.run(self._check_all(pending)).items():
+                results[url] = url_result(status)
+                if self.CACHE is not None:
+                    self.CACHE.put(url, status, results[url])
+        return results
+
+    async def _check_all(self, urls: list) -> dict:
+        connections = asyncio.Semaphore(self.MAX_CONNECTIONS)
+        hosts = {}
+
+        async def check_one(url):
+            host = urlsplit(url).hostname
+            if host not in hosts:
+                hosts[host] = _HostLimit(self.MAX_PER_HOST, self.HOST_INTERVAL)
+            # wait on the host first, a slow host must not hold global slots
+            async with hosts[host], connections:
+                try:
+                    return url, await self.TRANSPORT.head(url)
+                except (OSError, asyncio.TimeoutError, ValueError) as e:
+                    logging.debug(f"No response from {url}: {e!r}")
+                    return url, None
+
+        try:
+            return dict(await asyncio.gather(*map(check_one, urls)))
+        finally:
+            # pooled connections belong to this event loop
+            self.TRANSPORT.close()
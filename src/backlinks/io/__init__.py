@@ -1,5 +1,11 @@
 # Defining the all module for backlinks io
-__all__ = ["csv"]
+__all__ = ["columnar", "csv", "locking", "markdown", "mermaid"]
 
-# defining the dope package
-from backlinks.io import csv
+from importlib import import_module
+
+
+# modules are loaded on first use, importing the package stays cheap
+def __getattr__(name):
+    if name in __all__:
+        return import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
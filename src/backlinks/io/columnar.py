@@ -0,0 +1,219 @@
+import csv
+import sys
+from array import array
+from json import dumps, load
+from pathlib import Path
+
+from backlinks.io.locking import atomic_write
+from backlinks.logging import logging
+
+logging.getLogger(__name__)
+
+# ###
+# Variables
+# ###
+
+COLUMNAR_VERSION = 1
+# directory the columns are written to, next to backlinks.csv
+COLUMNAR_DIR = "backlinks_columns"
+MANIFEST_FILE = "manifest.json"
+
+# column name -> (array typecode, numpy dtype)
+COLUMN_TYPES = {
+    "source": ("i", "<i4"),
+    "target": ("i", "<i4"),
+    "link_text": ("i", "<i4"),
+    "status": ("B", "|u1"),
+    "link_type": ("B", "|u1"),
+    "hierarchy_level": ("h", "<i2"),
+}
+STRING_TABLES = ["paths", "titles", "link_text", "status", "link_type"]
+
+
+# ###
+# String tables
+# ###
+class StringTable:
+    """Dictionary encoder, hands out one integer code per distinct string"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value) -> int:
+        value = "" if value is None else str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+def _write_array(file_path, data: array):
+    if sys.byteorder == "big":
+        data = array(data.typecode, data)
+        data.byteswap()
+    atomic_write(file_path, data.tobytes())
+
+
+def _read_array(file_path, typecode: str) -> array:
+    data = array(typecode)
+    with open(file_path, "rb") as f:
+        data.frombytes(f.read())
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+
+def _write_strings(dir_path, name: str, values: list):
+    """Writes strings Arrow style, one utf-8 blob plus int64 offsets"""
+    offsets = array("q", [0])
+    blob = []
+    for value in values:
+        encoded = value.encode("utf-8")
+        blob.append(encoded)
+        offsets.append(offsets[-1] + len(encoded))
+    atomic_write(dir_path / f"{name}.utf8", b"".join(blob))
+    _write_array(dir_path / f"{name}.offsets", offsets)
+
+
+def _read_strings(dir_path, name: str) -> list:
+    offsets = _read_array(dir_path / f"{name}.offsets", "q")
+    with open(dir_path / f"{name}.utf8", "rb") as f:
+        blob = f.read()
+    return [
+        blob[offsets[i] : offsets[i + 1]].decode("utf-8")
+        for i in range(len(offsets) - 1)
+    ]
+
+
+# ###
+# Columnar functions
+# ###
+def save_columnar_data(dir_path, links_data):
+    """Save links data as dictionary encoded binary columns
+
+    Every file path gets an integer node id. The source/target columns hold
+    those ids, with the matching paths and titles kept in separate string
+    tables. Columns are raw little-endian arrays so they can be memory-mapped.
+    Every file is replaced atomically and the manifest goes last, so a
+    reader never sees a manifest ahead of its columns.
+
+    Args:
+        dir_path (Path): output directory, created if needed
+        links_data (iterable): link records, as passed to save_csv_data
+
+    Returns:
+        int: the number of link records written
+    """
+    dir_path = Path(dir_path)
+    dir_path.mkdir(parents=True, exist_ok=True)
+    logging.info(f"Saving columnar link records to {dir_path}")
+
+    tables = {name: StringTable() for name in STRING_TABLES}
+    columns = {
+        name: array(typecode) for name, (typecode, _) in COLUMN_TYPES.items()
+    }
+    titles = {}
+
+    def node_id(file_path, title):
+        code = tables["paths"].encode(file_path)
+        if title and not titles.get(code):
+            titles[code] = title
+        return code
+
+    for row in links_data:
+        columns["source"].append(
+            node_id(row["source_file"], row["source_title"])
+        )
+        columns["target"].append(
+            node_id(row["target_file"], row["target_title"])
+        )
+        columns["link_text"].append(
+            tables["link_text"].encode(row["link_text"])
+        )
+        columns["status"].append(tables["status"].encode(row["status"]))
+        columns["link_type"].append(
+            tables["link_type"].encode(row["link_type"])
+        )
+        columns["hierarchy_level"].append(int(row["hierarchy_level"]))
+
+    tables["titles"].values = [
+        str(titles.get(code, "")) for code in range(len(tables["paths"].values))
+    ]
+
+    for name, data in columns.items():
+        _write_array(dir_path / f"{name}.bin", data)
+    for name, table in tables.items():
+        _write_strings(dir_path, name, table.values)
+
+    manifest = {
+        "version": COLUMNAR_VERSION,
+        "rows": len(columns["source"]),
+        "nodes": len(tables["paths"].values),
+        "columns": {name: dtype for name, (_, dtype) in COLUMN_TYPES.items()},
+        "tables": STRING_TABLES,
+    }
+    atomic_write(
+        dir_path / MANIFEST_FILE, dumps(manifest, indent=4).encode("utf-8")
+    )
+    logging.debug(
+        f"Saved {manifest['rows']} link records over {manifest['nodes']} nodes"
+    )
+    return manifest["rows"]
+
+
+def load_columnar_data(dir_path, mmap: bool = False, use_numpy: bool = True):
+    """Load a columnar link table written by save_columnar_data
+
+    Args:
+        dir_path (Path): directory holding the columns
+        mmap (bool, optional): memory-map the columns instead of reading them,
+            needs numpy. Defaults to False.
+        use_numpy (bool, optional): return numpy arrays when numpy is
+            installed, otherwise ``array.array``. Defaults to True.
+
+    Returns:
+        tuple: ``(columns, tables)``, dictionaries of the integer columns and
+            of the decoded string tables
+    """
+    dir_path = Path(dir_path)
+    with open(dir_path / MANIFEST_FILE, "r", encoding="utf-8") as f:
+        manifest = load(f)
+    if manifest["version"] != COLUMNAR_VERSION:
+        raise ValueError(
+            f"Unsupported columnar version {manifest['version']} in {dir_path}"
+        )
+
+    np = None
+    if use_numpy or mmap:
+        try:
+            import numpy as np
+        except ImportError:
+            if mmap:
+                raise
+            logging.debug("numpy not installed, loading columns as arrays")
+
+    columns = {}
+    for name, dtype in manifest["columns"].items():
+        file_path = dir_path / f"{name}.bin"
+        if np is None:
+            columns[name] = _read_array(file_path, COLUMN_TYPES[name][0])
+        elif mmap and manifest["rows"]:
+            columns[name] = np.memmap(file_path, dtype=dtype, mode="r")
+        else:
+            columns[name] = np.fromfile(file_path, dtype=dtype)
+
+    tables = {
+        name: _read_strings(dir_path, name) for name in manifest["tables"]
+    }
+    logging.info(f"Loaded {manifest['rows']} columnar link records")
+    return columns, tables
+
+
+def csv_to_columnar(csv_path, dir_path):
+    """Convert a backlinks.csv written by save_csv_data to columnar form"""
+    logging.info(f"Converting {csv_path} to columnar link records")
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        return save_columnar_data(dir_path, csv.DictReader(f))
@@ -0,0 +1,158 @@
+import os
+import threading
+from contextlib import contextmanager
+from hashlib import sha1
+from pathlib import Path
+from time import monotonic, sleep
+
+from backlinks.logging import logging
+
+try:
+    import fcntl
+except ImportError:  # not on windows
+    fcntl = None
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+LOCK_FILE = ".backlinks.lock"
+LOCK_TIMEOUT = 30.0
+POLL_SECONDS = 0.05
+# file locks are one byte ranges of the lock file, placed by path hash
+LOCK_SLOTS = 2**31
+
+
+class LockTimeoutError(TimeoutError):
+    """Raised when a vault or file lock is not granted in time"""
+
+
+###
+# Class
+# ###
+
+
+class VaultLock:
+    """Advisory locks on a vault and on single files in it
+
+    The vault lock is an ``flock`` on LOCK_FILE at the vault root. Runs take
+    it shared so they proceed side by side, only work that rewrites vault
+    wide state needs it exclusive. File locks are ``lockf`` byte range locks
+    on the same file, one byte per path, so two runs only wait on each other
+    for the files they both write. Like any POSIX record lock they exclude
+    other processes, not other threads of the same process.
+
+    Without fcntl (windows) every lock is granted at once.
+
+    Args:
+        path (Path): root of the vault
+        shared (bool, optional): take the vault lock shared. Defaults to True.
+        timeout (float, optional): seconds to wait for any one lock
+    """
+
+    def __init__(
+        self, path, shared: bool = True, timeout: float = LOCK_TIMEOUT
+    ):
+        self.path = Path(path) / LOCK_FILE
+        self.shared = shared
+        self.timeout = timeout
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is None:
+            logging.debug("fcntl is not available, running without locks")
+            return self
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        mode = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        try:
+            self._acquire(lambda: fcntl.flock(self.fd, mode | fcntl.LOCK_NB))
+        except BaseException:
+            os.close(self.fd)
+            self.fd = None
+            raise
+        logging.debug(
+            f"Took {'shared' if self.shared else 'exclusive'} lock {self.path}"
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.fd is not None:
+            # closing drops the vault lock and every file lock with it
+            os.close(self.fd)
+            self.fd = None
+
+    def _acquire(self, try_lock):
+        deadline = monotonic() + self.timeout
+        while True:
+            try:
+                return try_lock()
+            except OSError:
+                if monotonic() > deadline:
+                    raise LockTimeoutError(f"Timed out waiting on {self.path}")
+                sleep(POLL_SECONDS)
+
+    @contextmanager
+    def file(self, rel_path: str):
+        """Holds the lock of one scan-relative path"""
+        if self.fd is None:
+            yield
+            return
+        slot = int(sha1(rel_path.encode("utf-8")).hexdigest()[:8], 16)
+        slot %= LOCK_SLOTS
+        self._acquire(
+            lambda: fcntl.lockf(
+                self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot, os.SEEK_SET
+            )
+        )
+        try:
+            yield
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, slot, os.SEEK_SET)
+
+
+# ###
+# Functions
+# ###
+def atomic_write(file_path, data: bytes, expect_stat: tuple = None):
+    """Replaces a file in one step, readers see the old or the new content
+
+    The data goes to a temporary file next to file_path which is then
+    renamed over it, keeping the file's permissions. The temporary file is
+    named after the process and thread, so threads writing the same file
+    each rename their own.
+
+    Args:
+        file_path (Path): file to write
+        data (bytes): the new content
+        expect_stat (tuple, optional): (mtime_ns, size) the file must still
+            have just before the rename, checked last so an editor saving in
+            the meantime is noticed
+
+    Returns:
+        bool: False when the file no longer matched expect_stat and was left
+            alone
+    """
+    file_path = Path(file_path)
+    temp_path = file_path.with_name(
+        f".{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            st = os.stat(file_path)
+            os.chmod(temp_path, st.st_mode & 0o7777)
+        except FileNotFoundError:
+            st = None
+        if expect_stat is not None and (
+            st is None or (st.st_mtime_ns, st.st_size) != tuple(expect_stat)
+        ):
+            return False
+        os.replace(temp_path, file_path)
+        return True
+    finally:
+        temp_path.unlink(missing_ok=True)
@@ -0,0 +1,36 @@
+from hashlib import sha1
+
+from backlinks.logging import logging
+
+logging.getLogger(__name__)
+
+
+# ###
+# Markdown file functions
+# ###
+def content_hash(data: bytes) -> str:
+    """Hash raw document bytes
+
+    Uses git's blob hashing so the value lines up with git object ids.
+    """
+    return sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def read_markdown_bytes(markdown_doc_filepath) -> bytes:
+    """Function that reads the raw bytes of a markdown file"""
+    with open(markdown_doc_filepath, "rb") as f:
+        return f.read()
+
+
+def read_markdown_doc(markdown_doc_filepath) -> str:
+    """Function that opens a markdown file"""
+    with open(markdown_doc_filepath, "r", encoding="utf-8") as f:
+        markdown_content = f.read()
+    return markdown_content
+
+
+def write_markdown_doc(markdown_doc_filepath, content: str):
+    """Function that writes a markdown file"""
+    with open(markdown_doc_filepath, "w", encoding="utf-8") as f:
+        f.write(content)
+    logging.debug(f"Wrote updated content to {markdown_doc_filepath}")
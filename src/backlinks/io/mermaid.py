@@ -0,0 +1,145 @@
+from collections import deque
+from heapq import nlargest
+from pathlib import PurePosixPath
+
+from backlinks.logging import logging
+
+logging.getLogger(__name__)
+
+# ###
+# Variables
+# ###
+
+MAX_NODES = 200
+MAX_EDGES = 1000
+
+
+# ###
+# Mermaid functions
+# ###
+def escape_label(label) -> str:
+    """Make a string safe to use as a quoted Mermaid label"""
+    return str(label).replace('"', "#quot;")
+
+
+def neighborhood(index, node_id: int, hops: int = 1) -> set:
+    """Ids within `hops` links of node_id, following links in both directions"""
+    seen = {node_id}
+    frontier = deque([(node_id, 0)])
+    while frontier:
+        current, depth = frontier.popleft()
+        if depth == hops:
+            continue
+        for other in index.LINKS[current] | index.BACKLINKS[current]:
+            if other not in seen:
+                seen.add(other)
+                frontier.append((other, depth + 1))
+    return seen
+
+
+def select_nodes(index, focus=None, hops: int = 1, max_nodes=MAX_NODES) -> set:
+    """Pick the nodes to draw, pruning the lowest degree nodes over max_nodes
+
+    Args:
+        index (LinkIndex): the link index
+        focus (str, optional): scan-relative path to center the graph on
+        hops (int, optional): neighborhood size around focus. Defaults to 1.
+        max_nodes (int, optional): node cap. Defaults to MAX_NODES.
+
+    Returns:
+        set: the selected node ids
+    """
+    if focus is not None:
+        focus_id = index.IDS[focus]
+        nodes = neighborhood(index, focus_id, hops)
+    else:
+        focus_id = None
+        nodes = {i for i in range(len(index)) if index.degree(i)}
+
+    if max_nodes and len(nodes) > max_nodes:
+        logging.info(f"Pruning {len(nodes) - max_nodes} low degree nodes")
+        kept = nlargest(max_nodes, nodes, key=index.degree)
+        nodes = set(kept)
+        if focus_id is not None and focus_id not in nodes:
+            nodes.remove(kept[-1])
+            nodes.add(focus_id)
+    return nodes
+
+
+def select_edges(index, nodes: set, max_edges=MAX_EDGES) -> list:
+    """Edges between selected nodes, keeping the best connected ones over max_edges"""
+    edges = [
+        (source_id, target_id)
+        for source_id in nodes
+        for target_id in index.LINKS[source_id]
+        if target_id in nodes
+    ]
+    if max_edges and len(edges) > max_edges:
+        logging.info(f"Pruning {len(edges) - max_edges} low degree edges")
+        edges = nlargest(
+            max_edges,
+            edges,
+            key=lambda e: index.degree(e[0]) + index.degree(e[1]),
+        )
+    return sorted(edges)
+
+
+def mermaid_graph(
+    index,
+    focus=None,
+    hops: int = 1,
+    cluster: bool = True,
+    max_nodes=MAX_NODES,
+    max_edges=MAX_EDGES,
+    direction: str = "TD",
+) -> str:
+    """Generate a Mermaid flowchart from a LinkIndex
+
+    Works entirely off the in-memory index, no document is read.
+
+    Args:
+        index (LinkIndex): the link index
+        focus (str, optional): scan-relative path to center the graph on
+        hops (int, optional): neighborhood size around focus. Defaults to 1.
+        cluster (bool, optional): group nodes in a subgraph per folder.
+            Defaults to True.
+        max_nodes (int, optional): node cap, 0 for none. Defaults to MAX_NODES.
+        max_edges (int, optional): edge cap, 0 for none. Defaults to MAX_EDGES.
+        direction (str, optional): Mermaid flow direction. Defaults to "TD".
+
+    Returns:
+        str: Mermaid flowchart code
+    """
+    nodes = select_nodes(index, focus, hops, max_nodes)
+    edges = select_edges(index, nodes, max_edges)
+
+    chart_lines = [f"flowchart {direction}"]
+    folders = {}
+    for node_id in sorted(nodes):
+        folder = (
+            str(PurePosixPath(index.PATHS[node_id]).parent) if cluster else ""
+        )
+        folders.setdefault(folder, []).append(node_id)
+
+    for folder_idx, (folder, folder_nodes) in enumerate(
+        sorted(folders.items())
+    ):
+        indent = "    "
+        if cluster:
+            chart_lines.append(
+                f'    subgraph f{folder_idx}["{escape_label(folder)}"]'
+            )
+            indent = "        "
+        for node_id in folder_nodes:
+            label = escape_label(index.TITLES[node_id])
+            chart_lines.append(f'{indent}n{node_id}["{label}"]')
+        if cluster:
+            chart_lines.append("    end")
+
+    for source_id, target_id in edges:
+        chart_lines.append(f"    n{source_id} --> n{target_id}")
+
+    logging.info(
+        f"Generated Mermaid graph of {len(nodes)} nodes, {len(edges)} edges"
+    )
+    return "\n".join(chart_lines)
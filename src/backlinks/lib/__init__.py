@@ -0,0 +1,15 @@
+# Defining the all module for backlinks lib
+__all__ = ["links"]
+
+from importlib import import_module
+
+# modules are loaded on first use, importing the package stays cheap
+_LAZY_NAMES = {"type_of_link": "backlinks.lib.links"}
+
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        return getattr(import_module(_LAZY_NAMES[name]), name)
+    if name in __all__:
+        return import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
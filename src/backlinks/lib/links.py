@@ -0,0 +1,37 @@
+import re
+
+# ###
+# Variables
+# ###
+
+URL_SCHEMES = ("http", "https", "ftp", "mailto")
+SCHEME_REGEX = re.compile(r"([A-Za-z][A-Za-z0-9+.-]*):")
+
+
+# ###
+# Functions
+# ###
+def link_type(link: str) -> str:
+    """Classify a single link target as URL, MARKDOWN or FILE"""
+    scheme = SCHEME_REGEX.match(link)
+    if scheme and scheme.group(1).lower() in URL_SCHEMES:
+        return "URL"
+    if link.split("#", 1)[0].lower().endswith(".md"):
+        return "MARKDOWN"
+    return "FILE"
+
+
+def type_of_link(links):
+    """Classify link targets
+
+    Args:
+        links (str | list): a single link target, or the ``(text, target)``
+            tuples returned by ``re.findall``
+
+    Returns:
+        str | dict: the type of a single link, or a dictionary of
+            ``{target: type}`` keeping the order links were found in
+    """
+    if isinstance(links, str):
+        return link_type(links)
+    return {target: link_type(target) for _, target in links}
@@ -1,4 +1,5 @@
 import logging
+from logging import critical, debug, error, getLogger, info, warning
 
 
 def setup_logging(log_level, log_file=None):
@@ -1,26 +1,37 @@
 import re
+from urllib.parse import unquote
 
-from backlinks.logging import logging
 from backlinks.io.markdown import read_markdown_doc, write_markdown_doc
-from backlinks.path.path import get_scan_relative_path
 from backlinks.lib import type_of_link
- 
+from backlinks.logging import logging
+from backlinks.markdown.scanner import fenced_blocks, scan_links
+from backlinks.markdown.snippets import SnippetBuffer
+from backlinks.markdown.templates import (
+    BacklinksTemplate,
+    backlink_entry,
+    heading_level,
+)
+from backlinks.path.path import get_scan_relative_path
 
 # Constants
 
-MARKDOWN_LINK_REGEX = r"\[([^\]]*)\]\(([^)]*\.md)\)"
+MARKDOWN_LINK_REGEX = r"\[([^\]]*)\]\(([^)#]*\.md(?:#[^)]*)?)\)"
 LINK_REGEX = r"\[([^\]]+)\]\(([^)]+)\)"
 MARKDOWN_HEADER_FINDERR = r"title:.*"
 BACKLINKS_REGEX = r"# Backlinks\n"
+HEADING_REGEX = r"^#{1,6}[ \t]+(.+?)[ \t#]*$"
+FRONT_MATTER_REGEX = r"\A---\n.*?\n---\n"
 # BACKLINKS_SECTION = r"# Backlinks\n(.*?)(?=\n# |\Z)"
 
 BACKLINKS_SECTION = BACKLINKS_REGEX + r"(.*?)(?=\n# |\Z)"
+# a heading of level or higher, where a section of that level ends
+HEADING_LEVEL_REGEX = r"\n#{{1,{level}}}[ \t]"
+DEFAULT_TEMPLATE = BacklinksTemplate()
 
 
 logging.getLogger(__name__)
 
 
-
 # ###
 # Links
 # ###
@@ -34,40 +45,180 @@ def find_backlinks_section(content, backlinks_regex_section=BACKLINKS_SECTION):
     return ""
 
 
+def find_backlinks_bounds(content, backlinks_regex=BACKLINKS_REGEX) -> tuple:
+    """(start, end) of the last backlinks section, (-1, -1) if missing
+
+    The section runs from its heading to the next heading of the same or a
+    higher level, like BACKLINKS_SECTION, so whatever the author put after
+    it is not part of it. content may be str or bytes, offsets are in the
+    same unit.
+    """
+    if isinstance(content, bytes):
+        backlinks_regex = backlinks_regex.encode("utf-8")
+    heading = None
+    for heading in re.finditer(backlinks_regex, content):
+        pass
+    if heading is None:
+        return -1, -1
+    end_regex = HEADING_LEVEL_REGEX.format(
+        level=heading_level(heading.group(0))
+    )
+    if isinstance(content, bytes):
+        end_regex = end_regex.encode("utf-8")
+    end = re.compile(end_regex).search(content, heading.end())
+    return heading.start(), len(content) if end is None else end.start()
+
+
 def split_on_backlinks_section(content, backlinks_regex=BACKLINKS_REGEX):
-    """Extract backlinks section from content"""
-    splitter = re.split(backlinks_regex, content)
-    if len(splitter) == 1:
+    """Split content into its main body and its backlinks section
+
+    The main body keeps the text after the section, see
+    find_backlinks_bounds. The section is returned without its heading.
+    """
+    start, end = find_backlinks_bounds(content, backlinks_regex)
+    if start < 0:
         logging.debug("Didn't find backlinks section")
         return [content, ""]
 
-    main_body = "".join(splitter[0:-1])
-    backlinks = splitter[-1]
+    heading_end = re.compile(backlinks_regex).match(content, start).end()
     logging.debug("Found backlinks section")
-    return [main_body, backlinks]
+    return [content[:start] + content[end:], content[heading_end:end]]
+
+
+def find_backlinks_offset(data: bytes, backlinks_regex=BACKLINKS_REGEX) -> int:
+    """Byte offset of the backlinks heading in raw content, -1 if missing"""
+    return find_backlinks_bounds(data, backlinks_regex)[0]
+
+
+def find_first_heading(content: str, heading_regex=HEADING_REGEX) -> str:
+    """Text of the first heading after the front matter, None if there is none"""
+    front_matter = re.match(FRONT_MATTER_REGEX, content, re.DOTALL)
+    start = front_matter.end() if front_matter else 0
+    heading_regex = re.compile(heading_regex, re.MULTILINE)
+    heading_match = heading_regex.search(content, start)
+    if heading_match is None or heading_match.group(0) == "# Backlinks":
+        return None
+    return heading_match.group(1)
+
+
+def slugify(heading: str) -> str:
+    """The anchor of a heading, as GitHub and most renderers make it"""
+    slug = re.sub(r"[^\w\- ]", "", heading.strip().lower())
+    return slug.replace(" ", "-")
+
+
+def heading_slugs(content: str, heading_regex=HEADING_REGEX) -> list:
+    """Anchors of every heading outside front matter and fenced code
+
+    Repeated headings get -1, -2, ... appended, like rendered markdown.
+    """
+    front_matter = re.match(FRONT_MATTER_REGEX, content, re.DOTALL)
+    start = front_matter.end() if front_matter else 0
+    blocks = fenced_blocks(content)
+    slugs = []
+    seen = {}
+    for heading_match in re.finditer(heading_regex, content, re.MULTILINE):
+        offset = heading_match.start()
+        if offset < start or any(s <= offset < e for s, e in blocks):
+            continue
+        slug = slugify(heading_match.group(1))
+        count = seen.get(slug, 0)
+        seen[slug] = count + 1
+        slugs.append(f"{slug}-{count}" if count else slug)
+    return slugs
+
+
+def has_anchor(anchors, fragment: str) -> bool:
+    """True when a link #fragment names one of anchors, see heading_slugs
+
+    The fragment is matched as written and as a heading slug, so
+    ``#Some%20Heading`` finds ``some-heading`` too.
+    """
+    fragment = unquote(fragment)
+    return fragment.lower() in anchors or slugify(fragment) in anchors
+
+
+def add_backlinks_section(
+    content: str, backlinks: dict, template: BacklinksTemplate = None
+) -> str:
+    """Replace the backlinks section of content
+
+    Args:
+        content (str): markdown content, with or without a backlinks section
+        backlinks (dict): ``{path: title}`` of the documents linking here
+        template (BacklinksTemplate, optional): how the section is written.
+            Defaults to a ``# Backlinks`` list.
+
+    Returns:
+        str: the content with a freshly rendered backlinks section, in place
+            of the old one
+    """
+    template = template or DEFAULT_TEMPLATE
+    start, end = find_backlinks_bounds(content, template.REGEX)
+    if start < 0:
+        start = end = len(content)
+    section = render_backlinks_section(backlinks, template)
+    return content[:start].rstrip("\n") + section + content[end:]
+
+
+def render_backlinks_section(
+    backlinks: dict, template: BacklinksTemplate = None
+) -> str:
+    """Render the backlinks section appended after the stripped main body"""
+    return (template or DEFAULT_TEMPLATE).render(
+        [backlink_entry(path, title) for path, title in backlinks.items()]
+    )
 
 
-def find_markdown_links(content, markdown_link_reges=MARKDOWN_LINK_REGEX):
-    """Find all markdown links in content"""
+def find_markdown_links(content, markdown_link_reges=None):
+    """Find all links to markdown files in content
+
+    The linear time scanner is used unless a regex is given.
+    """
     if content == "":
         return []
+    if markdown_link_reges is None:
+        return scan_links(content, markdown_only=True)
     return re.findall(markdown_link_reges, content)
 
 
-def find_links(content, link_regex=LINK_REGEX):
-    """Find all markdown links in content"""
+def find_links(
+    content,
+    link_regex=None,
+    markdown_only: bool = False,
+    snippets: SnippetBuffer = None,
+):
+    """Find all links in content, mapped to their type
+
+    The linear time scanner is used unless a regex is given. With snippets
+    the text around each link is captured in the same pass.
+    """
     if content == "":
         return {}
-    res = re.findall(link_regex, content)
+    if link_regex is None:
+        spans = [] if snippets is not None else None
+        res = scan_links(content, markdown_only=markdown_only, spans=spans)
+        for (_, target), (start, end) in zip(res, spans or ()):
+            snippets.add(target, content, start, end)
+    else:
+        res = re.findall(link_regex, content)
     return type_of_link(res)
 
 
-def get_links(content: str, markdown_only: bool = True) -> tuple:
+def get_links(
+    content: str,
+    markdown_only: bool = True,
+    backlinks_regex=BACKLINKS_REGEX,
+    snippets: SnippetBuffer = None,
+) -> tuple:
     """Extract markdown links from content
 
     Args:
         content (str): _description_
         markdown_only (bool, optional): _description_. Defaults to True.
+        backlinks_regex (str, optional): heading of the backlinks section
+        snippets (SnippetBuffer, optional): filled with the text around
+            each link before the backlinks section
 
     Returns:
         tuple: returns a tuple of two list,
@@ -79,21 +230,18 @@ def get_links(content: str, markdown_only: bool = True) -> tuple:
     if content == "":
         return find_links(""), find_links("")
 
-    split_md = split_on_backlinks_section(content)
-
-    if markdown_only:
-        regex_pattern = MARKDOWN_LINK_REGEX
-    else:
-        regex_pattern = LINK_REGEX
+    split_md = split_on_backlinks_section(content, backlinks_regex)
 
     if len(split_md) <= 1:
         return [], []
-    elif len(split_md) == 1:
-        return find_links(split_md[0], regex_pattern), find_links("")
+    main_links = find_links(
+        split_md[0], markdown_only=markdown_only, snippets=snippets
+    )
+    if len(split_md) == 1:
+        return main_links, find_links("")
     else:
-        return find_links(split_md[0], regex_pattern), find_links(
-            split_md[1], regex_pattern
-        )
+        return main_links, find_links(split_md[1], markdown_only=markdown_only)
+
 
 _ = """
 # ###
@@ -139,4 +287,4 @@ def get_markdown_information(
     markdown_dict[knowledge_dict["REL_PATH"]] = knowledge_dict.copy()
 
     return markdown_dict
-"""
\ No newline at end of file
+"""
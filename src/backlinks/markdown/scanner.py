@@ -0,0 +1,187 @@
+from backlinks.logging import logging
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+FENCE_CHARS = "`~"
+MIN_FENCE = 3
+
+
+# ###
+# Code regions
+# ###
+def fenced_blocks(content: str) -> list:
+    """(start, end) offsets of fenced code blocks, an unclosed fence runs to the end"""
+    blocks = []
+    fence = None
+    start = offset = 0
+    for line in content.splitlines(keepends=True):
+        stripped = line.lstrip(" ")
+        indent = len(line) - len(stripped)
+        run = len(stripped) - len(stripped.lstrip(stripped[:1]))
+        if indent < 4 and stripped[:1] in FENCE_CHARS and run >= MIN_FENCE:
+            marker = stripped[:run]
+            if fence is None:
+                # backtick fences may not have backticks in their info string
+                if marker[0] != "`" or "`" not in stripped[run:]:
+                    fence, start = marker, offset
+            elif marker[0] == fence[0] and run >= len(fence):
+                if not stripped[run:].strip():
+                    blocks.append((start, offset + len(line)))
+                    fence = None
+        offset += len(line)
+    if fence is not None:
+        blocks.append((start, len(content)))
+    return blocks
+
+
+def _code_spans(content: str, blocks: list) -> list:
+    """(start, end) offsets of inline code spans outside the fenced blocks
+
+    A backtick run opens a span closed by the next run of the same length,
+    a run without one is literal text. The next run of each length is
+    worked out in one backwards pass, so this stays linear.
+    """
+    runs = []
+    block_index = 0
+    i, n = 0, len(content)
+    while i < n:
+        if block_index < len(blocks) and i >= blocks[block_index][0]:
+            i = blocks[block_index][1]
+            block_index += 1
+            continue
+        if content[i] == "`":
+            j = i
+            while j < n and content[j] == "`":
+                j += 1
+            runs.append((i, j - i))
+            i = j
+        else:
+            i += 1
+
+    next_same = [None] * len(runs)
+    last_seen = {}
+    for k in range(len(runs) - 1, -1, -1):
+        next_same[k] = last_seen.get(runs[k][1])
+        last_seen[runs[k][1]] = k
+
+    spans = []
+    k = 0
+    while k < len(runs):
+        closing = next_same[k]
+        if closing is None:
+            k += 1
+            continue
+        start, _ = runs[k]
+        end, length = runs[closing]
+        spans.append((start, end + length))
+        k = closing + 1
+    return spans
+
+
+def code_regions(content: str) -> list:
+    """Sorted (start, end) offsets of fenced blocks and inline code spans"""
+    blocks = fenced_blocks(content)
+    return sorted(blocks + _code_spans(content, blocks))
+
+
+# ###
+# Links
+# ###
+def is_markdown_target(target: str) -> bool:
+    """True for links to a .md file, with or without a #fragment"""
+    return target.split("#", 1)[0].lower().endswith(".md")
+
+
+def _match_parens(content: str, regions: list) -> dict:
+    """Offset of the closing parenthesis of every balanced ``(`` outside code"""
+    matches = {}
+    stack = []
+    region_index = 0
+    i, n = 0, len(content)
+    while i < n:
+        if region_index < len(regions) and i >= regions[region_index][0]:
+            i = max(i, regions[region_index][1])
+            region_index += 1
+            continue
+        char = content[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "(":
+            stack.append(i)
+        elif char == ")" and stack:
+            matches[stack.pop()] = i
+        elif char == "\n" and content.startswith("\n", i + 1):
+            # link destinations do not cross a blank line
+            stack.clear()
+        i += 1
+    return matches
+
+
+def _destination(inner: str) -> str:
+    """The link target of the text between a link's parentheses"""
+    inner = inner.strip()
+    if inner.startswith("<") and ">" in inner:
+        return inner[1 : inner.index(">")]
+    # drop an optional "title"
+    return inner.split(None, 1)[0] if inner else ""
+
+
+def scan_links(
+    content: str, markdown_only: bool = False, spans: list = None
+) -> list:
+    """Finds ``[text](target)`` links in linear time
+
+    Fenced code blocks and inline code spans are skipped, targets may hold
+    balanced parentheses and the text may hold nested brackets. Unlike a
+    regex there is no backtracking, every character is looked at a fixed
+    number of times whatever the input.
+
+    Args:
+        content (str): markdown content
+        markdown_only (bool, optional): only links to ``.md`` files, a
+            ``#fragment`` is allowed. Defaults to False.
+        spans (list, optional): filled with the (start, end) offsets of each
+            link returned, from its ``[`` to its ``)``
+
+    Returns:
+        list: (text, target) tuples in document order
+    """
+    if content == "":
+        return []
+    regions = code_regions(content)
+    parens = _match_parens(content, regions)
+
+    links = []
+    brackets = []
+    region_index = 0
+    i, n = 0, len(content)
+    while i < n:
+        if region_index < len(regions) and i >= regions[region_index][0]:
+            i = max(i, regions[region_index][1])
+            region_index += 1
+            continue
+        char = content[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            brackets.append(i)
+        elif char == "]" and brackets:
+            start = brackets.pop()
+            end = parens.get(i + 1) if content.startswith("(", i + 1) else None
+            if end is not None:
+                target = _destination(content[i + 2 : end])
+                if target and (not markdown_only or is_markdown_target(target)):
+                    links.append((content[start + 1 : i], target))
+                    if spans is not None:
+                        spans.append((start, end + 1))
+                # no links inside a link
+                brackets.clear()
+                i = end
+        i += 1
+    return links
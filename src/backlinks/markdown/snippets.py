@@ -0,0 +1,124 @@
+import re
+from dataclasses import dataclass, field
+
+from backlinks.logging import logging
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+# characters looked at on either side of a link for the sentence around it
+SNIPPET_WINDOW = 80
+MAX_SNIPPET_CHARS = 200
+# characters of snippet text kept per document, later links get none
+SNIPPET_BUDGET = 4096
+ELLIPSIS = "…"
+
+SENTENCE_END_REGEX = re.compile(r"[.!?](?=\s)|\n")
+LINK_TEXT_REGEX = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+LINE_MARKER_REGEX = re.compile(r"^(?:[#>]+|[-*+]|\d+[.)])\s+")
+
+
+# ###
+# Functions
+# ###
+def snippet_bounds(
+    content: str, start: int, end: int, window: int = SNIPPET_WINDOW
+) -> tuple:
+    """(start, end, truncated left, truncated right) of the sentence around a link
+
+    The sentence ends at ``.``, ``!``, ``?`` or a line break, looking at
+    most window characters past either end of the link.
+    """
+    low = max(0, start - window)
+    high = min(len(content), end + window)
+    left = None
+    for boundary in SENTENCE_END_REGEX.finditer(content, low, start):
+        left = boundary.end()
+    right = SENTENCE_END_REGEX.search(content, end, high)
+    return (
+        low if left is None else left,
+        high if right is None else right.end(),
+        left is None and low > 0,
+        right is None and high < len(content),
+    )
+
+
+def clean_snippet(text: str) -> str:
+    """Plain text of a snippet: links become their text, whitespace one space
+
+    Links are dropped so a snippet written into a backlinks section is not
+    read back as a link.
+    """
+    text = LINK_TEXT_REGEX.sub(r"\1", text)
+    text = " ".join(text.split())
+    return LINE_MARKER_REGEX.sub("", text)
+
+
+def snippet_text(snippets: dict, key) -> str:
+    """The snippet stored for key in a ``SnippetBuffer.to_dict`` result"""
+    bounds = snippets.get("LINKS", {}).get(key) if snippets else None
+    if bounds is None:
+        return None
+    return snippets["TEXT"][bounds[0] : bounds[1]]
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class SnippetBuffer:
+    """The text around each link of one document, in one shared buffer
+
+    Snippets are appended to a single buffer and each link keeps the
+    (start, end) of its snippet in it, links sharing a sentence share the
+    offsets. Once BUDGET characters are held further links get no snippet,
+    so a document costs at most BUDGET characters whatever its size.
+
+    Args:
+        BUDGET (int): most characters of snippet text held
+        PARTS (list): the buffer, joined by ``to_dict``
+        LENGTH (int): characters in PARTS
+        LINKS (dict): link target -> [start, end] of its snippet, the first
+            occurrence of a target wins
+        SEEN (dict): snippet -> its [start, end], to store each once
+    """
+
+    BUDGET: int = SNIPPET_BUDGET
+    PARTS: list = field(default_factory=list)
+    LENGTH: int = 0
+    LINKS: dict = field(default_factory=dict)
+    SEEN: dict = field(default_factory=dict)
+
+    def add(self, target: str, content: str, start: int, end: int):
+        """Records the snippet of the link at content[start:end]"""
+        if target in self.LINKS:
+            return
+        low, high, cut_left, cut_right = snippet_bounds(content, start, end)
+        snippet = clean_snippet(content[low:high])
+        if len(snippet) > MAX_SNIPPET_CHARS:
+            snippet, cut_right = snippet[:MAX_SNIPPET_CHARS].rstrip(), True
+        if not snippet:
+            return
+        snippet = (
+            (ELLIPSIS if cut_left else "")
+            + snippet
+            + (ELLIPSIS if cut_right else "")
+        )
+        bounds = self.SEEN.get(snippet)
+        if bounds is None:
+            if self.LENGTH + len(snippet) > self.BUDGET:
+                return
+            bounds = [self.LENGTH, self.LENGTH + len(snippet)]
+            self.PARTS.append(snippet)
+            self.LENGTH += len(snippet)
+            self.SEEN[snippet] = bounds
+        self.LINKS[target] = bounds
+
+    def to_dict(self) -> dict:
+        """The buffer and the offsets of each link, json serializable"""
+        return {"TEXT": "".join(self.PARTS), "LINKS": dict(self.LINKS)}
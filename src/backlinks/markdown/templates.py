@@ -0,0 +1,210 @@
+import re
+from dataclasses import dataclass, field, fields
+from io import StringIO
+from itertools import groupby
+from json import load
+from pathlib import Path, PurePosixPath
+from string import Formatter
+
+from backlinks.logging import logging
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+CONFIG_FILE = ".backlinks.json"
+DEFAULT_HEADING = "# Backlinks"
+DEFAULT_ITEM = "- [{title}]({path})"
+DEFAULT_GROUP = "## {folder}"
+# what an entry template can use
+TEMPLATE_FIELDS = ["path", "title", "name", "folder", "date", "snippet"]
+GROUP_BY = [None, "folder"]
+SORT_BY = [None, "path", "title", "date"]
+
+_FORMATTER = Formatter()
+
+
+# ###
+# Functions
+# ###
+def compile_format(text: str, names: list = TEMPLATE_FIELDS) -> tuple:
+    """Parses a format string once into (literal, field, spec, conversion)
+
+    Raises:
+        ValueError: the template uses a field that is not in names
+    """
+    parts = tuple(_FORMATTER.parse(text))
+    unknown = [name for _, name, _, _ in parts if name and name not in names]
+    if unknown or any(name == "" for _, name, _, _ in parts):
+        raise ValueError(
+            f"Template {text!r} may only use the fields {names}, "
+            f"not {unknown or 'positional fields'}"
+        )
+    return parts
+
+
+def render_format(parts: tuple, values: dict, write):
+    """Writes a compiled format string filled with values"""
+    for literal, name, spec, conversion in parts:
+        write(literal)
+        if name is None:
+            continue
+        value = values.get(name)
+        value = "" if value is None else value
+        if conversion:
+            value = _FORMATTER.convert_field(value, conversion)
+        write(format(value, spec or ""))
+
+
+def backlink_entry(
+    path: str, title: str, date: str = None, snippet: str = None
+) -> dict:
+    """Template values of one backlink
+
+    snippet is the text around the link in the linking document.
+    """
+    rel_path = PurePosixPath(path)
+    return {
+        "path": path,
+        "title": title,
+        "name": rel_path.stem,
+        "folder": str(rel_path.parent),
+        "date": date,
+        "snippet": snippet,
+    }
+
+
+def heading_level(line) -> int:
+    """Level of a markdown heading line, 1 for a line that is not a heading"""
+    hashes = b"#" if isinstance(line, bytes) else "#"
+    return len(line) - len(line.lstrip(hashes)) or 1
+
+
+def heading_regex(heading: str = DEFAULT_HEADING) -> str:
+    """Regex finding the heading line of a backlinks section
+
+    A section still under DEFAULT_HEADING is found as well, so a vault
+    moving to another heading has its old sections replaced, not kept as
+    part of the body.
+    """
+    if heading == DEFAULT_HEADING:
+        return re.escape(heading) + r"\n"
+    return f"(?:{re.escape(heading)}|{re.escape(DEFAULT_HEADING)})\n"
+
+
+def load_template(scan_path) -> "BacklinksTemplate":
+    """The template configured for a vault, the default one without a config
+
+    The config is CONFIG_FILE at the root of the vault, a json object of
+    BacklinksTemplate fields, e.g. ``{"GROUP_BY": "folder"}``.
+    """
+    config_path = Path(scan_path) / CONFIG_FILE
+    if not config_path.exists():
+        return BacklinksTemplate()
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = load(f)
+    known = {f.name for f in fields(BacklinksTemplate) if f.init}
+    unknown = set(config) - known
+    if unknown:
+        raise ValueError(f"Unknown settings {sorted(unknown)} in {config_path}")
+    logging.debug(f"Loaded backlinks template from {config_path}")
+    return BacklinksTemplate(**config)
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class BacklinksTemplate:
+    """How the backlinks sections of a vault are written
+
+    The format strings are compiled once, rendering a section then only
+    fills them in, writing into one buffer.
+
+    Args:
+        HEADING (str): heading line of the section, also how it is found
+        ITEM (str): format string of one entry, with any of TEMPLATE_FIELDS
+        GROUP (str): format string of the line above each group
+        GROUP_BY (str): None, or "folder" to group entries by folder
+        SORT_BY (str): None keeps the planned order, else "path", "title" or
+            "date". Entries without a date go last.
+        REVERSE (bool): sort descending, newest first for "date"
+    """
+
+    HEADING: str = DEFAULT_HEADING
+    ITEM: str = DEFAULT_ITEM
+    GROUP: str = DEFAULT_GROUP
+    GROUP_BY: str = None
+    SORT_BY: str = None
+    REVERSE: bool = False
+    ITEM_PARTS: tuple = field(init=False, repr=False)
+    GROUP_PARTS: tuple = field(init=False, repr=False)
+
+    def __post_init__(self):
+        if self.GROUP_BY not in GROUP_BY:
+            raise ValueError(f"GROUP_BY must be one of {GROUP_BY}")
+        if self.SORT_BY not in SORT_BY:
+            raise ValueError(f"SORT_BY must be one of {SORT_BY}")
+        if "\n" in self.HEADING.strip("\n"):
+            raise ValueError("HEADING must be a single line")
+        self.HEADING = self.HEADING.strip("\n")
+        # a heading as high as the section's own would end the section
+        group_level = len(self.GROUP) - len(self.GROUP.lstrip("#"))
+        if 0 < group_level <= heading_level(self.HEADING) and self.GROUP_BY:
+            raise ValueError("GROUP must be a heading below HEADING")
+        self.ITEM_PARTS = compile_format(self.ITEM)
+        self.GROUP_PARTS = compile_format(self.GROUP)
+
+    @property
+    def REGEX(self) -> str:
+        return heading_regex(self.HEADING)
+
+    def _ordered(self, entries: list) -> list:
+        if self.SORT_BY is not None:
+            key = self.SORT_BY
+            dated = [e for e in entries if e[key] is not None]
+            undated = [e for e in entries if e[key] is None]
+            dated.sort(key=lambda e: e[key].casefold(), reverse=self.REVERSE)
+            entries = dated + undated
+        if self.GROUP_BY is not None:
+            # a stable sort keeps the order above inside each group
+            entries = sorted(entries, key=lambda e: e[self.GROUP_BY])
+        return entries
+
+    def render(self, entries: list) -> str:
+        """The backlinks section for entries, as appended after the main body
+
+        Args:
+            entries (list): values of each backlink, see backlink_entry
+
+        Returns:
+            str: the section, or a lone newline when there are no entries
+        """
+        if not entries:
+            return "\n"
+        buffer = StringIO()
+        write = buffer.write
+        write(f"\n\n{self.HEADING}\n\n")
+        if self.GROUP_BY is None:
+            groups = [(None, self._ordered(entries))]
+        else:
+            groups = groupby(
+                self._ordered(entries), key=lambda e: e[self.GROUP_BY]
+            )
+        for group_index, (_, group) in enumerate(groups):
+            group = list(group)
+            if group_index:
+                write("\n\n")
+            if self.GROUP_BY is not None:
+                render_format(self.GROUP_PARTS, group[0], write)
+                write("\n\n")
+            for item_index, entry in enumerate(group):
+                if item_index:
+                    write("\n")
+                render_format(self.ITEM_PARTS, entry, write)
+        write("\n")
+        return buffer.getvalue()
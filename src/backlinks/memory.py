@@ -0,0 +1,166 @@
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+
+from backlinks.logging import logging
+from backlinks.progress import format_amount
+
+try:
+    import resource
+except ImportError:  # not on windows
+    resource = None
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+MEMORY_TOP = 10
+# frames kept per allocation, one is enough to group by line
+TRACE_FRAMES = 1
+IGNORED_FILES = {tracemalloc.__file__, __file__}
+
+
+# ###
+# Functions
+# ###
+def peak_rss() -> int:
+    """Peak resident set size of the process in bytes, None when unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def deep_sizeof(obj) -> int:
+    """Bytes held by obj and everything it refers to, each object once
+
+    Follows containers and the attributes of plain objects and dataclasses,
+    classes and modules are not followed.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, type):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        if hasattr(item, "__dict__") and not callable(item):
+            stack.append(vars(item))
+    return total
+
+
+def _bytes(amount: int) -> str:
+    return "?" if amount is None else format_amount(amount, "bytes")
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class MemoryTracker:
+    """Memory use of each stage of a run, from tracemalloc snapshots
+
+    ``mark`` ends a stage: it takes a snapshot, and records the memory
+    traced now, the peak traced during the stage, the peak RSS of the
+    process so far and the lines that allocated the most since the last
+    mark. Structures handed to ``watch`` are measured once the run is done,
+    to tell which of them holds the memory.
+
+    Tracing slows allocation heavy code down several times over, and each
+    mark walks every live allocation. It is for finding out where memory
+    goes, not for every run.
+
+    Args:
+        TOP (int): allocating lines reported per stage
+        STAGES (list): (name, current, peak, peak RSS, top lines) per stage,
+            top lines being (file:line, bytes allocated, blocks)
+        WATCHED (dict): name -> structure measured by ``report``
+    """
+
+    TOP: int = MEMORY_TOP
+    STAGES: list = field(default_factory=list)
+    WATCHED: dict = field(default_factory=dict)
+    SNAPSHOT: object = field(default=None, repr=False)
+
+    def start(self):
+        """Starts tracing, allocations before it are not seen"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        self.SNAPSHOT = tracemalloc.take_snapshot()
+        return self
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def mark(self, name: str):
+        """Ends the stage name, recording its memory use"""
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        top = []
+        for diff in snapshot.compare_to(self.SNAPSHOT, "lineno"):
+            frame = diff.traceback[0]
+            # the snapshots themselves are not what is being measured
+            if diff.size_diff <= 0 or frame.filename in IGNORED_FILES:
+                continue
+            top.append(
+                (
+                    f"{frame.filename}:{frame.lineno}",
+                    diff.size_diff,
+                    diff.count_diff,
+                )
+            )
+            if len(top) == self.TOP:
+                break
+        self.STAGES.append((name, current, peak, peak_rss(), top))
+        self.SNAPSHOT = snapshot
+        tracemalloc.reset_peak()
+        logging.debug(
+            f"Memory after {name}: {_bytes(current)} traced, "
+            f"{_bytes(peak)} peak"
+        )
+
+    def watch(self, name: str, structure):
+        """Has report measure structure, under name"""
+        self.WATCHED[name] = structure
+
+    def peak(self) -> int:
+        """The highest traced memory of any stage"""
+        return max((peak for _, _, peak, _, _ in self.STAGES), default=0)
+
+    def report(self) -> str:
+        """Memory of each stage and of each watched structure, as text"""
+        lines = [f"{'stage':<12} {'traced':>10} {'peak':>10} {'peak RSS':>10}"]
+        lines += [
+            f"{name:<12} {_bytes(current):>10} {_bytes(peak):>10} "
+            f"{_bytes(rss):>10}"
+            for name, current, peak, rss, _ in self.STAGES
+        ]
+        for name, _, _, _, top in self.STAGES:
+            if not top:
+                continue
+            lines += ["", f"Top allocations in {name}"]
+            lines += [
+                f"{_bytes(size):>10} {count:8d} blocks  {where}"
+                for where, size, count in top
+            ]
+        if self.WATCHED:
+            lines += ["", "Structures"]
+            lines += [
+                f"{_bytes(deep_sizeof(structure)):>10}  {name}"
+                for name, structure in self.WATCHED.items()
+            ]
+        return "\n".join(lines)
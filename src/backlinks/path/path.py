@@ -1,6 +1,7 @@
-from logging import logging
 from pathlib import Path
 
+from backlinks.logging import logging
+
 logging.getLogger(__name__)
 
 
@@ -18,22 +19,54 @@ def get_hierarchy_level(file_path, scan_path):
         return -1  # Outside scan path
 
 
+def scan_roots(scan_path) -> list:
+    """The roots of a scan, scan_path being a single root or a list of them"""
+    if isinstance(scan_path, (list, tuple)):
+        return [Path(root) for root in scan_path]
+    return [Path(scan_path)]
+
+
+def find_root(file_path, scan_path):
+    """The root holding file_path, the deepest one if roots nest, else None"""
+    file_path = Path(file_path)
+    roots = [
+        root
+        for root in scan_roots(scan_path)
+        if root == file_path or root in file_path.parents
+    ]
+    return max(roots, key=lambda root: len(root.parts), default=None)
+
+
+def find_root_by_name(name: str, scan_path):
+    """The root whose folder name is name, ignoring case, else None"""
+    for root in scan_roots(scan_path):
+        if root.name.upper() == name.upper():
+            return root
+    return None
+
+
 def get_scan_relative_path(file_path, scan_path):
-    """Convert absolute path to scan-relative path"""
-    try:
-        logging.debug(
-            f"Converting {file_path} to relative path from {scan_path}"
-        )
-        rel_path = Path(file_path).relative_to(scan_path)
-        return str(Path("/") / scan_path.name / rel_path)
-    except ValueError:
+    """Convert absolute path to scan-relative path
+
+    With several roots the path is relative to the root holding it, each
+    root's name being its namespace.
+    """
+    logging.debug(f"Converting {file_path} to relative path from {scan_path}")
+    root = find_root(file_path, scan_path)
+    if root is None:
         return str(file_path)  # Return absolute if outside scan path
+    rel_path = Path(file_path).relative_to(root)
+    return str(Path("/") / root.name / rel_path)
 
 
 def get_scan_absolute_path(file_path, scan_path):
     """Convert scan-relative path to absolute path"""
     logging.debug(f"Converting {file_path} to absolute path from {scan_path}")
     str_file_path = str(file_path)
+    namespace = str_file_path.lstrip("/").split("/", 1)[0]
+    scan_path = (
+        find_root_by_name(namespace, scan_path) or scan_roots(scan_path)[0]
+    )
     offset = 0
     if str_file_path.startswith("/"):
         offset = 1
@@ -45,9 +78,74 @@ def get_scan_absolute_path(file_path, scan_path):
     return abs_path
 
 
-def generate_file_list(scan_path):
-    """Generates a list of markdown files to run through"""
+def _git_paths(scan_path, *args) -> list:
+    # imported here, most runs never call git and subprocess is slow to load
+    import subprocess
+
+    result = subprocess.run(
+        ["git", "-C", str(scan_path), *args, "-z", "--", "*.md"],
+        capture_output=True,
+        check=True,
+    )
+    return [p for p in result.stdout.decode("utf-8").split("\0") if p]
+
+
+def git_file_list(scan_path) -> dict:
+    """Markdown files under scan_path and their git blob hashes
+
+    Everything comes from the git index in a few bulk reads instead of a
+    directory walk. A blob hash is the hash of the file content (see
+    ``content_hash``), so it can key the parse cache without reading the
+    file. Files changed in the work tree or untracked map to None. This
+    assumes git stores the files as they are on disk, without eol
+    conversion or clean filters.
+
+    Returns:
+        dict: absolute path -> blob hash or None, None when scan_path is not
+            in a git work tree
+    """
+    from subprocess import CalledProcessError
+
     scan_path = Path(scan_path).resolve()
+    try:
+        staged = _git_paths(scan_path, "ls-files", "--stage")
+        modified = _git_paths(scan_path, "diff", "--name-only", "--relative")
+        deleted = _git_paths(scan_path, "ls-files", "--deleted")
+        untracked = _git_paths(
+            scan_path, "ls-files", "--others", "--exclude-standard"
+        )
+    except (OSError, CalledProcessError) as e:
+        logging.warning(f"Not listing {scan_path} from git: {e}")
+        return None
+
+    files = {}
+    for line in staged:
+        # <mode> <blob> <stage>\t<path>
+        info, rel_path = line.split("\t", 1)
+        files[scan_path / rel_path] = info.split()[1]
+    for rel_path in modified + untracked:
+        files[scan_path / rel_path] = None
+    for rel_path in deleted:
+        files.pop(scan_path / rel_path, None)
+    logging.debug(
+        f"Found {len(files)} markdown files in git, "
+        f"{len(modified) + len(untracked)} changed or untracked"
+    )
+    return files
+
+
+def generate_file_list(scan_path, use_git: bool = False):
+    """Generates a list of markdown files to run through
+
+    With use_git the list comes from the git index, see git_file_list,
+    falling back to a directory walk outside a git work tree.
+    """
+    scan_path = Path(scan_path).resolve()
+    if use_git:
+        files = git_file_list(scan_path)
+        if files is not None:
+            logging.info(f"Found {len(files)} markdown files in git")
+            return list(files)
     logging.info(f"Scanning documents in {scan_path}")
     md_links = list(scan_path.rglob("*.md"))
     logging.info(f"Found {len(md_links)} markdown files")
@@ -79,3 +177,31 @@ def relative_to_abs_path(file_path, scan_path):
         file_path = str_file_path[offset + len(scan_path.name) :].lstrip("/")
     abs_path = (Path(scan_path) / Path(file_path)).resolve()
     return abs_path
+
+
+def resolve_link_path(link, source_path, scan_path):
+    """Resolve a link found in source_path to an absolute path
+
+    Args:
+        link (str): the link target as written in the document
+        source_path (Path): absolute path of the document holding the link
+        scan_path (Path): root of the scan, or a list of roots. Links of
+            the form /<root name>/... go to the root of that name.
+
+    Returns:
+        Path: absolute path of the link target, with any #fragment dropped
+    """
+    target = str(link).split("#", 1)[0]
+    if not target:
+        return Path(source_path)
+    if target.startswith("/"):
+        target_parts = Path(target).parts[1:]
+        root = (
+            find_root_by_name(target_parts[0], scan_path)
+            if target_parts
+            else None
+        )
+        if root is not None:
+            return (root / Path(*target_parts[1:])).resolve()
+        return Path(target)
+    return (Path(source_path).parent / target).resolve()
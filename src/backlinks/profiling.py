@@ -0,0 +1,100 @@
+import sys
+from dataclasses import dataclass, field
+from heapq import nlargest
+from operator import itemgetter
+
+from backlinks.logging import logging
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+PROFILE_TOP = 10
+STATS_FILE = "backlinks.pstats"
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class ParseProfile:
+    """Parse time, size and link count of every file loaded in a run
+
+    Args:
+        FILES (list): (rel_path, seconds, size, links) of each file
+    """
+
+    FILES: list = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.FILES)
+
+    def record(self, rel_path: str, seconds: float, size: int, links: int):
+        self.FILES.append((rel_path, seconds, size, links))
+
+    def slowest(self, n: int = PROFILE_TOP) -> list:
+        return nlargest(n, self.FILES, key=itemgetter(1))
+
+    def most_links(self, n: int = PROFILE_TOP) -> list:
+        return nlargest(n, self.FILES, key=itemgetter(3))
+
+    def report(self, n: int = PROFILE_TOP) -> str:
+        """The n slowest files and the n files with the most links, as text"""
+        total = sum(seconds for _, seconds, _, _ in self.FILES)
+        lines = [f"Parsed {len(self)} files in {total * 1000:.1f} ms"]
+        for heading, rows in (
+            (f"{n} slowest files", self.slowest(n)),
+            (f"{n} files with the most links", self.most_links(n)),
+        ):
+            lines += [
+                "",
+                heading,
+                f"{'ms':>10} {'bytes':>10} {'links':>7}  path",
+            ]
+            lines += [
+                f"{seconds * 1000:10.2f} {size:10d} {links:7d}  {rel_path}"
+                for rel_path, seconds, size, links in rows
+            ]
+        return "\n".join(lines)
+
+
+# ###
+# Functions
+# ###
+def profile_call(
+    func,
+    *args,
+    stats_path=STATS_FILE,
+    top: int = PROFILE_TOP,
+    stream=sys.stderr,
+    **kwargs,
+):
+    """Runs func under cProfile, dumping pstats and printing the top entries
+
+    Args:
+        func (callable): what to profile
+        stats_path (Path, optional): pstats file, for snakeviz, gprof2dot or
+            ``python -m pstats``. Not written when None.
+        top (int, optional): functions printed, by cumulative time
+        stream (file, optional): where the summary goes. Defaults to stderr.
+
+    Returns:
+        Any: whatever func returns
+    """
+    # imported here, they cost more than the rest of a small run
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        if stats_path:
+            profiler.dump_stats(stats_path)
+            logging.info(f"Saved profile to {stats_path}")
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
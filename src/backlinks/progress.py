@@ -0,0 +1,206 @@
+import sys
+from dataclasses import dataclass, field
+from time import monotonic
+
+from backlinks.logging import logging
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+PROGRESS_MODES = ["auto", "bar", "log", "off"]
+# least seconds between two reports, a bar redraws often, logs rarely
+BAR_INTERVAL = 0.2
+LOG_INTERVAL = 10.0
+BAR_WIDTH = 24
+# looks at the clock per report interval, the items in between only count
+CHECKS_PER_INTERVAL = 10
+
+
+# ###
+# Functions
+# ###
+def format_amount(amount: int, unit: str) -> str:
+    """``1.2 MB`` for bytes, ``340 links`` for anything else"""
+    if unit != "bytes":
+        return f"{amount} {unit}"
+    for prefix in ("", "k", "M", "G"):
+        if amount < 1000 or prefix == "G":
+            break
+        amount /= 1000
+    return f"{amount:.1f} {prefix}B" if prefix else f"{amount} B"
+
+
+def format_seconds(seconds: float) -> str:
+    """``1:02:03`` or ``2:03``"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class Progress:
+    """Counts the work of one stage of a run and reports it now and then
+
+    ``advance`` only adds to counters, the clock is looked at every STRIDE
+    items, a stride worked out from the rate so far to give about
+    CHECKS_PER_INTERVAL looks per INTERVAL. Reports cost one line of
+    output per INTERVAL whatever the number of items.
+
+    Args:
+        NAME (str): the stage, e.g. "read"
+        TOTAL (int): units expected, 0 when unknown and there is no ETA
+        UNIT (str): what a unit is, e.g. "files"
+        MODE (str): "bar" redraws a line on STREAM, "log" writes log lines,
+            "off" only counts
+        INTERVAL (float): least seconds between two reports
+        STREAM (file): where the bar goes
+        DONE (int): units done
+        COUNTS (dict): other amounts, e.g. bytes or links, by unit
+        MEMORY (MemoryTracker): marked when the stage closes, None to skip
+    """
+
+    NAME: str
+    TOTAL: int = 0
+    UNIT: str = "files"
+    MODE: str = "off"
+    INTERVAL: float = LOG_INTERVAL
+    STREAM: object = field(default=None, repr=False)
+    DONE: int = 0
+    COUNTS: dict = field(default_factory=dict)
+    START: float = field(default_factory=monotonic)
+    NEXT_REPORT: float = 0.0
+    STRIDE: int = 1
+    COUNTDOWN: int = 1
+    MEMORY: object = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.NEXT_REPORT = self.START + self.INTERVAL
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def advance(self, n: int = 1, **amounts):
+        """Adds n units done, and amounts of any other unit"""
+        self.DONE += n
+        for unit, amount in amounts.items():
+            self.COUNTS[unit] = self.COUNTS.get(unit, 0) + amount
+        self.COUNTDOWN -= n
+        if self.COUNTDOWN > 0:
+            return
+        now = monotonic()
+        if now >= self.NEXT_REPORT:
+            self.report(now)
+            self.NEXT_REPORT = now + self.INTERVAL
+        rate = self.DONE / max(now - self.START, 1e-9)
+        self.STRIDE = max(1, int(rate * self.INTERVAL / CHECKS_PER_INTERVAL))
+        self.COUNTDOWN = self.STRIDE
+
+    def rate(self, now: float = None) -> float:
+        """Units per second so far"""
+        return self.DONE / max((now or monotonic()) - self.START, 1e-9)
+
+    def eta(self, now: float = None) -> float:
+        """Seconds left at the rate so far, None without a TOTAL or a rate"""
+        rate = self.rate(now)
+        if not self.TOTAL or not rate:
+            return None
+        return max(self.TOTAL - self.DONE, 0) / rate
+
+    def report(self, now: float = None, final: bool = False):
+        """Writes the bar or a log line, as set by MODE"""
+        if self.MODE == "off":
+            return
+        now = now or monotonic()
+        rate, eta = self.rate(now), self.eta(now)
+        if self.MODE == "log":
+            fields = [
+                f"stage={self.NAME}",
+                f"done={self.DONE}",
+                f"total={self.TOTAL or '?'}",
+                f"unit={self.UNIT}",
+                *(f"{unit}={amount}" for unit, amount in self.COUNTS.items()),
+                f"rate={rate:.1f}/s",
+                f"elapsed={now - self.START:.1f}s",
+            ]
+            if eta is not None and not final:
+                fields.append(f"eta={eta:.1f}s")
+            logging.info("progress " + " ".join(fields))
+            return
+
+        if self.TOTAL:
+            filled = int(BAR_WIDTH * min(self.DONE / self.TOTAL, 1.0))
+            bar = f"[{'#' * filled}{'-' * (BAR_WIDTH - filled)}] "
+            done = f"{self.DONE}/{self.TOTAL}"
+        else:
+            bar, done = "", str(self.DONE)
+        line = f"{self.NAME:<8}{bar}{done} {self.UNIT}"
+        for unit, amount in self.COUNTS.items():
+            line += f", {format_amount(amount, unit)}"
+        line += f", {rate:.0f} {self.UNIT}/s"
+        if final:
+            line += f" in {format_seconds(now - self.START)}"
+        elif eta is not None:
+            line += f", ETA {format_seconds(eta)}"
+        # carriage return and erase to the end of the line redraw in place
+        self.STREAM.write(f"\r{line}\x1b[K" + ("\n" if final else ""))
+        self.STREAM.flush()
+
+    def close(self):
+        """Writes the final report of the stage"""
+        self.report(final=True)
+        if self.MEMORY is not None:
+            self.MEMORY.mark(self.NAME)
+
+
+@dataclass
+class ProgressReporter:
+    """Makes the Progress of each stage of a run
+
+    Args:
+        MODE (str): one of PROGRESS_MODES. "auto" is a bar when STREAM is a
+            terminal and log lines otherwise.
+        STREAM (file): where bars go. Defaults to stderr.
+        MEMORY (MemoryTracker): marked as each stage closes, see
+            backlinks.memory
+    """
+
+    MODE: str = "auto"
+    STREAM: object = field(default=None, repr=False)
+    MEMORY: object = None
+
+    def __post_init__(self):
+        if self.MODE not in PROGRESS_MODES:
+            raise ValueError(f"Progress mode must be one of {PROGRESS_MODES}")
+        self.STREAM = self.STREAM or sys.stderr
+        if self.MODE == "auto":
+            isatty = getattr(self.STREAM, "isatty", None)
+            self.MODE = "bar" if isatty and isatty() else "log"
+
+    def stage(self, name: str, total: int = 0, unit: str = "files"):
+        """A Progress for one stage, use it as a context manager"""
+        return Progress(
+            name,
+            total,
+            unit,
+            MODE=self.MODE,
+            INTERVAL=BAR_INTERVAL if self.MODE == "bar" else LOG_INTERVAL,
+            STREAM=self.STREAM,
+            MEMORY=self.MEMORY,
+        )
+
+
+# counts without reporting, for callers given no reporter
+QUIET = ProgressReporter("off")
@@ -0,0 +1,370 @@
+import socketserver
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+from backlinks.collector.book import BookDictionary
+from backlinks.collector.cache import ParseCache
+from backlinks.collector.document import FileDictionary
+from backlinks.core.index import LinkIndex
+from backlinks.logging import logging
+from backlinks.path.path import (
+    find_root,
+    get_scan_relative_path,
+    git_file_list,
+)
+
+# ###
+# Variables
+# ###
+
+logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+REFRESH_SECONDS = 2.0
+MAX_RESULTS = 100
+QUERIES = ["links", "backlinks", "titles", "broken"]
+
+
+###
+# Class
+# ###
+
+
+@dataclass
+class LinkService:
+    """Holds a vault's link index in memory and answers queries against it
+
+    Every query is a dictionary or set lookup on the index, the vault is only
+    touched by ``refresh``, which re-parses the files whose mtime or size moved.
+    The index is the one the update subcommand builds for the same roots and
+    file listing.
+
+    Args:
+        PATH (Path): root of the scan
+        ROOTS (list): other vaults indexed with PATH, links between them
+            resolve
+        GIT (bool): list files from the git index of each root
+        PARSE_CACHE (ParseCache): parse cache shared with the cli (optional)
+        BOOKS (list): the loaded BookDictionary of PATH and of each root
+        INDEX (LinkIndex): the link index of BOOKS
+        STATS (dict): (mtime, size) of each file when it was last parsed
+    """
+
+    PATH: Path
+    ROOTS: list = field(default_factory=list)
+    GIT: bool = False
+    PARSE_CACHE: ParseCache = None
+    BOOKS: list = field(default_factory=list)
+    INDEX: LinkIndex = None
+    STATS: dict = field(default_factory=dict)
+    LOCK: threading.RLock = field(default_factory=threading.RLock)
+
+    def __post_init__(self):
+        self.PATH = Path(self.PATH).resolve()
+        self.ROOTS = [self.PATH] + [Path(r).resolve() for r in self.ROOTS]
+
+    def load(self):
+        """Loads every root and builds the index over them"""
+        books = []
+        for root in self.ROOTS:
+            book = BookDictionary(
+                root,
+                root.parent,
+                JSON_PATH=root / "crosswalk.json",
+                PARSE_CACHE=self.PARSE_CACHE,
+                GIT=self.GIT,
+            )
+            book.load(store_content=False)
+            books.append(book)
+        index = LinkIndex.from_books(books)
+        with self.LOCK:
+            self.BOOKS, self.INDEX = books, index
+            self.STATS = {
+                md_file: (doc["MTIME"], doc["SIZE"])
+                for book in books
+                for md_file, doc in book.PAGES.items()
+                if doc is not None
+            }
+
+    def _files(self) -> list:
+        files = []
+        for root in self.ROOTS:
+            # not generate_file_list, which logs every call
+            listed = git_file_list(root) if self.GIT else None
+            files += root.rglob("*.md") if listed is None else listed
+        return files
+
+    def refresh(self) -> int:
+        """Re-indexes files created, edited or deleted since the last refresh
+
+        Returns:
+            int: the number of files re-indexed or removed
+        """
+        stats = {}
+        for md_file in self._files():
+            try:
+                st = md_file.stat()
+            except FileNotFoundError:
+                continue
+            stats[md_file] = (st.st_mtime, st.st_size)
+
+        changed = [f for f, st in stats.items() if self.STATS.get(f) != st]
+        deleted = [f for f in self.STATS if f not in stats]
+        if not changed and not deleted:
+            return 0
+
+        # parse outside the lock, queries keep running meanwhile
+        books = {book.PATH: book for book in self.BOOKS}
+        documents = {}
+        for md_file in changed:
+            book = books[find_root(md_file, self.ROOTS)]
+            try:
+                documents[md_file] = FileDictionary().load_document(
+                    md_file,
+                    book.PATH,
+                    store_content=False,
+                    parse_cache=self.PARSE_CACHE,
+                    template=book.TEMPLATE,
+                )
+            except Exception as e:
+                logging.error(f"Could not refresh {md_file}: {e}")
+
+        with self.LOCK:
+            for md_file in deleted:
+                rel_path = get_scan_relative_path(md_file, self.ROOTS)
+                if rel_path in self.INDEX.IDS:
+                    self.INDEX.remove(rel_path)
+                books[find_root(md_file, self.ROOTS)].PAGES.pop(md_file, None)
+            new_files = False
+            for md_file, doc in documents.items():
+                new_files |= doc["REL_PATH"] not in self.INDEX.IDS
+                self.INDEX.index_document(doc, self.ROOTS)
+                books[find_root(md_file, self.ROOTS)].PAGES[md_file] = doc
+            if new_files:
+                self.INDEX.resolve_broken(self.ROOTS)
+            self.STATS = stats
+
+        logging.info(
+            f"Refreshed {len(documents)} changed and {len(deleted)} deleted files"
+        )
+        return len(documents) + len(deleted)
+
+    def watch(self, interval: float = REFRESH_SECONDS) -> threading.Event:
+        """Refreshes in a background thread until the returned event is set"""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logging.error(f"Refresh failed: {e}")
+
+        threading.Thread(
+            target=run, name="backlinks-refresh", daemon=True
+        ).start()
+        return stop
+
+    # ###
+    # Queries
+    # ###
+    def _node(self, rel_path: str) -> int:
+        node_id = self.INDEX.IDS.get(rel_path)
+        if node_id is None:
+            raise KeyError(f"Unknown document {rel_path}")
+        return node_id
+
+    def _entries(self, node_ids) -> list:
+        return [
+            {"PATH": self.INDEX.PATHS[i], "TITLE": self.INDEX.TITLES[i]}
+            for i in sorted(node_ids, key=self.INDEX.PATHS.__getitem__)
+        ]
+
+    def links(self, path: str) -> dict:
+        """Documents, broken links and URLs a document links to"""
+        node_id = self._node(path)
+        return {
+            "LINKS": self._entries(self.INDEX.LINKS[node_id]),
+            "BROKEN": self.INDEX.BROKEN.get(node_id, []),
+            "EXTERNAL": self.INDEX.EXTERNAL.get(node_id, []),
+        }
+
+    def backlinks(self, path: str) -> dict:
+        """Documents linking to a document, with the text around each link"""
+        node_id = self._node(path)
+        entries = self._entries(self.INDEX.BACKLINKS[node_id])
+        for entry in entries:
+            entry["SNIPPET"] = self.INDEX.snippet(
+                self.INDEX.IDS[entry["PATH"]], node_id
+            )
+        return {"BACKLINKS": entries}
+
+    def titles(
+        self, q: str, match: str = "prefix", limit: int = MAX_RESULTS
+    ) -> dict:
+        """Documents by title or alias
+
+        Args:
+            q (str): the name to look for
+            match (str, optional): "exact", "casefold", "prefix" or
+                "contains". All but "contains" are index lookups, "contains"
+                scans every title. Defaults to "prefix".
+            limit (int, optional): most documents returned
+        """
+        limit = int(limit)
+        if match == "prefix":
+            found = self.INDEX.TITLE_INDEX.prefix(q, limit)
+        elif match in ("exact", "casefold"):
+            found = getattr(self.INDEX.TITLE_INDEX, match)(q)
+        elif match == "contains":
+            needle = q.casefold()
+            found = [
+                i
+                for i, title in enumerate(self.INDEX.TITLES)
+                if self.INDEX.PATHS[i] and needle in title.casefold()
+            ]
+        else:
+            raise ValueError(f"Unknown title match {match}")
+        return {
+            "TITLES": [
+                {"PATH": self.INDEX.PATHS[i], "TITLE": self.INDEX.TITLES[i]}
+                for i in found[:limit]
+            ]
+        }
+
+    def broken(self, folder: str = "/") -> dict:
+        """Broken links and anchors of documents under a scan-relative folder"""
+        prefix = folder.rstrip("/") + "/"
+        return {
+            name: {
+                self.INDEX.PATHS[i]: links
+                for i, links in sorted(table.items())
+                if self.INDEX.PATHS[i].startswith(prefix)
+            }
+            for name, table in (
+                ("BROKEN", self.INDEX.BROKEN),
+                ("BROKEN_ANCHORS", self.INDEX.broken_anchors()),
+            )
+        }
+
+    def query(self, request: dict) -> dict:
+        """Answers one request, ``{"QUERY": name, **arguments}``
+
+        Returns:
+            dict: ``{"RESULT": ...}``, or ``{"ERROR": message}`` on a bad request
+        """
+        arguments = {k.lower(): v for k, v in request.items()}
+        name = arguments.pop("query", None)
+        if name not in QUERIES:
+            return {"ERROR": f"Unknown query {name}, expected one of {QUERIES}"}
+        try:
+            with self.LOCK:
+                return {"RESULT": getattr(self, name)(**arguments)}
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ERROR": str(e)}
+
+
+class _SocketHandler(socketserver.StreamRequestHandler):
+    """One json request per line, one json response per line"""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.service.query(loads(line))
+            except ValueError as e:
+                response = {"ERROR": f"Invalid json: {e}"}
+            self.wfile.write(dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    """``GET /<query>?argument=value``"""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        request = dict(parse_qsl(url.query))
+        request["QUERY"] = url.path.strip("/")
+        response = self.server.service.query(request)
+        body = dumps(response).encode("utf-8")
+        self.send_response(400 if "ERROR" in response else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+# ###
+# Functions
+# ###
+def make_socket_server(service: LinkService, socket_path):
+    """A threaded unix socket server for service, replacing a stale socket file"""
+    socket_path = Path(socket_path)
+    if socket_path.exists():
+        socket_path.unlink()
+    server = socketserver.ThreadingUnixStreamServer(
+        str(socket_path), _SocketHandler
+    )
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def make_http_server(
+    service: LinkService, host=DEFAULT_HOST, port=DEFAULT_PORT
+):
+    """A threaded HTTP server for service"""
+    server = ThreadingHTTPServer((host, port), _HTTPHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def serve(
+    service: LinkService,
+    socket_path=None,
+    host=DEFAULT_HOST,
+    port=None,
+    interval: float = REFRESH_SECONDS,
+):
+    """Serves service until interrupted
+
+    Args:
+        service (LinkService): a loaded service
+        socket_path (Path, optional): unix socket to listen on
+        host (str, optional): HTTP address. Defaults to localhost only.
+        port (int, optional): HTTP port, no HTTP server when None
+        interval (float, optional): seconds between refreshes, 0 disables them
+    """
+    servers = []
+    if socket_path:
+        servers.append(make_socket_server(service, socket_path))
+        logging.info(f"Listening on unix socket {socket_path}")
+    if port is not None:
+        servers.append(make_http_server(service, host, port))
+        logging.info(f"Listening on http://{host}:{servers[-1].server_port}")
+    if not servers:
+        raise ValueError("Nothing to serve on, give a socket path or a port")
+
+    stop = service.watch(interval) if interval > 0 else threading.Event()
+    for server in servers[1:]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        servers[0].serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Shutting down")
+    finally:
+        stop.set()
+        for server in servers:
+            server.server_close()
+        if socket_path:
+            Path(socket_path).unlink(missing_ok=True)
@@ -1,3 +1,4 @@
+from datetime import date
 from re import DOTALL, search
 
 from backlinks.logging import logging
@@ -20,7 +21,9 @@ META_FIELDS = [
     "EDITOR",
     "DATECREATED",
     "BACKLINK",
+    "ALIASES",
 ]
+DATE_FIELDS = ["PUBLISHED", "DATE", "DATECREATED"]
 
 
 # ###
@@ -40,15 +43,50 @@ def load_meta_to_dict(meta_content, capitalize_keys: bool = False) -> dict:
     """Convert meta content to dictionary"""
     logging.debug("Converting Yaml Headers to a dictionary")
     meta_dict = {}
+    key = None
     for line in meta_content.splitlines():
-        if ":" in line:
+        item = line.strip()
+        if item.startswith("- ") and key is not None:
+            # block list under a key with no inline value
+            if not isinstance(meta_dict[key], list):
+                meta_dict[key] = []
+            meta_dict[key].append(item[2:].strip())
+        elif ":" in line:
             key, value = line.split(":", 1)
             if capitalize_keys:
                 key = key.upper()
-            meta_dict[key.strip()] = value.strip()
+            key = key.strip()
+            meta_dict[key] = value.strip()
     return meta_dict
 
 
+def parse_list(value) -> list:
+    """A front matter value as a list, from ``[a, b]``, ``a, b`` or a block list"""
+    if not value:
+        return []
+    if isinstance(value, list):
+        items = value
+    else:
+        items = value.strip().strip("[]").split(",")
+    return [x.strip().strip("\"'") for x in items if x.strip().strip("\"'")]
+
+
+def parse_date(value) -> str:
+    """A front matter date as an ISO date, None when it is not one
+
+    Only the day counts, ``2024-05-01T10:00`` and ``2024/05/01`` are both
+    ``2024-05-01``.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return date.fromisoformat(
+            value.strip()[:10].replace("/", "-")
+        ).isoformat()
+    except ValueError:
+        return None
+
+
 def meta_to_dict(content) -> dict:
     """Extract metadat headers and returns it as a dictionary
 
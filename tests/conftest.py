@@ -0,0 +1,33 @@
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def make_vault(tmp_path):
+    """Writes a vault of relative path -> content under tmp_path/name"""
+
+    def make(files: dict, name: str = "vault") -> Path:
+        root = tmp_path / name
+        for rel_path, content in files.items():
+            path = root / rel_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content, encoding="utf-8")
+        return root.resolve()
+
+    return make
+
+
+@pytest.fixture
+def load_book():
+    """Loads the book of a vault as the update subcommand does"""
+    from backlinks.collector.book import BookDictionary
+
+    def load(vault: Path, **kwargs):
+        book = BookDictionary(
+            vault, vault.parent, JSON_PATH=vault / "crosswalk.json", **kwargs
+        )
+        book.load(store_content=False)
+        return book
+
+    return load
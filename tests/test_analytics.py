@@ -0,0 +1,144 @@
+import csv
+import random
+
+import pytest
+
+from backlinks.cli import main
+from backlinks.core import analytics
+from backlinks.core.analytics import (
+    CSRGraph,
+    connected_components,
+    dead_ends,
+    hubs,
+    in_degree,
+    orphans,
+    out_degree,
+    pagerank,
+)
+
+EDGES = [(0, 1), (0, 2), (1, 2), (2, 0), (3, 2), (5, 6)]
+
+
+@pytest.fixture(params=["python", "numpy", "scipy"])
+def backend(request, monkeypatch):
+    """Runs a test on the pure python code and on each vectorized one"""
+    if request.param != "python":
+        pytest.importorskip("numpy")
+    if request.param == "scipy":
+        pytest.importorskip("scipy.sparse.csgraph")
+    if request.param == "python":
+        monkeypatch.setattr(analytics, "_numpy", lambda: None)
+    if request.param != "scipy":
+        monkeypatch.setattr(analytics, "_csgraph", lambda: None)
+    return request.param
+
+
+def _graph(edges=EDGES, n=7) -> CSRGraph:
+    edges = random.Random(0).sample(edges, len(edges))
+    return CSRGraph.from_edges([s for s, _ in edges], [t for _, t in edges], n)
+
+
+def _reference_pagerank(edges, n, damping=0.85, iterations=200) -> list:
+    """Dense power iteration, dangling nodes linking to every node"""
+    targets = [[t for s, t in edges if s == i] for i in range(n)]
+    rank = [1.0 / n] * n
+    for _ in range(iterations):
+        new_rank = [(1.0 - damping) / n] * n
+        for i in range(n):
+            for t in targets[i] or range(n):
+                new_rank[t] += damping * rank[i] / (len(targets[i]) or n)
+        rank = new_rank
+    return rank
+
+
+def test_csr_rows(backend):
+    graph = _graph()
+    assert list(graph.INDPTR) == [0, 2, 3, 4, 5, 5, 6, 6]
+    rows = [
+        sorted(graph.INDICES[graph.INDPTR[i] : graph.INDPTR[i + 1]])
+        for i in range(graph.N)
+    ]
+    assert rows == [[1, 2], [2], [0], [2], [], [6], []]
+    assert list(graph.sources()) == [0, 0, 1, 2, 3, 5]
+    assert graph.edge_count() == len(EDGES)
+
+
+def test_degrees(backend):
+    graph = _graph()
+    in_deg, out_deg = in_degree(graph), out_degree(graph)
+    assert list(in_deg) == [1, 1, 3, 0, 0, 0, 1]
+    assert list(out_deg) == [2, 1, 1, 1, 0, 1, 0]
+    assert orphans(in_deg, out_deg) == [4]
+    assert dead_ends(in_deg, out_deg) == [6]
+    assert hubs(in_deg, top=3) == [2, 0, 1]
+
+
+def test_connected_components(backend):
+    assert list(connected_components(_graph())) == [0, 0, 0, 0, 1, 2, 2]
+    assert list(connected_components(CSRGraph())) == []
+
+
+def test_pagerank(backend):
+    rank = pagerank(_graph(), tolerance=1e-12)
+    assert sum(rank) == pytest.approx(1.0)
+    assert list(rank) == pytest.approx(_reference_pagerank(EDGES, 7), abs=1e-9)
+    assert list(pagerank(CSRGraph())) == []
+
+
+def test_backends_agree_on_random_graphs(monkeypatch):
+    pytest.importorskip("numpy")
+    rng = random.Random(1)
+    graphs = []
+    for _ in range(50):
+        n = rng.randint(1, 60)
+        edges = {
+            (rng.randrange(n), rng.randrange(n))
+            for _ in range(rng.randint(0, 2 * n))
+        }
+        graphs.append((sorted(edges), n))
+
+    def metrics():
+        results = []
+        for edges, n in graphs:
+            graph = _graph(edges, n)
+            results.append(
+                (
+                    list(in_degree(graph)),
+                    list(out_degree(graph)),
+                    list(connected_components(graph)),
+                    list(pagerank(graph, tolerance=1e-12)),
+                )
+            )
+        return results
+
+    vectorized = metrics()
+    monkeypatch.setattr(analytics, "_numpy", lambda: None)
+    for (*exact, rank), (*expected, expected_rank) in zip(
+        vectorized, metrics()
+    ):
+        assert exact == expected
+        assert rank == pytest.approx(expected_rank, abs=1e-9)
+
+
+def test_analytics_report(backend, make_vault, tmp_path):
+    vault = make_vault(
+        {
+            "a.md": "# A\n\n[B](b.md) [C](c.md)\n",
+            "b.md": "# B\n\n[C](c.md)\n",
+            "c.md": "# C\n\n[A](a.md)\n",
+            "lonely.md": "# Lonely\n",
+        }
+    )
+    report = tmp_path / "report.csv"
+    args = ["--progress", "off", "analytics", str(vault), "-o", str(report)]
+    assert main(args) == 0
+    with open(report, encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["path"] for row in rows] == [
+        "/vault/c.md",
+        "/vault/a.md",
+        "/vault/b.md",
+        "/vault/lonely.md",
+    ]
+    assert rows[0]["in_degree"] == "2"
+    assert rows[-1]["component"] != rows[0]["component"]
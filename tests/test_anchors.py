@@ -0,0 +1,74 @@
+import csv
+
+import Backlink
+from backlinks.core.index import LinkIndex
+from backlinks.core.linkage import make_Crosslink
+from backlinks.markdown.markdown import has_anchor, heading_slugs, slugify
+
+DOC = (
+    "---\ntitle: Front\n---\n"
+    "# Some Heading\n\ntext\n\n"
+    "```\n# Not A Heading\n```\n\n"
+    "## Notes\n\n## Notes\n\n### C++ & Rust!\n"
+)
+FILES = {
+    "a.md": "# A\n\n[ok](b.md#notes-1) [case](b.md#Some%20Heading) "
+    "[bad](b.md#not-a-heading)\n",
+    "b.md": DOC,
+}
+
+
+def test_heading_slugs():
+    assert slugify("  C++ & Rust! ") == "c--rust"
+    assert heading_slugs(DOC) == ["some-heading", "notes", "notes-1", "c--rust"]
+
+
+def test_has_anchor():
+    anchors = set(heading_slugs(DOC))
+
+    assert has_anchor(anchors, "notes-1")
+    assert has_anchor(anchors, "NOTES")
+    assert has_anchor(anchors, "Some%20Heading")
+    assert not has_anchor(anchors, "notes-2")
+    # headings in fenced code are not anchors
+    assert not has_anchor(anchors, "not-a-heading")
+
+
+def test_index_broken_anchors(make_vault, load_book):
+    vault = make_vault(FILES)
+    book = load_book(vault)
+    index = LinkIndex.from_book(book)
+    a, b = index.IDS["/vault/a.md"], index.IDS["/vault/b.md"]
+
+    assert index.has_anchor(b, "notes-1")
+    assert index.broken_anchors() == {a: ["b.md#not-a-heading"]}
+    # the target itself exists, the link is not broken
+    assert index.LINKS[a] == {b} and not index.BROKEN.get(a)
+
+    statuses = {
+        record["target_file"]: record["status"]
+        for record in make_Crosslink(book, index)
+        if record["link_type"] == "Markdown Fragment Link"
+    }
+    assert statuses == {
+        "/vault/b.md#notes-1": "Valid",
+        "/vault/b.md#Some%20Heading": "Valid",
+        "/vault/b.md#not-a-heading": "Broken Anchor",
+    }
+
+
+def test_backlink_script_reports_broken_anchors(make_vault):
+    vault = make_vault(FILES)
+    Backlink.scan_documents(vault)
+
+    with open(vault / "backlinks.csv", "r", encoding="utf-8") as f:
+        statuses = {
+            row["target_file"]: row["status"]
+            for row in csv.DictReader(f)
+            if row["link_type"] == "original"
+        }
+    assert statuses == {
+        "/vault/b.md#notes-1": "Valid",
+        "/vault/b.md#Some%20Heading": "Valid",
+        "/vault/b.md#not-a-heading": "Broken Anchor",
+    }
@@ -0,0 +1,48 @@
+import random
+
+import Backlink
+from backlinks.bench import (
+    ADVERSARIAL_UNITS,
+    MAX_SCALING,
+    fuzz_scanner,
+    memory_per_document,
+    scanner_scaling,
+)
+from backlinks.cli import MEMORY_BUDGET_KB
+from backlinks.markdown.scanner import scan_links
+
+
+def test_scanner_fuzz():
+    assert fuzz_scanner(2000) == []
+
+
+def test_scanner_scales_linearly():
+    # a busy machine can slow one timing down, a quadratic input fails every
+    # attempt
+    for _ in range(3):
+        slow = [
+            name
+            for name, _, _, ratio in scanner_scaling()
+            if ratio > MAX_SCALING
+        ]
+        if not slow:
+            break
+    assert not slow, f"{slow} scale worse than linear"
+
+
+def test_script_finds_the_links_the_scanner_does():
+    rng = random.Random(0)
+    documents = [unit * 5000 for unit in ADVERSARIAL_UNITS.values()]
+    documents += [
+        "".join(rng.choices("[]()`~\\\n <>ab.md#", k=rng.randint(0, 300)))
+        for _ in range(500)
+    ]
+    for content in documents:
+        assert Backlink.find_markdown_links(content) == scan_links(
+            content, markdown_only=True
+        )
+
+
+def test_memory_per_document():
+    _, per_document = memory_per_document(500)
+    assert per_document <= MEMORY_BUDGET_KB * 1024
@@ -0,0 +1,89 @@
+from json import loads
+
+from backlinks.collector.cache import CACHE_VERSION, ParseCache
+from backlinks.collector.document import FileDictionary
+from backlinks.core.index import LinkIndex
+
+# the same daily note skeleton in two folders, each linking to its own x.md
+SKELETON = "# Daily\n\n[x](x.md)\n"
+FILES = {
+    "2024/day.md": SKELETON,
+    "2024/x.md": "# X 2024\n",
+    "2025/day.md": SKELETON,
+    "2025/x.md": "# X 2025\n",
+}
+
+
+def test_identical_content_is_parsed_once(make_vault, load_book):
+    vault = make_vault(FILES)
+    cache = ParseCache()
+    book = load_book(vault, PARSE_CACHE=cache)
+
+    # one entry per distinct content, the second skeleton is a hit
+    assert len(cache) == 3
+    assert cache.HITS == 1
+    index = LinkIndex.from_book(book)
+    for year in ("2024", "2025"):
+        day = index.IDS[f"/vault/{year}/day.md"]
+        assert {index.PATHS[i] for i in index.LINKS[day]} == {
+            f"/vault/{year}/x.md"
+        }
+
+
+def test_cache_persists_across_runs(make_vault, load_book, tmp_path):
+    vault = make_vault(FILES)
+    cache_path = tmp_path / "cache.json"
+    load_book(vault, PARSE_CACHE=ParseCache(cache_path))
+
+    data = loads(cache_path.read_text(encoding="utf-8"))
+    assert data["VERSION"] == CACHE_VERSION
+    assert len(data["ENTRIES"]) == 3
+
+    cache = ParseCache(cache_path)
+    book = load_book(vault, PARSE_CACHE=cache)
+    assert cache.HITS == 4 and cache.MISSES == 0
+    assert book.PAGES[vault / "2025/x.md"]["HEADING"] == "X 2025"
+
+
+def test_out_of_date_cache_is_ignored(tmp_path):
+    cache_path = tmp_path / "cache.json"
+    cache_path.write_text('{"VERSION": 0, "ENTRIES": {"h": {}}}')
+
+    assert len(ParseCache(cache_path).load()) == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ParseCache(tmp_path / "cache.json", MAX_ENTRIES=2)
+    cache.put("a", {"A": 1})
+    cache.put("b", {"B": 1})
+    cache.get("a")
+    cache.put("c", {"C": 1})
+
+    assert list(cache.ENTRIES) == ["a", "c"]
+    assert cache.get("b") is None
+
+    cache.dump()
+    assert list(ParseCache(tmp_path / "cache.json", 1).load().ENTRIES) == ["c"]
+
+
+def test_known_hash_hit_does_not_read_the_file(make_vault, monkeypatch):
+    vault = make_vault(FILES)
+    cache = ParseCache()
+    first = FileDictionary().load_document(
+        vault / "2024/day.md", vault, parse_cache=cache
+    )
+
+    def no_read(self, path):
+        raise AssertionError(f"{path} was read")
+
+    monkeypatch.setattr(FileDictionary, "_read_document", no_read)
+    second = FileDictionary().load_document(
+        vault / "2025/day.md",
+        vault,
+        store_content=False,
+        parse_cache=cache,
+        known_hash=first["HASH"],
+    )
+    assert second["HASH"] == first["HASH"]
+    assert second["REL_PATH"] == "/vault/2025/day.md"
+    assert dict(second["LINKS"]) == dict(first["LINKS"])
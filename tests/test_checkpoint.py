@@ -0,0 +1,86 @@
+import backlinks.core.plan
+from backlinks.cli import main
+from backlinks.collector.document import FileDictionary
+from backlinks.core.checkpoint import (
+    CHECKPOINT_DIR,
+    STAGES,
+    Checkpoint,
+    fingerprint,
+)
+
+
+def test_completing_a_stage_with_new_inputs_drops_later_stages(tmp_path):
+    checkpoint = Checkpoint(tmp_path / CHECKPOINT_DIR).load()
+    for stage in STAGES:
+        checkpoint.complete(stage, "k", {f"/vault/{stage}.md": "err"})
+    assert len(checkpoint.failures()) == len(STAGES)
+
+    # the same inputs keep the later stages
+    checkpoint.complete("parse", "k")
+    assert list(checkpoint.STAGES) == STAGES
+    checkpoint.complete("crosswalk", "new")
+    assert list(checkpoint.STAGES) == ["walk", "parse", "crosswalk"]
+    assert checkpoint.failures() == {"/vault/walk.md": "err"}
+
+    loaded = Checkpoint(tmp_path / CHECKPOINT_DIR).load()
+    assert loaded.done("crosswalk", "new") and not loaded.done("parse", "new")
+    assert loaded.FAILED == checkpoint.FAILED
+
+    loaded.clear()
+    assert not (tmp_path / CHECKPOINT_DIR).exists()
+    assert Checkpoint(tmp_path / CHECKPOINT_DIR).load().STAGES == {}
+
+
+def test_fingerprint():
+    assert fingerprint({"b": 1, "a": 2}) == fingerprint({"a": 2, "b": 1})
+    assert fingerprint("a", True) != fingerprint("a", False)
+
+
+# a links to both targets, writing one fails in the first run
+FILES = {
+    "a.md": "# A\n\n[one](one.md) [two](two.md)\n",
+    "one.md": "# One\n",
+    "two.md": "# Two\n",
+}
+
+
+def update(vault) -> int:
+    return main(["--progress", "off", "update", str(vault), "--checkpoint"])
+
+
+def test_update_resumes_and_retries_failed_files(make_vault, monkeypatch):
+    vault = make_vault(FILES)
+    atomic_write = backlinks.core.plan.atomic_write
+
+    def failing_write(path, data, *args, **kwargs):
+        if str(path).endswith("one.md"):
+            raise OSError("disk full")
+        return atomic_write(path, data, *args, **kwargs)
+
+    monkeypatch.setattr(backlinks.core.plan, "atomic_write", failing_write)
+    assert update(vault) == 1
+    assert "# Backlinks" not in (vault / "one.md").read_text(encoding="utf-8")
+    assert "- [A](/vault/a.md)" in (vault / "two.md").read_text(
+        encoding="utf-8"
+    )
+
+    checkpoint = Checkpoint(vault / CHECKPOINT_DIR).load()
+    assert list(checkpoint.STAGES) == STAGES
+    assert list(checkpoint.failures()) == ["/vault/one.md"]
+
+    read = []
+    read_document = FileDictionary._read_document
+
+    def record(self, path):
+        read.append(path)
+        return read_document(self, path)
+
+    monkeypatch.setattr(backlinks.core.plan, "atomic_write", atomic_write)
+    monkeypatch.setattr(FileDictionary, "_read_document", record)
+    assert update(vault) == 0
+    # only the file written by the first run is parsed again
+    assert read == [vault / "two.md"]
+    assert "- [A](/vault/a.md)" in (vault / "one.md").read_text(
+        encoding="utf-8"
+    )
+    assert not (vault / CHECKPOINT_DIR).exists()
@@ -0,0 +1,177 @@
+import csv
+from json import loads
+
+import pytest
+
+import Backlink
+from backlinks.io import columnar
+from backlinks.io.columnar import (
+    COLUMNAR_DIR,
+    COLUMNAR_VERSION,
+    MANIFEST_FILE,
+    csv_to_columnar,
+    load_columnar_data,
+    save_columnar_data,
+)
+
+ROWS = [
+    {
+        "source_file": "/vault/a.md",
+        "source_title": "Ä",
+        "target_file": "/vault/b.md",
+        "target_title": "B",
+        "link_text": "to b",
+        "status": "Valid",
+        "hierarchy_level": 0,
+        "link_type": "original",
+    },
+    {
+        "source_file": "/vault/b.md",
+        "source_title": "B",
+        "target_file": "/vault/a.md",
+        "target_title": "Ä",
+        "link_text": "",
+        "status": "Valid",
+        "hierarchy_level": 0,
+        "link_type": "backlink",
+    },
+    {
+        "source_file": "/vault/sub/c.md",
+        "source_title": "",
+        "target_file": "/vault/gone.md",
+        "target_title": None,
+        "link_text": "to b",
+        "status": "Broken",
+        "hierarchy_level": 1,
+        "link_type": "original",
+    },
+]
+
+
+def decode(columns, tables) -> list:
+    """The rows a columnar table holds, as save_columnar_data was given them"""
+    paths, titles = tables["paths"], tables["titles"]
+    return [
+        {
+            "source_file": paths[columns["source"][i]],
+            "source_title": titles[columns["source"][i]],
+            "target_file": paths[columns["target"][i]],
+            "target_title": titles[columns["target"][i]],
+            "link_text": tables["link_text"][columns["link_text"][i]],
+            "status": tables["status"][columns["status"][i]],
+            "hierarchy_level": int(columns["hierarchy_level"][i]),
+            "link_type": tables["link_type"][columns["link_type"][i]],
+        }
+        for i in range(len(columns["source"]))
+    ]
+
+
+def expected(rows) -> list:
+    # titles are per node, a node keeps the first title it was given
+    titles = {}
+    for row in rows:
+        for key in ("source", "target"):
+            if row[f"{key}_title"]:
+                titles.setdefault(row[f"{key}_file"], row[f"{key}_title"])
+    return [
+        dict(
+            row,
+            source_title=titles.get(row["source_file"], ""),
+            target_title=titles.get(row["target_file"], ""),
+        )
+        for row in rows
+    ]
+
+
+def test_roundtrip(tmp_path):
+    assert save_columnar_data(tmp_path / "cols", ROWS) == 3
+    columns, tables = load_columnar_data(tmp_path / "cols", use_numpy=False)
+
+    assert decode(columns, tables) == expected(ROWS)
+    assert tables["paths"] == [
+        "/vault/a.md",
+        "/vault/b.md",
+        "/vault/sub/c.md",
+        "/vault/gone.md",
+    ]
+    # repeated strings are stored once
+    assert tables["link_text"] == ["to b", ""]
+
+
+def test_roundtrip_numpy(tmp_path):
+    pytest.importorskip("numpy")
+    save_columnar_data(tmp_path / "cols", ROWS)
+
+    for mmap in (False, True):
+        columns, tables = load_columnar_data(tmp_path / "cols", mmap=mmap)
+        assert decode(columns, tables) == expected(ROWS)
+
+
+def test_empty_table(tmp_path):
+    assert save_columnar_data(tmp_path / "cols", []) == 0
+    columns, tables = load_columnar_data(tmp_path / "cols", use_numpy=False)
+
+    assert all(len(column) == 0 for column in columns.values())
+    assert tables["paths"] == []
+
+
+def test_manifest_is_written_last(tmp_path, monkeypatch):
+    written = []
+    atomic_write = columnar.atomic_write
+
+    def record(file_path, data, *args):
+        written.append(file_path.name)
+        return atomic_write(file_path, data, *args)
+
+    monkeypatch.setattr(columnar, "atomic_write", record)
+    save_columnar_data(tmp_path, ROWS)
+
+    assert written[-1] == MANIFEST_FILE
+    assert "source.bin" in written and "paths.utf8" in written
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(written)
+    manifest = loads((tmp_path / MANIFEST_FILE).read_text(encoding="utf-8"))
+    assert manifest["version"] == COLUMNAR_VERSION
+    assert manifest["rows"] == 3 and manifest["nodes"] == 4
+
+
+def test_unsupported_version(tmp_path):
+    save_columnar_data(tmp_path, ROWS)
+    (tmp_path / MANIFEST_FILE).write_text('{"version": 0}', encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        load_columnar_data(tmp_path)
+
+
+def test_csv_to_columnar(tmp_path):
+    csv_path = tmp_path / "backlinks.csv"
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=Backlink.CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(dict(row, snippet="") for row in ROWS)
+
+    assert csv_to_columnar(csv_path, tmp_path / "cols") == 3
+    columns, tables = load_columnar_data(tmp_path / "cols", use_numpy=False)
+    rows = [dict(row, target_title=row["target_title"] or "") for row in ROWS]
+    assert decode(columns, tables) == expected(rows)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_backlink_script_writes_columns(make_vault, streaming):
+    vault = make_vault(
+        {"a.md": "# A\n\n[b](sub/b.md)\n", "sub/b.md": "# B\n\n[a](../a.md)\n"}
+    )
+
+    Backlink.add_backlinks(vault, streaming=streaming, links_format="columnar")
+
+    with open(vault / "backlinks.csv", "r", encoding="utf-8") as f:
+        records = list(csv.DictReader(f))
+    columns, tables = load_columnar_data(vault / COLUMNAR_DIR, use_numpy=False)
+    rows = decode(columns, tables)
+    assert len(rows) == len(records) == 4
+    assert sorted(
+        (row["source_file"], row["target_file"], row["link_type"])
+        for row in rows
+    ) == sorted(
+        (row["source_file"], row["target_file"], row["link_type"])
+        for row in records
+    )
@@ -0,0 +1,58 @@
+import pytest
+
+from backlinks.collector.document import FileDictionary, StaleDocumentError
+from backlinks.io.markdown import content_hash
+
+FILES = {
+    "a.md": "---\ntitle: A ü\n---\n# A\n\nsee [b](b.md) and [web](https://e.com)\n",
+    "b.md": "# B\n\nbody\n\n# Backlinks\n\n- [A ü](/vault/a.md)\n",
+}
+
+
+def test_load_without_content_keeps_the_parse(make_vault, load_book):
+    vault = make_vault(FILES)
+    book = load_book(vault)
+
+    a, b = book.PAGES[vault / "a.md"], book.PAGES[vault / "b.md"]
+    assert a["CONTENT"] == "" and b["CONTENT"] == ""
+    assert a["TITLE"] == "A ü"
+    assert set(a["LINKS"]) == {"b.md", "https://e.com"}
+    assert list(b["BACKLINKS"]) == ["/vault/a.md"]
+    raw = (vault / "b.md").read_bytes()
+    assert a["HASH"] == content_hash((vault / "a.md").read_bytes())
+    assert b["SIZE"] == len(raw)
+    assert b["SECTIONS"]["BACKLINKS"] == raw.index(b"# Backlinks")
+    assert b["SECTIONS"]["END"] == len(raw)
+
+
+def test_load_with_content(make_vault):
+    vault = make_vault(FILES)
+    doc = FileDictionary().load_document(vault / "a.md", vault.parent)
+
+    assert doc["CONTENT"] == FILES["a.md"]
+
+
+def test_rehydrate_reads_only_documents_to_update(make_vault, load_book):
+    vault = make_vault(FILES)
+    book = load_book(vault)
+    book.PAGES[vault / "b.md"]["NEED2UPDATE"] = True
+
+    assert book.rehydrate() == [book.PAGES[vault / "b.md"]]
+    assert book.PAGES[vault / "b.md"]["CONTENT"] == FILES["b.md"]
+    assert book.PAGES[vault / "a.md"]["CONTENT"] == ""
+
+    book.PAGES[vault / "b.md"]["NEED2UPDATE"] = False
+    book.release_content()
+    assert book.PAGES[vault / "b.md"]["CONTENT"] == ""
+
+
+def test_rehydrate_refuses_a_changed_file(make_vault, load_book):
+    vault = make_vault(FILES)
+    book = load_book(vault)
+    doc = book.PAGES[vault / "a.md"]
+    (vault / "a.md").write_text("# Rewritten\n", encoding="utf-8")
+
+    with pytest.raises(StaleDocumentError):
+        doc.load_content()
+    assert doc["CONTENT"] == ""
+    assert doc.load_content(verify=False) == "# Rewritten\n"
@@ -0,0 +1,102 @@
+import shutil
+import subprocess
+
+import pytest
+
+from backlinks.collector.cache import ParseCache
+from backlinks.collector.document import FileDictionary
+from backlinks.io.markdown import content_hash
+from backlinks.path.path import generate_file_list, git_file_list
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("git") is None, reason="git is not installed"
+)
+
+FILES = {
+    "a.md": "# A\n\n[b](b.md)\n",
+    "b.md": "# B\n",
+    "sub/c.md": "# C\n",
+    "gone.md": "# Gone\n",
+    "readme.txt": "not markdown\n",
+}
+
+
+def git(vault, *args):
+    subprocess.run(
+        ["git", "-C", str(vault), *args], check=True, capture_output=True
+    )
+
+
+@pytest.fixture
+def repo(make_vault, tmp_path, monkeypatch):
+    """A committed vault, then b edited, gone deleted and new untracked"""
+    # a tmp dir inside some other work tree must not be found as one
+    monkeypatch.setenv("GIT_CEILING_DIRECTORIES", str(tmp_path))
+    vault = make_vault(FILES)
+    git(vault, "init", "-q")
+    git(vault, "add", ".")
+    git(
+        vault,
+        "-c",
+        "user.name=test",
+        "-c",
+        "user.email=test@example.com",
+        "commit",
+        "-q",
+        "-m",
+        "vault",
+    )
+    (vault / "b.md").write_text("# B edited\n", encoding="utf-8")
+    (vault / "gone.md").unlink()
+    (vault / "new.md").write_text("# New\n", encoding="utf-8")
+    return vault
+
+
+def test_git_file_list(repo):
+    files = git_file_list(repo)
+
+    assert set(files) == {
+        repo / name for name in ("a.md", "b.md", "sub/c.md", "new.md")
+    }
+    # the blob hash of an unchanged file is its content hash
+    assert files[repo / "a.md"] == content_hash((repo / "a.md").read_bytes())
+    assert files[repo / "sub/c.md"] is not None
+    assert files[repo / "b.md"] is None and files[repo / "new.md"] is None
+
+
+def test_generate_file_list_from_git(repo):
+    walked = set(generate_file_list(repo))
+    assert repo / "gone.md" not in walked
+
+    assert set(generate_file_list(repo, use_git=True)) == walked
+
+
+def test_outside_a_work_tree(make_vault, tmp_path, monkeypatch):
+    monkeypatch.setenv("GIT_CEILING_DIRECTORIES", str(tmp_path))
+    vault = make_vault(FILES)
+
+    assert git_file_list(vault) is None
+    assert set(generate_file_list(vault, use_git=True)) == set(
+        generate_file_list(vault)
+    )
+
+
+def test_blob_hashes_key_the_parse_cache(repo, load_book, monkeypatch):
+    cache = ParseCache()
+    load_book(repo, PARSE_CACHE=cache)
+
+    read = []
+    read_document = FileDictionary._read_document
+
+    def record(self, path):
+        read.append(path)
+        return read_document(self, path)
+
+    monkeypatch.setattr(FileDictionary, "_read_document", record)
+    book = load_book(repo, GIT=True, PARSE_CACHE=cache)
+    # only the files changed since the commit are read
+    assert set(read) == {repo / "b.md", repo / "new.md"}
+    assert book.PAGES[repo / "b.md"]["HEADING"] == "B edited"
+    assert (
+        book.PAGES[repo / "a.md"]["HASH"] == git_file_list(repo)[repo / "a.md"]
+    )
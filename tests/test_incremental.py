@@ -0,0 +1,69 @@
+import io
+
+from backlinks.cli import main
+from backlinks.core.incremental import INDEX_FILE, update_files
+from backlinks.core.index import LinkIndex
+
+VAULT = {
+    "a.md": "# A\n\nsee [B](b.md)\n",
+    "b.md": "# B\n\ntext\n",
+}
+
+
+def _update(vault):
+    assert main(["--progress", "off", "update", str(vault)]) == 0
+
+
+def test_new_file(make_vault):
+    vault = make_vault(VAULT)
+    _update(vault)
+    (vault / "c.md").write_text("# C\n\n[A](a.md)\n", encoding="utf-8")
+    assert update_files(vault, [vault / "c.md"]) == []
+    assert "- [C](/vault/c.md)" in (vault / "a.md").read_text()
+    assert "/vault/c.md" in LinkIndex.load(vault / INDEX_FILE).IDS
+
+
+def test_new_file_linked_from_a_changed_file(make_vault):
+    vault = make_vault(VAULT)
+    _update(vault)
+    (vault / "new.md").write_text("# New\n", encoding="utf-8")
+    (vault / "b.md").write_text("# B\n\n[New](new.md)\n", encoding="utf-8")
+    assert update_files(vault, [vault / "b.md"]) == []
+    assert "- [B](/vault/b.md)" in (vault / "new.md").read_text()
+
+
+def test_deleted_file(make_vault):
+    vault = make_vault(VAULT)
+    _update(vault)
+    assert "- [A](/vault/a.md)" in (vault / "b.md").read_text()
+    (vault / "a.md").unlink()
+    assert update_files(vault, [vault / "a.md"]) == []
+    assert "[A]" not in (vault / "b.md").read_text()
+    assert "/vault/a.md" not in LinkIndex.load(vault / INDEX_FILE).IDS
+
+
+def test_file_outside_the_vault_is_skipped(make_vault, tmp_path):
+    vault = make_vault(VAULT)
+    _update(vault)
+    outside = tmp_path / "out.md"
+    outside.write_text("# Out\n\n[A](vault/a.md)\n", encoding="utf-8")
+    before = (vault / "a.md").read_text()
+    assert update_files(vault, [outside]) == []
+    assert (vault / "a.md").read_text() == before
+    assert str(outside) not in LinkIndex.load(vault / INDEX_FILE).IDS
+
+
+def test_no_index_asks_for_a_full_run(make_vault):
+    vault = make_vault(VAULT)
+    assert update_files(vault, [vault / "a.md"]) is None
+
+
+def test_files_from_stdin(make_vault, monkeypatch):
+    vault = make_vault(VAULT)
+    _update(vault)
+    (vault / "c.md").write_text("# C\n\n[B](b.md)\n", encoding="utf-8")
+    monkeypatch.setattr(
+        "sys.stdin", io.StringIO(f"{vault / 'c.md'}\nnotes.txt\n")
+    )
+    assert main(["--progress", "off", "files", str(vault), "--stdin"]) == 0
+    assert "- [C](/vault/c.md)" in (vault / "b.md").read_text()
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from backlinks.io.locking import LockTimeoutError, VaultLock, atomic_write
+
+SRC_PATH = Path(__file__).resolve().parents[1] / "src"
+
+HOLD_LOCK = """
+import sys
+from contextlib import nullcontext
+from backlinks.io.locking import VaultLock
+
+with VaultLock(sys.argv[1], shared=sys.argv[2] == "shared") as lock:
+    with lock.file(sys.argv[3]) if len(sys.argv) > 3 else nullcontext():
+        print("locked", flush=True)
+        sys.stdin.readline()
+"""
+
+
+@pytest.fixture
+def hold_lock():
+    """Starts processes holding a vault lock, and a file lock, for the test"""
+    children = []
+
+    def hold(vault, mode: str, rel_path: str = None):
+        argv = [sys.executable, "-c", HOLD_LOCK, str(vault), mode]
+        child = subprocess.Popen(
+            argv + ([rel_path] if rel_path else []),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=dict(os.environ, PYTHONPATH=str(SRC_PATH)),
+        )
+        children.append(child)
+        assert child.stdout.readline().strip() == "locked"
+
+    yield hold
+    for child in children:
+        child.communicate("\n", timeout=10)
+
+
+def test_shared_locks_go_side_by_side(tmp_path, hold_lock):
+    hold_lock(tmp_path, "shared")
+    with VaultLock(tmp_path, timeout=0.1):
+        pass
+
+
+def test_exclusive_lock_waits_for_shared_ones(tmp_path, hold_lock):
+    hold_lock(tmp_path, "shared")
+    with pytest.raises(LockTimeoutError):
+        with VaultLock(tmp_path, shared=False, timeout=0.1):
+            pass
+
+
+def test_file_locks_exclude_only_their_path(tmp_path, hold_lock):
+    hold_lock(tmp_path, "shared", "/vault/a.md")
+    with VaultLock(tmp_path, timeout=0.1) as lock:
+        with lock.file("/vault/b.md"):
+            pass
+        with pytest.raises(LockTimeoutError):
+            with lock.file("/vault/a.md"):
+                pass
+
+
+def test_atomic_write_keeps_permissions(tmp_path):
+    target = tmp_path / "a.md"
+    target.write_text("old")
+    target.chmod(0o640)
+    assert atomic_write(target, b"new")
+    assert target.read_bytes() == b"new"
+    assert target.stat().st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["a.md"]
+
+
+def test_atomic_write_checks_the_expected_stat(tmp_path):
+    target = tmp_path / "a.md"
+    target.write_text("old")
+    st = target.stat()
+    target.write_text("edited meanwhile")
+    assert not atomic_write(target, b"new", (st.st_mtime_ns, st.st_size))
+    assert target.read_text() == "edited meanwhile"
+    assert os.listdir(tmp_path) == ["a.md"]
+    assert not atomic_write(tmp_path / "gone.md", b"new", (0, 0))
+    assert not (tmp_path / "gone.md").exists()
+
+
+def test_atomic_write_from_threads(tmp_path):
+    target = tmp_path / "index.json"
+    contents = [bytes([65 + i]) * 100_000 for i in range(8)]
+    errors = []
+
+    def write(data):
+        try:
+            for _ in range(20):
+                atomic_write(target, data)
+        except Exception as e:  # noqa: BLE001, reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(c,)) for c in contents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert target.read_bytes() in contents
+    assert os.listdir(tmp_path) == ["index.json"]
@@ -0,0 +1,116 @@
+from backlinks.cli import main
+from backlinks.core.index import LinkIndex
+from backlinks.io.mermaid import (
+    mermaid_graph,
+    neighborhood,
+    select_edges,
+    select_nodes,
+)
+
+# a -> b -> c -> d is a chain, every note links to the hub, lone links nowhere
+FILES = {
+    "a.md": "# A\n\n[b](b.md) [hub](notes/hub.md)\n",
+    "b.md": "# B\n\n[c](c.md) [hub](notes/hub.md)\n",
+    "c.md": "# C\n\n[d](d.md) [hub](notes/hub.md)\n",
+    "d.md": '# D "quoted"\n\n[hub](notes/hub.md)\n',
+    "notes/hub.md": "# Hub\n",
+    "lone.md": "# Lone\n",
+}
+
+
+def build_index(make_vault, load_book):
+    vault = make_vault(FILES)
+    return LinkIndex.from_book(load_book(vault))
+
+
+def ids(index, *names):
+    return {index.IDS[f"/vault/{name}.md"] for name in names}
+
+
+def test_neighborhood(make_vault, load_book):
+    index = build_index(make_vault, load_book)
+    a = index.IDS["/vault/a.md"]
+
+    assert neighborhood(index, a, 0) == {a}
+    assert neighborhood(index, a, 1) == ids(index, "a", "b", "notes/hub")
+    # backlinks are followed too, the hub reaches every note linking to it
+    assert neighborhood(index, a, 2) == ids(
+        index, "a", "b", "c", "d", "notes/hub"
+    )
+
+
+def test_select_nodes_drops_unlinked_and_low_degree(make_vault, load_book):
+    index = build_index(make_vault, load_book)
+
+    assert select_nodes(index, max_nodes=0) == ids(
+        index, "a", "b", "c", "d", "notes/hub"
+    )
+    # a and d have the lowest degree
+    assert select_nodes(index, max_nodes=3) == ids(index, "b", "c", "notes/hub")
+
+
+def test_select_nodes_keeps_the_focus(make_vault, load_book):
+    index = build_index(make_vault, load_book)
+
+    nodes = select_nodes(index, focus="/vault/a.md", hops=2, max_nodes=2)
+    assert len(nodes) == 2
+    assert ids(index, "a", "notes/hub") == nodes
+
+
+def test_select_edges_caps_by_degree(make_vault, load_book):
+    index = build_index(make_vault, load_book)
+    nodes = select_nodes(index, max_nodes=0)
+
+    assert len(select_edges(index, nodes, max_edges=0)) == 7
+    edges = select_edges(index, nodes, max_edges=3)
+    assert len(edges) == 3
+    hub = index.IDS["/vault/notes/hub.md"]
+    assert all(hub in edge for edge in edges)
+
+
+def test_mermaid_graph(make_vault, load_book):
+    index = build_index(make_vault, load_book)
+    a, d, hub = (
+        index.IDS[f"/vault/{name}.md"] for name in ("a", "d", "notes/hub")
+    )
+
+    chart = mermaid_graph(index)
+    lines = chart.splitlines()
+    assert lines[0] == "flowchart TD"
+    assert '    subgraph f0["/vault"]' in lines
+    assert '    subgraph f1["/vault/notes"]' in lines
+    assert f'        n{d}["D #quot;quoted#quot;"]' in lines
+    assert f"    n{a} --> n{hub}" in lines
+    assert "Lone" not in chart
+
+    flat = mermaid_graph(index, cluster=False, direction="LR").splitlines()
+    assert flat[0] == "flowchart LR"
+    assert not any("subgraph" in line for line in flat)
+    assert f'    n{hub}["Hub"]' in flat
+
+
+def test_graph_command(make_vault, tmp_path):
+    vault = make_vault(FILES)
+    output = tmp_path / "graph.mmd"
+
+    assert (
+        main(
+            [
+                "--progress",
+                "off",
+                "graph",
+                str(vault),
+                "--focus",
+                "/vault/d.md",
+                "--max-nodes",
+                "3",
+                "-o",
+                str(output),
+            ]
+        )
+        == 0
+    )
+    chart = output.read_text(encoding="utf-8")
+    assert chart.startswith("flowchart TD")
+    assert chart.count('"]') - chart.count("subgraph") == 3
+    assert "D #quot;quoted#quot;" in chart
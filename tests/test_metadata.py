@@ -0,0 +1,128 @@
+from json import loads
+
+import pytest
+
+from backlinks.cli import main
+from backlinks.collector.document import FileDictionary
+from backlinks.collector.metadata import METADATA_FILE, MetadataStore
+from backlinks.core.index import LinkIndex
+
+FILES = {
+    "a.md": "---\ntitle: Alpha\ntags: [Python, '#Notes']\n"
+    "published: 2024-01-10\neditor: Sam\n---\n[b](b.md)\n",
+    "b.md": "---\ntitle: Beta\ntags: python\npublished: 2024/03/05\n"
+    "editor: sam\n---\n[c](c.md)\n",
+    "c.md": "---\ntitle: Gamma\ntags: [rust]\npublished: not a date\n---\n",
+    "d.md": "# D\n",
+}
+
+
+def paths(rows) -> list:
+    return [row["PATH"] for row in rows]
+
+
+def test_query_filters(make_vault, load_book):
+    vault = make_vault(FILES)
+    book = load_book(vault)
+    store, index = book.METADATA, LinkIndex.from_book(book)
+
+    assert len(store) == 4
+    assert paths(store.query(tags=["PYTHON"])) == ["/vault/a.md", "/vault/b.md"]
+    assert paths(store.query(tags=["python", "notes"])) == ["/vault/a.md"]
+    assert paths(store.query(any_tags=["notes", "rust"])) == [
+        "/vault/a.md",
+        "/vault/c.md",
+    ]
+    # bounds are inclusive, c has no valid date
+    assert paths(store.query(after="2024-01-10")) == [
+        "/vault/a.md",
+        "/vault/b.md",
+    ]
+    assert paths(store.query(before="2024-02-01")) == ["/vault/a.md"]
+    assert paths(store.query(where={"editor": "SAM"}, tags=["python"])) == [
+        "/vault/a.md",
+        "/vault/b.md",
+    ]
+    assert paths(store.query(links_to="/vault/c.md", index=index)) == [
+        "/vault/b.md"
+    ]
+    assert paths(store.query(linked_from="/vault/a.md", index=index)) == [
+        "/vault/b.md"
+    ]
+    assert store.query(tags=["rust"], fields=["title"]) == [
+        {"PATH": "/vault/c.md", "TITLE": "Gamma"}
+    ]
+
+
+def test_query_errors(make_vault, load_book):
+    store = load_book(make_vault(FILES)).METADATA
+
+    with pytest.raises(ValueError, match="Unknown fields"):
+        store.query(where={"colour": "red"})
+    with pytest.raises(ValueError, match="not an ISO date"):
+        store.query(after="last week")
+    with pytest.raises(ValueError, match="link index"):
+        store.query(links_to="/vault/c.md")
+
+
+def test_save_load_and_refresh(make_vault, load_book, tmp_path):
+    vault = make_vault(FILES)
+    store = load_book(vault).METADATA
+    store.remove("/vault/d.md")
+    store.dump(tmp_path / METADATA_FILE)
+
+    loaded = MetadataStore.load(tmp_path / METADATA_FILE)
+    assert loaded.query(tags=["python"]) == store.query(tags=["python"])
+
+    def load_document(md_file):
+        return FileDictionary().load_document(md_file, vault)
+
+    (vault / "c.md").write_text("---\ntags: [python]\n---\n", encoding="utf-8")
+    (vault / "a.md").unlink()
+    file_list = sorted(vault.glob("*.md"))
+    # c changed, a is gone and d was missing
+    assert loaded.refresh(vault, file_list, load_document) == 3
+    assert paths(loaded.query(tags=["python"])) == [
+        "/vault/b.md",
+        "/vault/c.md",
+    ]
+    assert loaded.refresh(vault, file_list, load_document) == 0
+
+
+def test_out_of_date_store_is_ignored(tmp_path):
+    (tmp_path / METADATA_FILE).write_text('{"VERSION": 0}', encoding="utf-8")
+
+    assert MetadataStore.load(tmp_path / METADATA_FILE) is None
+    assert MetadataStore.load(tmp_path / "missing.json") is None
+
+
+def query(vault, *args) -> list:
+    output = vault.parent / "query.json"
+    assert (
+        main(
+            ["--progress", "off", "query", str(vault), "-o", str(output)]
+            + list(args)
+        )
+        == 0
+    )
+    return paths(loads(output.read_text(encoding="utf-8")))
+
+
+def test_query_command(make_vault, monkeypatch):
+    vault = make_vault(FILES)
+
+    assert query(vault, "--tag", "python", "--before", "2024-02-01") == [
+        "/vault/a.md"
+    ]
+    # the front matter store is saved and answers the next query
+    assert (vault / METADATA_FILE).exists()
+    monkeypatch.setattr(
+        FileDictionary, "_read_document", lambda self, path: 1 / 0
+    )
+    assert query(vault, "--where", "title=beta") == ["/vault/b.md"]
+
+
+def test_query_command_link_filter(make_vault):
+    vault = make_vault(FILES)
+
+    assert query(vault, "--links-to", "/vault/b.md") == ["/vault/a.md"]
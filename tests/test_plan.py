@@ -0,0 +1,120 @@
+import json
+import os
+
+import pytest
+
+from backlinks.cli import main
+from backlinks.collector.document import StaleDocumentError
+from backlinks.core.index import LinkIndex
+from backlinks.core.plan import (
+    PLAN_VERSION,
+    apply_change,
+    apply_plan,
+    load_plan,
+    plan_books,
+    save_plan,
+)
+
+VAULT = {
+    "a.md": "# Ä\n\nsee [B](b.md) – naïve\n",
+    "b.md": "# B\n\nbody ü\n\n# Backlinks\n\n- [Old](/vault/old.md)\n\n"
+    "# Notes\n\nkept ✓\n",
+    "c.md": "---\nBACKLINK: false\n---\n# C\n\n[A](a.md)\n",
+}
+
+
+def _plan(load_book, vault, **kwargs):
+    book = load_book(vault)
+    return plan_books([book], LinkIndex.from_books([book]), **kwargs)
+
+
+def test_plan_does_not_touch_files(make_vault, load_book):
+    vault = make_vault(VAULT)
+    before = {p.name: p.read_bytes() for p in vault.glob("*.md")}
+    plan = _plan(load_book, vault)
+    assert sorted(c["REL_PATH"] for c in plan["FILES"]) == [
+        "/vault/a.md",
+        "/vault/b.md",
+    ]
+    assert {p.name: p.read_bytes() for p in vault.glob("*.md")} == before
+
+
+def test_apply_splices_the_section_at_byte_offsets(make_vault, load_book):
+    vault = make_vault(VAULT)
+    plan = _plan(load_book, vault)
+    change = next(c for c in plan["FILES"] if c["REL_PATH"] == "/vault/b.md")
+    assert change["REMOVED"] == ["/vault/old.md"]
+    assert change["BACKLINKS"] == [["/vault/a.md", "Ä"]]
+    assert apply_plan(plan) == []
+    assert (vault / "b.md").read_text() == (
+        "# B\n\nbody ü\n\n# Backlinks\n\n- [Ä](/vault/a.md)\n\n"
+        "# Notes\n\nkept ✓\n"
+    )
+    assert (vault / "a.md").read_text().startswith(VAULT["a.md"])
+    assert "- [C](/vault/c.md)" in (vault / "a.md").read_text()
+    # opted out, and nothing left to do
+    assert (vault / "c.md").read_text() == VAULT["c.md"]
+    assert _plan(load_book, vault)["FILES"] == []
+
+
+def test_keep_stale(make_vault, load_book):
+    vault = make_vault(VAULT)
+    plan = _plan(load_book, vault, prune=False)
+    change = next(c for c in plan["FILES"] if c["REL_PATH"] == "/vault/b.md")
+    assert change["REMOVED"] == []
+    assert ["/vault/old.md", "old"] in change["BACKLINKS"]
+
+
+def test_apply_rebases_files_edited_since_planning(make_vault, load_book):
+    vault = make_vault(VAULT)
+    plan = _plan(load_book, vault)
+    (vault / "b.md").write_text(
+        "# B\n\nrewritten ü ü\n\n# Backlinks\n\n- [Old](/vault/old.md)\n\n"
+        "# Notes\n\nkept ✓\n",
+        encoding="utf-8",
+    )
+    assert apply_plan(plan) == []
+    assert (vault / "b.md").read_text() == (
+        "# B\n\nrewritten ü ü\n\n# Backlinks\n\n- [Ä](/vault/a.md)\n\n"
+        "# Notes\n\nkept ✓\n"
+    )
+
+
+def test_apply_change_refuses_a_stale_file(make_vault, load_book):
+    vault = make_vault(VAULT)
+    plan = _plan(load_book, vault)
+    change = next(c for c in plan["FILES"] if c["REL_PATH"] == "/vault/a.md")
+    (vault / "a.md").write_text("# A\n", encoding="utf-8")
+    with pytest.raises(StaleDocumentError):
+        apply_change(change)
+    assert (vault / "a.md").read_text() == "# A\n"
+
+
+def test_apply_skips_deleted_files(make_vault, load_book):
+    vault = make_vault(VAULT)
+    plan = _plan(load_book, vault)
+    (vault / "a.md").unlink()
+    assert apply_plan(plan) == ["/vault/a.md"]
+    assert "- [Ä](/vault/a.md)" in (vault / "b.md").read_text()
+
+
+def test_save_and_load_plan(make_vault, load_book, tmp_path):
+    vault = make_vault(VAULT)
+    plan = _plan(load_book, vault)
+    plan_path = tmp_path / "plan.json"
+    save_plan(plan, plan_path)
+    assert load_plan(plan_path) == plan
+    assert sorted(os.listdir(tmp_path)) == ["plan.json", "vault"]
+    plan_path.write_text(json.dumps(dict(plan, VERSION=PLAN_VERSION + 1)))
+    with pytest.raises(ValueError):
+        load_plan(plan_path)
+
+
+def test_plan_and_apply_subcommands(make_vault, tmp_path):
+    vault = make_vault(VAULT)
+    plan_path = tmp_path / "plan.json"
+    run = ["--progress", "off"]
+    assert main(run + ["plan", str(vault), "-o", str(plan_path)]) == 0
+    assert (vault / "b.md").read_text() == VAULT["b.md"]
+    assert main(run + ["apply", str(plan_path)]) == 0
+    assert "- [Ä](/vault/a.md)" in (vault / "b.md").read_text()
@@ -0,0 +1,62 @@
+import Backlink
+from backlinks.core.index import LinkIndex
+from backlinks.core.reconcile import (
+    foreign_entries,
+    reconcile,
+    reconcile_backlinks,
+)
+
+# t lists a (still links), old (links no more), a missing note and a note of
+# another vault; b links to t without being listed
+SECTION = (
+    "# Backlinks\n\n- [A](/vault/a.md)\n- [Old](/vault/old.md)\n"
+    "- [Gone](/vault/gone.md)\n- [Other](/other/o.md)\n"
+)
+FILES = {
+    "t.md": "# T\n\nbody\n\n" + SECTION,
+    "a.md": "# A\n\n[t](t.md)\n",
+    "b.md": "# B\n\n[t](t.md)\n",
+    "old.md": "# Old\n",
+}
+
+
+def build_index(make_vault, load_book):
+    vault = make_vault(FILES)
+    return LinkIndex.from_book(load_book(vault))
+
+
+def test_reconcile(make_vault, load_book):
+    index = build_index(make_vault, load_book)
+    t, b, old = (index.IDS[f"/vault/{n}.md"] for n in ("t", "b", "old"))
+
+    assert foreign_entries(index, t) == ["/other/o.md"]
+    assert reconcile(index, t) == ({b}, {old}, ["/vault/gone.md"])
+    assert reconcile(index, t, prune=False) == ({b}, set(), [])
+
+
+def test_reconcile_backlinks_lists_only_changes(make_vault, load_book):
+    index = build_index(make_vault, load_book)
+    t = index.IDS["/vault/t.md"]
+
+    assert list(reconcile_backlinks(index)) == [t]
+    # a and b list nothing and nothing links to them
+    assert reconcile(index, index.IDS["/vault/a.md"]) == (set(), set(), [])
+
+
+def test_backlink_script_prunes_stale_entries(make_vault):
+    vault = make_vault(FILES)
+
+    assert Backlink.add_backlinks(vault) == {}
+    section = (vault / "t.md").read_text(encoding="utf-8").split("# Backlinks")
+    assert "/vault/a.md" in section[1] and "/vault/b.md" in section[1]
+    assert "/vault/old.md" not in section[1]
+    assert "/vault/gone.md" not in section[1]
+
+
+def test_backlink_script_keeps_stale_entries(make_vault):
+    vault = make_vault(FILES)
+
+    assert Backlink.add_backlinks(vault, prune=False) == {}
+    section = (vault / "t.md").read_text(encoding="utf-8").split("# Backlinks")
+    assert "/vault/b.md" in section[1]
+    assert "/vault/old.md" in section[1] and "/vault/gone.md" in section[1]
@@ -0,0 +1,83 @@
+import pytest
+
+from backlinks.cli import main
+from backlinks.core.incremental import (
+    INDEX_FILE,
+    INDEX_POINTER_FILE,
+    find_index,
+    update_files,
+)
+from backlinks.core.index import LinkIndex
+from backlinks.core.plan import plan_books
+
+# a note of each vault links to the other one, relatively and by namespace
+ONE = {"a.md": "# A\n\n[b](../two/b.md)\n"}
+TWO = {"b.md": "# B\n\n[a](/one/a.md)\n", "c.md": "# C\n"}
+
+
+def make_roots(make_vault):
+    return make_vault(ONE, "one"), make_vault(TWO, "two")
+
+
+def update(*roots) -> int:
+    extra = [arg for root in roots[1:] for arg in ("--root", str(root))]
+    return main(["--progress", "off", "update", str(roots[0]), *extra])
+
+
+def test_links_resolve_across_roots(make_vault, load_book):
+    one, two = make_roots(make_vault)
+    books = [load_book(one), load_book(two)]
+    index = LinkIndex.from_books(books)
+    a, b = index.IDS["/one/a.md"], index.IDS["/two/b.md"]
+
+    assert index.ROOTS == [str(one), str(two)]
+    assert index.LINKS[a] == {b} and index.LINKS[b] == {a}
+    assert not any(index.BROKEN.values())
+
+    plan = plan_books(books, index)
+    assert plan["ROOT"] == str(one) and plan["ROOTS"] == [str(one), str(two)]
+    assert {change["REL_PATH"] for change in plan["FILES"]} == {
+        "/one/a.md",
+        "/two/b.md",
+    }
+
+
+def test_roots_need_distinct_names(make_vault, load_book):
+    first = make_vault({"a.md": "# A\n"}, "one/notes")
+    second = make_vault({"b.md": "# B\n"}, "two/notes")
+
+    with pytest.raises(ValueError, match="distinct names"):
+        LinkIndex.from_books([load_book(first), load_book(second)])
+
+
+def test_update_writes_backlinks_across_roots(make_vault):
+    one, two = make_roots(make_vault)
+
+    assert update(one, two) == 0
+    assert "- [B](/two/b.md)" in (one / "a.md").read_text(encoding="utf-8")
+    assert "- [A](/one/a.md)" in (two / "b.md").read_text(encoding="utf-8")
+    # the index is kept in the first root, the others point at it
+    assert (one / INDEX_FILE).exists() and not (two / INDEX_FILE).exists()
+    assert find_index(two) == one / INDEX_FILE
+    assert not (one / INDEX_POINTER_FILE).exists()
+
+
+def test_files_from_another_root_uses_the_shared_index(make_vault):
+    one, two = make_roots(make_vault)
+    assert update(one, two) == 0
+
+    (two / "c.md").write_text("# C\n\n[a](/one/a.md)\n", encoding="utf-8")
+    assert update_files(two, [two / "c.md"]) == []
+    a = (one / "a.md").read_text(encoding="utf-8")
+    # b's backlink of the other root is not pruned
+    assert "- [B](/two/b.md)" in a and "- [C](/two/c.md)" in a
+
+
+def test_single_root_run_keeps_other_roots_entries(make_vault):
+    one, two = make_roots(make_vault)
+    assert update(one, two) == 0
+    b = (two / "b.md").read_text(encoding="utf-8")
+
+    assert update(two) == 0
+    assert (two / "b.md").read_text(encoding="utf-8") == b
+    assert (two / INDEX_FILE).exists()
@@ -0,0 +1,113 @@
+import json
+import socket
+import subprocess
+import threading
+from urllib.request import urlopen
+
+from backlinks.server import LinkService, make_http_server, make_socket_server
+
+VAULT = {
+    "a.md": "# Alpha\n\nsee [B](b.md) and [gone](gone.md)\n",
+    "b.md": "---\nALIASES: [Bee]\n---\n# Beta\n\n[Other](/other/x.md)\n",
+}
+OTHER = {"x.md": "# X\n\nback to [A](/vault/a.md)\n"}
+
+
+def _service(make_vault, **kwargs) -> LinkService:
+    service = LinkService(make_vault(VAULT), **kwargs)
+    service.load()
+    return service
+
+
+def test_queries(make_vault):
+    service = _service(make_vault)
+    assert service.query({"QUERY": "links", "PATH": "/vault/a.md"}) == {
+        "RESULT": {
+            "LINKS": [{"PATH": "/vault/b.md", "TITLE": "Beta"}],
+            "BROKEN": ["gone.md"],
+            "EXTERNAL": [],
+        }
+    }
+    result = service.query({"QUERY": "backlinks", "PATH": "/vault/b.md"})
+    assert [e["PATH"] for e in result["RESULT"]["BACKLINKS"]] == ["/vault/a.md"]
+    result = service.query({"QUERY": "titles", "Q": "bee", "MATCH": "casefold"})
+    assert result["RESULT"]["TITLES"] == [
+        {"PATH": "/vault/b.md", "TITLE": "Beta"}
+    ]
+    assert "gone.md" in json.dumps(service.query({"QUERY": "broken"}))
+    assert "ERROR" in service.query({"QUERY": "links", "PATH": "/nope.md"})
+    assert "ERROR" in service.query({"QUERY": "drop"})
+
+
+def test_refresh(make_vault):
+    service = _service(make_vault)
+    vault = service.PATH
+    (vault / "gone.md").write_text("# Gone\n", encoding="utf-8")
+    (vault / "b.md").unlink()
+    assert service.refresh() == 2
+    links = service.links("/vault/a.md")
+    assert links["LINKS"] == [{"PATH": "/vault/gone.md", "TITLE": "Gone"}]
+    assert links["BROKEN"] == ["/vault/b.md"]
+    assert service.refresh() == 0
+
+
+def test_several_roots(make_vault):
+    other = make_vault(OTHER, "other")
+    service = _service(make_vault, ROOTS=[other])
+    assert service.backlinks("/other/x.md")["BACKLINKS"][0]["PATH"] == (
+        "/vault/b.md"
+    )
+    (other / "y.md").write_text("[B](/vault/b.md)\n", encoding="utf-8")
+    assert service.refresh() == 1
+    assert [
+        e["PATH"] for e in service.backlinks("/vault/b.md")["BACKLINKS"]
+    ] == [
+        "/other/y.md",
+        "/vault/a.md",
+    ]
+
+
+def test_git_listing(make_vault):
+    vault = make_vault(dict(VAULT, **{".gitignore": "draft.md\n"}))
+    subprocess.run(["git", "init", "-q", str(vault)], check=True)
+    (vault / "draft.md").write_text("[A](a.md)\n", encoding="utf-8")
+    service = LinkService(vault, GIT=True)
+    service.load()
+    assert "/vault/draft.md" not in service.INDEX.IDS
+    (vault / "c.md").write_text("[A](a.md)\n", encoding="utf-8")
+    assert service.refresh() == 1
+    assert "/vault/c.md" in service.INDEX.IDS
+    assert "/vault/draft.md" not in service.INDEX.IDS
+
+
+def test_http_server(make_vault):
+    server = make_http_server(_service(make_vault), port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/links?path=/vault/a.md"
+        with urlopen(url) as response:
+            result = json.load(response)["RESULT"]
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert result["BROKEN"] == ["gone.md"]
+
+
+def test_socket_server(make_vault, tmp_path):
+    socket_path = tmp_path / "backlinks.sock"
+    server = make_socket_server(_service(make_vault), socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(str(socket_path))
+            stream = client.makefile("rwb")
+            stream.write(b'{"QUERY": "links", "PATH": "/vault/a.md"}\n')
+            stream.write(b"not json\n")
+            stream.flush()
+            first = json.loads(stream.readline())
+            second = json.loads(stream.readline())
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert first["RESULT"]["BROKEN"] == ["gone.md"]
+    assert "ERROR" in second
@@ -0,0 +1,107 @@
+from backlinks.cli import main
+from backlinks.core.index import LinkIndex
+from backlinks.markdown.snippets import (
+    ELLIPSIS,
+    MAX_SNIPPET_CHARS,
+    SnippetBuffer,
+    clean_snippet,
+    snippet_bounds,
+    snippet_text,
+)
+from backlinks.markdown.templates import CONFIG_FILE
+
+
+def add(buffer, target, content, link):
+    start = content.index(link)
+    buffer.add(target, content, start, start + len(link))
+
+
+def test_snippet_bounds_stop_at_sentences():
+    content = "First one. See [b](b.md) here! Last one."
+    start = content.index("[b]")
+
+    low, high, cut_left, cut_right = snippet_bounds(content, start, start + 9)
+    assert content[low:high] == " See [b](b.md) here!"
+    assert not cut_left and not cut_right
+    assert snippet_bounds(content, start, start + 9, window=3)[2:] == (
+        True,
+        True,
+    )
+
+
+def test_clean_snippet():
+    assert clean_snippet("- See [b](b.md)\n  and ![img](i.png).") == (
+        "See b and img."
+    )
+    assert clean_snippet("## Heading [x](x.md)") == "Heading x"
+
+
+def test_links_sharing_a_sentence_share_the_text():
+    content = "Intro.\nSee [b](b.md) and [c](c.md) now.\nThen [d](d.md)."
+    buffer = SnippetBuffer()
+    for target, link in (("b", "[b]"), ("c", "[c]"), ("d", "[d]")):
+        add(buffer, target, content, link)
+    # the first link to a target wins
+    add(buffer, "b", content, "[d]")
+
+    snippets = buffer.to_dict()
+    assert snippets["LINKS"]["b"] == snippets["LINKS"]["c"]
+    assert snippet_text(snippets, "c") == "See b and c now."
+    assert snippet_text(snippets, "d") == "Then d."
+    assert snippets["TEXT"] == "See b and c now.Then d."
+    assert snippet_text(snippets, "missing") is None
+    assert snippet_text({}, "b") is None
+
+
+def test_long_snippets_are_cut():
+    content = "x" * 100 + " see [b](b.md) " + "y " * 200
+    buffer = SnippetBuffer()
+    add(buffer, "b", content, "[b](b.md)")
+
+    snippet = snippet_text(buffer.to_dict(), "b")
+    assert snippet.startswith(ELLIPSIS) and snippet.endswith(ELLIPSIS)
+    assert "see b" in snippet
+    assert len(snippet) <= MAX_SNIPPET_CHARS + 2
+
+
+def test_budget_caps_the_buffer():
+    content = "One [a](a.md).\nTwo [b](b.md).\nThree [c](c.md).\n"
+    buffer = SnippetBuffer(BUDGET=len("One a.Two b."))
+    for target in ("a", "b", "c"):
+        add(buffer, target, content, f"[{target}]")
+
+    assert buffer.LENGTH == buffer.BUDGET
+    assert list(buffer.LINKS) == ["a", "b"]
+    assert snippet_text(buffer.to_dict(), "c") is None
+
+
+FILES = {
+    "a.md": "# A\n\nIntro.\nRead [t](t.md) for more.\n",
+    "t.md": "# T\n",
+}
+
+
+def test_index_snippets(make_vault, load_book, tmp_path):
+    vault = make_vault(FILES)
+    index = LinkIndex.from_book(load_book(vault))
+    a, t = index.IDS["/vault/a.md"], index.IDS["/vault/t.md"]
+
+    assert index.snippet(a, t) == "Read t for more."
+    assert index.snippet(t, a) is None
+    index.dump(tmp_path / "index.json")
+    assert LinkIndex.load(tmp_path / "index.json").snippet(a, t) == (
+        "Read t for more."
+    )
+
+
+def test_update_writes_snippets(make_vault):
+    vault = make_vault(
+        {**FILES, CONFIG_FILE: '{"ITEM": "- [{title}]({path}): {snippet}"}'}
+    )
+
+    assert main(["--progress", "off", "update", str(vault)]) == 0
+    assert (
+        (vault / "t.md")
+        .read_text(encoding="utf-8")
+        .endswith("- [A](/vault/a.md): Read t for more.\n")
+    )
@@ -0,0 +1,77 @@
+import csv
+
+import Backlink
+
+FILES = {
+    "a.md": "# A\n\n[b](b.md) and [c](sub/c.md).\n",
+    "b.md": "# B\n\n[c](sub/c.md)\n\n# Backlinks\n\n- [Old](/vault/old.md)\n",
+    "sub/c.md": "# C\n\n[a](../a.md) [gone](gone.md)\n",
+    "d.md": "# D\n\n[a](a.md)\n",
+}
+
+
+def test_spiller_merges_sorted_runs(tmp_path):
+    spiller = Backlink.BacklinkSpiller(tmp_path, memory_budget=2)
+    spiller.add("/v/b.md", "/v/z.md", "Z", "z")
+    spiller.add("/v/a.md", "/v/y.md", "Y", "")
+    spiller.add("/v/c.md")
+    spiller.add("/v/a.md", "/v/x.md", "X", "x")
+    spiller.add("/v/b.md", "/v/x.md", "X", "x")
+
+    assert len(spiller.runs) == 2
+    assert all(run.exists() for run in spiller.runs)
+    assert list(spiller.grouped()) == [
+        ("/v/a.md", {("/v/x.md", "X", "x"), ("/v/y.md", "Y", "")}),
+        ("/v/b.md", {("/v/x.md", "X", "x"), ("/v/z.md", "Z", "z")}),
+        # a target marked for review only has no sources
+        ("/v/c.md", set()),
+    ]
+
+
+def test_spiller_within_budget_does_not_spill(tmp_path):
+    spiller = Backlink.BacklinkSpiller(tmp_path, memory_budget=10)
+    spiller.add("/v/b.md", "/v/a.md", "A", "")
+
+    assert list(spiller.grouped()) == [("/v/b.md", {("/v/a.md", "A", "")})]
+    assert spiller.runs == [] and list(tmp_path.iterdir()) == []
+
+
+def read_records(vault) -> list:
+    with open(vault / "backlinks.csv", "r", encoding="utf-8") as f:
+        return sorted(tuple(row.values()) for row in csv.DictReader(f))
+
+
+def test_stream_matches_scan(make_vault, tmp_path):
+    vault = make_vault(FILES)
+    backlinks_map = Backlink.scan_documents(vault)
+    records = read_records(vault)
+
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    spiller = Backlink.stream_documents(vault, work_dir, memory_budget=2)
+
+    assert spiller.runs
+    assert dict(spiller.grouped()) == dict(backlinks_map)
+    assert read_records(vault) == records
+
+
+def test_streaming_run_writes_the_same_files(make_vault):
+    contents = []
+    for name, streaming in (("scan", False), ("stream", True)):
+        vault = make_vault(FILES, name)
+        failed = Backlink.add_backlinks(
+            vault, streaming=streaming, memory_budget=2
+        )
+        assert failed == {}
+        contents.append(
+            {
+                rel_path: (vault / rel_path)
+                .read_text(encoding="utf-8")
+                .replace(f"/{name}/", "/vault/")
+                for rel_path in FILES
+            }
+        )
+
+    assert contents[0] == contents[1]
+    assert "- [D](/vault/d.md)" in contents[0]["a.md"]
+    assert "/vault/old.md" not in contents[0]["b.md"]
@@ -0,0 +1,119 @@
+import re
+
+import pytest
+
+import Backlink
+from backlinks.cli import main
+from backlinks.markdown.templates import (
+    CONFIG_FILE,
+    BacklinksTemplate,
+    backlink_entry,
+    heading_regex,
+    load_template,
+)
+
+ENTRIES = [
+    backlink_entry("/vault/notes/b.md", "Beta", "2024-02-01", "see b"),
+    backlink_entry("/vault/a.md", "alpha", None, None),
+    backlink_entry("/vault/notes/c.md", "Gamma", "2024-03-01", None),
+]
+
+
+def test_default_render():
+    assert BacklinksTemplate().render([]) == "\n"
+    assert BacklinksTemplate().render(ENTRIES) == (
+        "\n\n# Backlinks\n\n"
+        "- [Beta](/vault/notes/b.md)\n"
+        "- [alpha](/vault/a.md)\n"
+        "- [Gamma](/vault/notes/c.md)\n"
+    )
+
+
+def test_sorted_and_grouped_render():
+    template = BacklinksTemplate(
+        HEADING="## Linked from",
+        ITEM="- {name}: {snippet!r}",
+        GROUP="### {folder}",
+        GROUP_BY="folder",
+        SORT_BY="date",
+        REVERSE=True,
+    )
+
+    assert template.render(ENTRIES) == (
+        "\n\n## Linked from\n\n"
+        "### /vault\n\n"
+        "- a: ''\n\n"
+        "### /vault/notes\n\n"
+        "- c: ''\n"
+        "- b: 'see b'\n"
+    )
+    # titles sort ignoring case
+    by_title = BacklinksTemplate(ITEM="{title}", SORT_BY="title")
+    assert by_title.render(ENTRIES).split("\n\n")[-1] == "alpha\nBeta\nGamma\n"
+
+
+@pytest.mark.parametrize(
+    "settings, message",
+    [
+        ({"ITEM": "- {url}"}, "may only use the fields"),
+        ({"ITEM": "- {}"}, "positional fields"),
+        ({"GROUP_BY": "tag"}, "GROUP_BY must be one of"),
+        ({"SORT_BY": "size"}, "SORT_BY must be one of"),
+        ({"HEADING": "# One\n# Two"}, "single line"),
+        ({"GROUP_BY": "folder", "GROUP": "# {folder}"}, "below HEADING"),
+    ],
+)
+def test_invalid_templates(settings, message):
+    with pytest.raises(ValueError, match=message):
+        BacklinksTemplate(**settings)
+
+
+def test_heading_regex_finds_old_sections():
+    regex = heading_regex("## Linked from")
+
+    assert re.search(regex, "## Linked from\n")
+    assert re.search(regex, "# Backlinks\n")
+    assert heading_regex() == r"\#\ Backlinks\n"
+
+
+def test_load_template(tmp_path):
+    assert load_template(tmp_path) == BacklinksTemplate()
+
+    (tmp_path / CONFIG_FILE).write_text(
+        '{"GROUP_BY": "folder", "ITEM": "- {title}"}', encoding="utf-8"
+    )
+    assert load_template(tmp_path) == BacklinksTemplate(
+        GROUP_BY="folder", ITEM="- {title}"
+    )
+
+    (tmp_path / CONFIG_FILE).write_text('{"COLOUR": "red"}', encoding="utf-8")
+    with pytest.raises(ValueError, match="Unknown settings"):
+        load_template(tmp_path)
+
+
+FILES = {
+    CONFIG_FILE: '{"HEADING": "## Linked from", "ITEM": "* {name}", '
+    '"SORT_BY": "date"}',
+    "t.md": "# T\n\nbody\n\n# Backlinks\n\n- [Old](/vault/old.md)\n",
+    "b.md": "# B\n\n[t](t.md)\n",
+    "a.md": "# A\n\n[t](t.md)\n",
+}
+SECTION = "body\n\n## Linked from\n\n* a\n* b\n"
+
+
+def test_update_writes_the_vault_template(make_vault):
+    vault = make_vault(FILES)
+
+    assert main(["--progress", "off", "update", str(vault)]) == 0
+    assert (vault / "t.md").read_text(encoding="utf-8").endswith(SECTION)
+
+
+def test_backlink_script_uses_the_vault_template(make_vault):
+    vault = make_vault(FILES)
+    template = Backlink.vault_template(vault)
+
+    # the script keeps no dates, it falls back to the planned order
+    assert template["COMPILED"].SORT_BY is None
+    assert template["COMPILED"].ITEM == "* {name}"
+    assert Backlink.add_backlinks(vault) == {}
+    assert (vault / "t.md").read_text(encoding="utf-8").endswith(SECTION)
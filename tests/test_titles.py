@@ -0,0 +1,70 @@
+from backlinks.core.index import LinkIndex
+from backlinks.core.titles import TitleIndex, document_title
+
+FILES = {
+    "a.md": "---\ntitle: Alpha\naliases: [First, Primo]\n---\n# Heading A\n",
+    "b.md": "# Beta\n\n[p](Primo.md) [f](first.md) [m](Missing.md)\n",
+    "c.md": "no title at all\n",
+    "d.md": "---\naliases: [Alphabet]\n---\n# Alphabet soup\n",
+}
+
+
+def test_title_index_lookups():
+    titles = TitleIndex()
+    titles.add(0, "Alpha", ["First"])
+    titles.add(1, "alpha")
+    titles.add(2, "Alphabet")
+    titles.add(3, "Beta", ["first"])
+
+    assert titles.exact("Alpha") == [0]
+    assert titles.casefold("ALPHA") == [0, 1]
+    assert titles.lookup("alpha") == [1]
+    assert titles.lookup("FIRST") == [0, 3]
+    assert titles.prefix("alp") == [0, 1, 2]
+    assert titles.prefix("alp", limit=2) == [0, 1]
+    assert titles.prefix("z") == []
+
+    # adding again replaces the names, removing forgets them
+    titles.add(0, "Gamma")
+    assert titles.exact("Alpha") == [] and titles.exact("Gamma") == [0]
+    assert titles.prefix("alp") == [1, 2]
+    titles.remove(2)
+    assert titles.prefix("alp") == [1]
+    assert len(titles) == 3
+
+
+def test_document_titles(make_vault, load_book):
+    vault = make_vault(FILES)
+    book = load_book(vault)
+
+    assert [
+        document_title(book.PAGES[vault / name])
+        for name in ("a.md", "b.md", "c.md")
+    ] == ["Alpha", "Beta", "c"]
+
+
+def test_links_resolve_by_title_and_alias(make_vault, load_book):
+    vault = make_vault(FILES)
+    index = LinkIndex.from_book(load_book(vault))
+    a, b = index.IDS["/vault/a.md"], index.IDS["/vault/b.md"]
+
+    assert index.LINKS[b] == {a}
+    assert index.BROKEN[b] == ["Missing.md"]
+    assert index.TITLE_INDEX.lookup("primo") == [a]
+    assert index.TITLE_INDEX.prefix("alph") == [
+        a,
+        index.IDS["/vault/d.md"],
+    ]
+
+
+def test_title_index_survives_dump_and_load(make_vault, load_book, tmp_path):
+    vault = make_vault(FILES)
+    index = LinkIndex.from_book(load_book(vault))
+    index.dump(tmp_path / "index.json")
+
+    loaded = LinkIndex.load(tmp_path / "index.json")
+    assert loaded.TITLE_INDEX.NAMES == index.TITLE_INDEX.NAMES
+    assert loaded.TITLE_INDEX.prefix("pri") == [index.IDS["/vault/a.md"]]
+
+    loaded.remove("/vault/a.md")
+    assert loaded.TITLE_INDEX.lookup("Primo") == []
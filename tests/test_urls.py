@@ -0,0 +1,216 @@
+import asyncio
+import json
+from time import monotonic
+from urllib.parse import urlsplit
+
+from backlinks.cli import main
+from backlinks.core.urls import (
+    URL_CACHE_FILE,
+    HttpTransport,
+    StubTransport,
+    UrlChecker,
+    UrlStatusCache,
+)
+
+
+class CountingTransport(StubTransport):
+    """A stub recording the requests in flight and when each one started"""
+
+    def __init__(self, delay: float):
+        super().__init__(DELAY=delay)
+        self.in_flight = {}
+        self.most_in_flight = {}
+        self.starts = {}
+
+    async def head(self, url: str) -> int:
+        host = url.split("/")[2]
+        self.starts.setdefault(host, []).append(monotonic())
+        self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        self.most_in_flight[host] = max(
+            self.most_in_flight.get(host, 0), self.in_flight[host]
+        )
+        try:
+            return await super().head(url)
+        finally:
+            self.in_flight[host] -= 1
+
+
+def test_stub_transport_results():
+    transport = StubTransport(
+        {"https://a.org/gone": 404, "https://b.org/": None}, DEFAULT=200
+    )
+    results = UrlChecker(TRANSPORT=transport, HOST_INTERVAL=0).check(
+        [
+            "https://a.org/",
+            "https://a.org/gone",
+            "https://b.org/",
+            "mailto:me@a.org",
+        ]
+    )
+    assert results == {
+        "https://a.org/": "Valid",
+        "https://a.org/gone": "Broken",
+        "https://b.org/": "Unreachable",
+        "mailto:me@a.org": "Unchecked",
+    }
+    assert sorted(transport.CALLS) == [
+        "https://a.org/",
+        "https://a.org/gone",
+        "https://b.org/",
+    ]
+
+
+def test_stub_transport_from_file(tmp_path):
+    stub = tmp_path / "stub.json"
+    stub.write_text(json.dumps({"https://a.org/x": 500, "DEFAULT": 404}))
+    transport = StubTransport.from_file(stub)
+    assert asyncio.run(transport.head("https://a.org/x")) == 500
+    assert asyncio.run(transport.head("https://a.org/y")) == 404
+
+
+def test_max_per_host():
+    transport = CountingTransport(delay=0.02)
+    urls = [f"https://{host}.org/{i}" for host in "ab" for i in range(10)]
+    checker = UrlChecker(TRANSPORT=transport, MAX_PER_HOST=2, HOST_INTERVAL=0)
+    checker.check(urls)
+    assert transport.most_in_flight == {"a.org": 2, "b.org": 2}
+
+
+def test_host_interval():
+    transport = CountingTransport(delay=0)
+    urls = [f"https://a.org/{i}" for i in range(4)]
+    UrlChecker(TRANSPORT=transport, HOST_INTERVAL=0.05).check(urls)
+    starts = transport.starts["a.org"]
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    # the sleeps may end a little early on coarse clocks
+    assert min(gaps) >= 0.04
+
+
+def test_cache_ttl_expiry(tmp_path):
+    cache = UrlStatusCache(tmp_path / URL_CACHE_FILE, TTL=60)
+    cache.put("https://a.org/", 200, "Valid", now=1000.0)
+    assert cache.get("https://a.org/", now=1060.0) == "Valid"
+    assert cache.get("https://a.org/", now=1061.0) is None
+
+
+def test_expired_results_are_checked_again():
+    cache = UrlStatusCache(TTL=60)
+    cache.put("https://a.org/fresh", 200, "Valid")
+    cache.put("https://a.org/old", 200, "Valid", now=1.0)
+    transport = StubTransport({"https://a.org/old": 404})
+    results = UrlChecker(
+        TRANSPORT=transport, CACHE=cache, HOST_INTERVAL=0
+    ).check(["https://a.org/fresh", "https://a.org/old"])
+    assert transport.CALLS == ["https://a.org/old"]
+    assert results["https://a.org/old"] == "Broken"
+
+
+def test_dump_drops_expired_entries(tmp_path):
+    cache = UrlStatusCache(tmp_path / URL_CACHE_FILE, TTL=60)
+    cache.put("https://a.org/fresh", 200, "Valid")
+    cache.put("https://a.org/old", 200, "Valid", now=1.0)
+    cache.dump()
+    loaded = UrlStatusCache(tmp_path / URL_CACHE_FILE, TTL=60).load()
+    assert list(loaded.ENTRIES) == ["https://a.org/fresh"]
+
+
+def test_stubbed_results_are_not_cached(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    (vault / "a.md").write_text("# A\n\n[site](https://a.org/)\n")
+    stub = tmp_path / "stub.json"
+    stub.write_text(json.dumps({"DEFAULT": 404}))
+    status = main(
+        [
+            "urls",
+            str(vault),
+            "--url-stub",
+            str(stub),
+            "--output",
+            str(tmp_path / "report.json"),
+        ]
+    )
+    assert status == 1
+    assert not (vault / URL_CACHE_FILE).exists()
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["URLS"] == {"https://a.org/": "Broken"}
+
+
+class RecordingWriter:
+    """A stream writer keeping what was written"""
+
+    def __init__(self):
+        self.written = b""
+
+    def write(self, data: bytes):
+        self.written += data
+
+    async def drain(self):
+        pass
+
+
+def _exchange(url: str) -> tuple:
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"HTTP/1.1 204 No Content\r\nServer: x\r\n\r\n")
+        writer = RecordingWriter()
+        status = await HttpTransport()._exchange(
+            "HEAD", urlsplit(url), reader, writer
+        )
+        return status, writer.written.decode("ascii").split("\r\n")
+
+    return asyncio.run(run())
+
+
+def test_exchange_encodes_non_ascii_urls():
+    (status, keep_alive), lines = _exchange(
+        "https://bücher.de/wiki/Café_(Paris)?q=über&x=1#top"
+    )
+    assert (status, keep_alive) == (204, True)
+    assert lines[0] == "HEAD /wiki/Caf%C3%A9_(Paris)?q=%C3%BCber&x=1 HTTP/1.1"
+    assert lines[1] == "Host: xn--bcher-kva.de"
+
+
+def test_exchange_keeps_percent_escapes():
+    _, lines = _exchange("http://a.org/a%20b/c d")
+    assert lines[0] == "HEAD /a%20b/c%20d HTTP/1.1"
+
+
+def test_exchange_brackets_ipv6_hosts():
+    _, lines = _exchange("http://[::1]:8080/x")
+    assert lines[1] == "Host: [::1]:8080"
+    _, lines = _exchange("http://[::1]/x")
+    assert lines[1] == "Host: [::1]"
+
+
+def test_http_transport_checks_non_ascii_urls():
+    requests = []
+
+    async def handle(reader, writer):
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            requests.append(request_line.decode("ascii").split()[1])
+            while await reader.readline() not in (b"\r\n", b""):
+                pass
+            status = b"200 OK" if "%C3%A9" in requests[-1] else b"404 X"
+            writer.write(b"HTTP/1.1 " + status + b"\r\n\r\n")
+            await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        transport = HttpTransport(TIMEOUT=5)
+        try:
+            return [
+                await transport.head(f"http://127.0.0.1:{port}{path}")
+                for path in ("/café", "/other")
+            ]
+        finally:
+            transport.close()
+            server.close()
+
+    assert asyncio.run(run()) == [200, 404]
+    assert requests == ["/caf%C3%A9", "/other"]